@@ -4,6 +4,7 @@ import subprocess
 import requests
 import json
 import socket
+import time
 from werkzeug.security import generate_password_hash, check_password_hash
 from PyQt5.QtWidgets import (QMessageBox, QDialog, QApplication, QWidget, 
                             QPushButton, QVBoxLayout, QHBoxLayout, QLineEdit, 
@@ -15,12 +16,12 @@ from utils.win_tools import (hide_taskbar, kill_explorer,
                            force_fullscreen_work_area, 
                            disable_task_manager, enable_task_manager)
 from utils.workers import HeartbeatWorker
-
-# --- ВАЖНО: IP СВОЕГО СЕРВЕРА (HTTPS) ---
-SERVER_URL = "https://192.168.1.101:5000" 
+from utils.api_client import api_post, api_url, set_session_token
+from utils.kiosk_store import get_store
 
 
 CACHE_DIR = "cache"
+LOGIN_BUSY_RETRIES = 5
 if not os.path.exists(CACHE_DIR):
     os.makedirs(CACHE_DIR)
 
@@ -293,21 +294,27 @@ class LoginWindow(QWidget):
         }
         
         try:
-            response = requests.post(
-                f"{SERVER_URL}/api/login", 
-                json=payload, 
-                timeout=3,
-                verify=False # Для самоподписанного SSL-сертификата
-            )
+            response = api_post("/api/login", json=payload)
+            for _ in range(LOGIN_BUSY_RETRIES):
+                if response.status_code != 503:
+                    break
+                # Сервер занят входами других клиентов: повтор через подсказанную сервером паузу
+                time.sleep(min(float(response.json().get("retry_after", 1)), 2.0))
+                response = api_post("/api/login", json=payload)
             
             if response.status_code == 200:
                 print("Успешный ОНЛАЙН вход.")
+                set_session_token(response.json().get("token"))
                 self.cache_credentials(username, password)
                 self.accepted_login(username)
                 
             elif response.status_code == 401:
                 print("Неверный пароль (онлайн).")
                 self.fail_login()
+            elif response.status_code in (429, 503):
+                # Слишком много попыток входа или сервер так и не освободился
+                QMessageBox.warning(self, "Вход", f"{response.json().get('message', 'Сервер занят')}. "
+                                    f"Повторите через {response.headers.get('Retry-After', '1')} сек.")
             else:
                 QMessageBox.warning(self, "Ошибка сервера", f"Не удалось войти: {response.text}")
 
@@ -315,11 +322,12 @@ class LoginWindow(QWidget):
             print("Сервер недоступен. Попытка ОФФЛАЙN входа...")
             if self.login_offline(username, password):
                 print("Успешный ОФФЛАЙН вход.")
+                set_session_token(None)
                 self.accepted_login(username)
             else:
                 print("Оффлайн вход не удался.")
                 QMessageBox.critical(self, "Ошибка сети", 
-                    f"Сервер {SERVER_URL} недоступен.\n\n"
+                    f"Сервер {api_url('')} недоступен.\n\n"
                     "Не удалось войти оффлайн. "
                     "Проверьте пароль или подключитесь к сети для первого входа.")
                 self.fail_login()
@@ -328,12 +336,9 @@ class LoginWindow(QWidget):
             QMessageBox.critical(self, "Критическая ошибка", str(e))
             
     def cache_credentials(self, username, password):
-        """Сохраняет хеш пароля в локальный кэш"""
+        """Сохраняет хеш пароля в локальное хранилище киоска"""
         try:
-            user_cache_file = os.path.join(CACHE_DIR, f"{username}.hash")
-            password_hash = generate_password_hash(password)
-            with open(user_cache_file, 'w', encoding='utf-8') as f:
-                f.write(password_hash)
+            get_store().set(f"password_hash:{username}", generate_password_hash(password))
             print(f"Хеш пароля для {username} сохранен в кэш.")
         except Exception as e:
             print(f"Ошибка кэширования хеша: {e}")
@@ -341,14 +346,11 @@ class LoginWindow(QWidget):
     def login_offline(self, username, password):
         """Проверяет пароль по локальному хешу"""
         try:
-            user_cache_file = os.path.join(CACHE_DIR, f"{username}.hash")
-            if not os.path.exists(user_cache_file):
+            password_hash = get_store().get(f"password_hash:{username}")
+            if not password_hash:
                 print("Локальный хеш не найден.")
                 return False
                 
-            with open(user_cache_file, 'r', encoding='utf-8') as f:
-                password_hash = f.read()
-                
             return check_password_hash(password_hash, password)
         except Exception as e:
             print(f"Ошибка оффлайн-логина: {e}")
@@ -359,8 +361,7 @@ class LoginWindow(QWidget):
         QTimer.singleShot(500, self.reset_auth_frame_style)
 
     def accepted_login(self, username):
-        with open("last_login.txt", "w", encoding='utf-8') as f:
-            f.write(username)
+        get_store().set("last_login", username)
 
         self.destroy()
         
@@ -0,0 +1,28 @@
+"""
+Общий код для бенчмарков: поднимает server.py в отдельной временной папке,
+чтобы замеры не трогали боевую central_club.db и config.ini.
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_server(config_text=None):
+    """Импортирует server.py с временной рабочей папкой. Возвращает (модуль, папка)."""
+    workdir = tempfile.mkdtemp(prefix="lovhub_bench_")
+    if config_text:
+        with open(os.path.join(workdir, "config.ini"), "w", encoding="utf-8") as f:
+            f.write(config_text)
+    os.chdir(workdir)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    import server
+    return server, workdir
+
+
+def cleanup(workdir):
+    os.chdir(REPO_ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,63 @@
+"""
+Бенчмарк клиентских запросов киоска к серверу по HTTPS.
+
+  "до"    — как раньше в utils/workers.py: requests.post(...) на каждый пульс,
+            то есть новое TCP-соединение и полное TLS-рукопожатие каждый раз;
+  "после" — utils/api_client.py: одна keep-alive сессия; встроенный сервер Flask
+            все равно закрывает соединение после ответа, поэтому выигрыш здесь
+            дает возобновление TLS-сессии (сокращенное рукопожатие).
+
+Сервер поднимается локально с cert.pem/key.pem из репозитория на временной базе.
+
+Запуск:  py benchmarks/bench_api_client.py --requests 300
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from _sandbox import load_server, cleanup, REPO_ROOT
+
+
+def run(send, count):
+    started = time.perf_counter()
+    for i in range(count):
+        response = send({"pc_name": f"PC-{i % 20:02d}", "status": "Активен", "user": None, "time_left": 0})
+        response.raise_for_status()
+    return (time.perf_counter() - started) * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    ssl_context = (os.path.join(REPO_ROOT, "cert.pem"), os.path.join(REPO_ROOT, "key.pem"))
+    httpd = make_server("127.0.0.1", 0, None, threaded=True, ssl_context=ssl_context)
+    base_url = f"https://127.0.0.1:{httpd.server_port}"
+    server, workdir = load_server(f"[Client]\nServerUrl = {base_url}\n")
+    try:
+        httpd.app = server.app
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+        from utils import api_client
+        before = run(lambda payload: requests.post(f"{base_url}/api/heartbeat", json=payload, timeout=5, verify=False),
+                     args.requests)
+        after = run(lambda payload: api_client.api_post("/api/heartbeat", json=payload), args.requests)
+
+        print(f"Пульсов: {args.requests}, сервер {base_url}")
+        print(f"  до    (новое соединение на запрос):   {before:7.2f} мс/запрос")
+        print(f"  после (общая сессия, TLS resumption): {after:7.2f} мс/запрос   x{before / after:.1f}")
+    finally:
+        httpd.shutdown()
+        server.heartbeat_buffer.stop(); server.db_pool.close()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Бенчмарк сетки приложений киоска (без экрана, Qt offscreen).
+
+  "до"    — старый MainWindow.create_page: на каждое обновление каталога и каждую
+            букву поиска страница строится заново (кнопки, загрузка, масштабирование
+            и скругление иконок, свой stylesheet у каждой кнопки);
+  "после" — windows/app_grid.py: плитки по id создаются один раз, дальше
+            трогаются только добавленные/измененные/удаленные.
+
+Замеряется: первая отрисовка, обновление без изменений, обновление с одним
+измененным приложением, набор поискового запроса по буквам и повторный запуск
+клиента, когда готовые иконки уже лежат в дисковом кэше (utils/icon_cache.py).
+
+Запуск (на машине киоска):  py benchmarks/bench_app_grid.py --apps 250
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QScrollArea, QLabel,
+                             QGridLayout, QStackedWidget)
+from PyQt5.QtGui import QIcon, QPixmap, QImage, QColor
+from PyQt5.QtCore import Qt, QSize
+
+from utils.helpers import AnimatedButton
+from windows.app_grid import AppGrid, TileIcons
+from utils.icon_cache import IconCache, rounded_pixmap
+from utils.search_index import SearchIndex
+
+TILE_W, TILE_H = 334, 447
+QUERY = "counter strike"
+
+
+def make_icons(folder, count):
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for i in range(count):
+        image = QImage(600, 800, QImage.Format_RGB32)
+        image.fill(QColor((i * 37) % 255, (i * 91) % 255, (i * 53) % 255))
+        name = f"bench_{i}.png"
+        image.save(os.path.join(folder, name))
+        names.append(name)
+    return names
+
+
+def legacy_page(items, title):
+    """Копия старого MainWindow.create_page (без режима редактирования)."""
+    page_widget = QWidget()
+    page_layout = QVBoxLayout(page_widget)
+    scroll_area = QScrollArea()
+    scroll_area.setWidgetResizable(True)
+    scroll_content = QWidget()
+    scroll_layout = QVBoxLayout(scroll_content)
+    scroll_layout.addWidget(QLabel(title))
+    apps_layout = QGridLayout()
+    scroll_layout.addLayout(apps_layout)
+    row, col = 0, 0
+    for app in items:
+        btn = AnimatedButton()
+        btn.setFixedSize(TILE_W, TILE_H)
+        container = QWidget()
+        container_layout = QGridLayout(container)
+        icon_filename = app.get('icon', None)
+        icon_exists = icon_filename and os.path.exists(f"static/icons/{icon_filename}")
+        icon_path = f"static/icons/{icon_filename}" if icon_exists else "static/icons/default_icon.png"
+        if os.path.exists(icon_path):
+            pixmap = QPixmap(icon_path).scaled(TILE_W, TILE_H, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+            btn.setIcon(QIcon(rounded_pixmap(pixmap, 12)))
+            btn.setIconSize(QSize(334, 447))
+        btn.setStyleSheet(f"""
+            QPushButton {{
+                color: {'transparent' if icon_exists else 'white'};
+                border: none; border-radius: 12px; font-size: 20px; text-align: center;
+                background: qlineargradient(x1: 0, y1: 0,x2: 0, y2: 1,stop:0 #EAA21B, stop:1 #212121);
+            }}
+            QPushButton:hover {{ background-color: #EAA21B; }}
+        """)
+        container_layout.addWidget(btn, 0, 0)
+        apps_layout.addWidget(container, row, col)
+        col += 1
+        if col >= 4:
+            col = 0; row += 1
+    scroll_area.setWidget(scroll_content)
+    page_layout.addWidget(scroll_area)
+    return page_widget
+
+
+def timed(app, func):
+    started = time.perf_counter()
+    func()
+    app.processEvents()
+    return (time.perf_counter() - started) * 1000
+
+
+def run_legacy(app, stack, catalog, changed_catalog):
+    def rebuild(items):
+        while stack.count():
+            widget = stack.widget(0); stack.removeWidget(widget); widget.deleteLater()
+        stack.addWidget(legacy_page([a for a in items if a["type"] == "game"], "Games"))
+        stack.addWidget(legacy_page([a for a in items if a["type"] == "app"], "Applications"))
+
+    def search():
+        for i in range(1, len(QUERY) + 1):
+            text = QUERY[:i]
+            page = legacy_page([a for a in catalog if text in a["name"].lower()], "Результаты поиска")
+            if stack.count() == 3:
+                old = stack.widget(2); stack.removeWidget(old); old.deleteLater()
+            stack.addWidget(page)
+            app.processEvents()
+
+    return {
+        "Первая отрисовка": timed(app, lambda: rebuild(catalog)),
+        "Обновление без изменений": timed(app, lambda: rebuild(catalog)),
+        "Обновление, 1 изменение": timed(app, lambda: rebuild(changed_catalog)),
+        f"Поиск \"{QUERY}\" по буквам": timed(app, search),
+        "Повторный запуск клиента": timed(app, lambda: rebuild(catalog)),
+    }
+
+
+def run_grid(app, stack, catalog, changed_catalog):
+    icons = TileIcons(TILE_W, TILE_H)
+    games = AppGrid("Games", icons, TILE_W, TILE_H)
+    tools = AppGrid("Applications", icons, TILE_W, TILE_H)
+    found = AppGrid("Результаты поиска", icons, TILE_W, TILE_H)
+    for grid in (games, tools, found):
+        stack.addWidget(grid)
+
+    def sync(items):
+        games.set_items([a for a in items if a["type"] == "game"])
+        tools.set_items([a for a in items if a["type"] == "app"])
+
+    index = SearchIndex(catalog)
+
+    def search():
+        for i in range(1, len(QUERY) + 1):
+            found.set_items(catalog)  # при первой букве плитки поиска создаются, дальше — no-op
+            found.filter(index.search(QUERY[:i]))
+            app.processEvents()
+
+    def second_boot():
+        # Новый кэш в памяти, но PNG уже лежат в cache/icons с прошлого запуска
+        warm_icons = TileIcons(TILE_W, TILE_H, cache=IconCache())
+        for title, items in (("Games", [a for a in catalog if a["type"] == "game"]),
+                             ("Applications", [a for a in catalog if a["type"] == "app"])):
+            grid = AppGrid(title, warm_icons, TILE_W, TILE_H)
+            stack.addWidget(grid)
+            grid.set_items(items)
+
+    results = {
+        "Первая отрисовка": timed(app, lambda: sync(catalog)),
+        "Обновление без изменений": timed(app, lambda: sync(catalog)),
+        "Обновление, 1 изменение": timed(app, lambda: sync(changed_catalog)),
+        f"Поиск \"{QUERY}\" по буквам": timed(app, search),
+    }
+    icons.cache.flush()
+    results["Повторный запуск клиента"] = timed(app, second_boot)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", type=int, default=250)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    workdir = tempfile.mkdtemp(prefix="lovhub_grid_")
+    os.chdir(workdir)
+    try:
+        icons = make_icons("static/icons", args.apps)
+        titles = ["Counter Strike", "Dota", "Steam", "Discord", "Chrome", "Valorant"]
+        catalog = [{"id": i + 1, "name": f"{titles[i % len(titles)]} {i}", "path": f"C:/apps/{i}.exe",
+                    "type": "game" if i % 3 else "app", "icon": icons[i]} for i in range(args.apps)]
+        changed_catalog = [dict(a) for a in catalog]
+        changed_catalog[5]["path"] = "C:/apps/moved.exe"
+
+        stack = QStackedWidget(); stack.resize(1920, 1080); stack.show()
+        before = run_legacy(app, stack, catalog, changed_catalog)
+        stack.deleteLater(); app.processEvents()
+        stack = QStackedWidget(); stack.resize(1920, 1080); stack.show()
+        after = run_grid(app, stack, catalog, changed_catalog)
+
+        print(f"Приложений в каталоге: {args.apps}")
+        for name in before:
+            print(f"  {name:<32} до {before[name]:9.1f} мс   после {after[name]:9.1f} мс")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
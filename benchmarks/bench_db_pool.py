@@ -0,0 +1,117 @@
+"""
+Микробенчмарк слоя БД: задержка "получить соединение + запрос" под
+параллельной нагрузкой, пока отдельный поток непрерывно пишет heartbeat'ы.
+
+  "до"    — sqlite3.connect() на каждый запрос (старый db_connection());
+  "после" — ConnectionPool: WAL, кэш выражений, отдельные читатели и писатель.
+
+Запуск:  py benchmarks/bench_db_pool.py --threads 16 --queries 500
+"""
+import argparse
+import sqlite3
+import statistics
+import threading
+import time
+from datetime import datetime
+
+from _sandbox import load_server, cleanup
+
+READ_QUERY = "SELECT COUNT(id) FROM computers WHERE last_heartbeat > ?"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def legacy_read(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute(READ_QUERY, (datetime.now(),)).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run(read_func, write_func, threads, queries):
+    latencies = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    writes = [0]
+
+    def writer():
+        while not stop.is_set():
+            write_func()
+            writes[0] += 1
+
+    def reader():
+        local = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            read_func()
+            local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    w = threading.Thread(target=writer); w.start()
+    pool = [threading.Thread(target=reader) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - started
+    stop.set(); w.join()
+    return {
+        "p50": statistics.median(latencies), "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99), "qps": len(latencies) / elapsed, "writes": writes[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seats", type=int, default=150)
+    args = parser.parse_args()
+
+    server, workdir = load_server()
+    try:
+        beats = [{"pc_name": f"BENCH-PC-{i:03d}", "ip_address": "10.0.0.1", "status": "Активен",
+                  "user": None, "time_left": 0, "timestamp": datetime.now()} for i in range(args.seats)]
+        server.flush_heartbeats(beats)
+        db_path = server.DATABASE_NAME
+
+        def legacy_write():
+            conn = sqlite3.connect(db_path)
+            try:
+                conn.execute("UPDATE computers SET last_heartbeat = ? WHERE pc_name = ?", (datetime.now(), "BENCH-PC-000"))
+                conn.commit()
+            finally:
+                conn.close()
+
+        def pooled_read():
+            with server.db_read() as conn:
+                conn.execute(READ_QUERY, (datetime.now(),)).fetchone()
+
+        def pooled_write():
+            with server.db_connection() as conn:
+                conn.execute("UPDATE computers SET last_heartbeat = ? WHERE pc_name = ?", (datetime.now(), "BENCH-PC-000"))
+
+        # "до" меряем без WAL, как работала база раньше
+        server.db_pool.close()
+        conn = sqlite3.connect(db_path); conn.execute("PRAGMA journal_mode=DELETE"); conn.close()
+        before = run(lambda: legacy_read(db_path), legacy_write, args.threads, args.queries)
+        after = run(pooled_read, pooled_write, args.threads, args.queries)
+
+        print(f"Потоков-читателей: {args.threads} x {args.queries} запросов, параллельно идет запись")
+        for label, r in (("до   (connect на запрос)", before), ("после (пул + WAL)       ", after)):
+            print(f"  {label}: p50 {r['p50']:.3f} мс, p95 {r['p95']:.3f} мс, p99 {r['p99']:.3f} мс, "
+                  f"{r['qps']:.0f} запросов/сек, записей за время теста: {r['writes']}")
+    finally:
+        server.heartbeat_buffer.stop()
+        server.db_pool.close()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
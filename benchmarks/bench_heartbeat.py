@@ -0,0 +1,87 @@
+"""
+Бенчмарк приема heartbeat'ов: сколько пульсов в секунду выдерживает сервер.
+
+  "до"    — старая схема: connect + UPDATE/INSERT + commit на каждый запрос;
+  "после" — /api/heartbeat пишет в буфер, БД обновляется пачкой раз в интервал.
+
+Запуск:  py benchmarks/bench_heartbeat.py --seats 150 --threads 8 --seconds 5
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from _sandbox import load_server, cleanup
+
+
+def legacy_heartbeat_view(server):
+    """Копия старого обработчика /api/heartbeat (запись в БД на каждый запрос)."""
+    def view():
+        data = server.request.get_json()
+        pc_name = data.get('pc_name'); status = data.get('status'); user = data.get('user'); time_left = data.get('time_left'); ip = server.request.remote_addr
+        conn = sqlite3.connect(server.DATABASE_NAME)
+        try:
+            cursor = conn.execute("""UPDATE computers SET ip_address = ?, status = ?, current_user = ?, last_heartbeat = ?, time_remaining = ? WHERE pc_name = ?""", (ip, status, user, datetime.now(), time_left, pc_name))
+            if cursor.rowcount == 0:
+                conn.execute("""INSERT INTO computers (pc_name, ip_address, status, current_user, last_heartbeat, time_remaining) VALUES (?, ?, ?, ?, ?, ?)""", (pc_name, ip, status, user, datetime.now(), time_left))
+            conn.commit()
+        finally:
+            conn.close()
+        return server.jsonify({"status": "success"})
+    return view
+
+
+def hammer(server, url, seats, threads, seconds):
+    counts = [0] * threads
+    errors = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(idx):
+        client = server.app.test_client()
+        n = idx
+        while time.perf_counter() < deadline:
+            pc = f"BENCH-PC-{n % seats:03d}"
+            resp = client.post(url, json={"pc_name": pc, "status": "Используется", "user": f"user{n % seats}", "time_left": 3600})
+            if resp.status_code == 200:
+                counts[idx] += 1
+            else:
+                errors[idx] += 1
+            n += threads
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - started
+    return sum(counts) / elapsed, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seats", type=int, default=150)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server, workdir = load_server()
+    try:
+        legacy = legacy_heartbeat_view(server)
+        server.csrf.exempt(legacy)
+        server.app.add_url_rule('/bench/legacy_heartbeat', 'bench_legacy_heartbeat', legacy, methods=['POST'])
+
+        before, before_err = hammer(server, '/bench/legacy_heartbeat', args.seats, args.threads, args.seconds)
+        after, after_err = hammer(server, '/api/heartbeat', args.seats, args.threads, args.seconds)
+        flushed = server.heartbeat_buffer.flush()
+
+        print(f"Мест: {args.seats}, потоков: {args.threads}, длительность: {args.seconds} сек")
+        print(f"  до   (запись на каждый пульс): {before:10.1f} пульсов/сек, ошибок: {before_err}")
+        print(f"  после (write-behind буфер):     {after:10.1f} пульсов/сек, ошибок: {after_err}")
+        print(f"  ускорение: x{after / before:.1f}; последний сброс записал {flushed} ПК")
+    finally:
+        server.heartbeat_buffer.stop()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Бенчмарк локального хранилища киоска (utils/kiosk_store.py).
+
+1. Запись на диск за час игры (720 синхронизаций по 5 сек):
+     "до"    — cache/{логин}.json переписывается целиком на каждой синхронизации;
+     "после" — хранилище пишет только изменения: у идущей сессии хранится
+               дедлайн, тикающий остаток записи не требует.
+2. Сбой питания: процесс пишет в очередь и значения, его убивают kill -9;
+   после перезапуска в базе ровно то, что было подтверждено, без дыр.
+3. Игра без связи против настоящего server.py: клиент играет, сервер
+   пропадает, киоск без связи запускает игры и покупает пакет, связь
+   возвращается — очередь уходит по порядку, время без связи списывается
+   один раз, повтор пачки ничего не меняет.
+
+Запуск:  py benchmarks/bench_kiosk_store.py --syncs 720
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+from _sandbox import load_server, cleanup, REPO_ROOT
+from load_payments import PooledWSGIServer, serve
+
+USERNAME = "gamer"
+
+CRASH_WRITER = """
+import sys, time
+sys.path.insert(0, sys.argv[2])
+from utils.kiosk_store import KioskStore
+store = KioskStore(sys.argv[1])
+n = 0
+while True:
+    n += 1
+    store.enqueue("launch", {"user": "gamer", "app_name": f"game{n}"})
+    store.set("counter", n)
+    print(n, flush=True)
+"""
+
+
+def legacy_sync(path, balance, time_left):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"balance": balance, "time_left": time_left}, f)
+
+
+def disk_writes(workdir, syncs):
+    from utils.kiosk_store import KioskStore
+    legacy_path = os.path.join(workdir, f"{USERNAME}.json")
+    started = time.perf_counter()
+    for n in range(syncs):
+        legacy_sync(legacy_path, 1000 if n < syncs // 2 else 850, 3600 - n * 5)
+    legacy_ms = (time.perf_counter() - started) * 1000
+
+    store = KioskStore(os.path.join(workdir, "writes.db"))
+    base = store.writes
+    clock = time.time()
+    real_time = time.time
+    try:
+        started = time.perf_counter()
+        for n in range(syncs):
+            # Часы идут на 5 сек за синхронизацию; сервер каждый раз присылает остаток с дрожанием в 1 сек
+            time.time = lambda: clock + n * 5
+            store.save_account(USERNAME, 1000 if n < syncs // 2 else 850, 3600 - n * 5 - n % 2, True)
+        store_ms = (time.perf_counter() - started) * 1000
+        balance, time_left = store.account(USERNAME)
+    finally:
+        time.time = real_time
+    writes = store.writes - base
+    store.close()
+    print(f"Час игры, {syncs} синхронизаций:")
+    print(f"  до    (файл .json целиком): записей {syncs:4d}, {legacy_ms:7.1f} мс (без fsync)")
+    print(f"  после (kiosk.db):           записей {writes:4d}, {store_ms:7.1f} мс (с fsync)")
+    assert writes <= 2, "хранилище пишет на каждой синхронизации"
+    assert balance == 850, "баланс не сохранен"
+    return writes
+
+
+def crash_safety(workdir, rounds):
+    from utils.kiosk_store import KioskStore
+    path = os.path.join(workdir, "crash.db")
+    for _ in range(rounds):
+        proc = subprocess.Popen([sys.executable, "-c", CRASH_WRITER, path, REPO_ROOT], stdout=subprocess.PIPE, text=True)
+        last = 0
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            last = int(proc.stdout.readline())
+        os.kill(proc.pid, signal.SIGKILL)
+        proc.wait()
+        store = KioskStore(path)
+        counter = store.get("counter")
+        with sqlite3.connect(path) as conn:
+            integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        games = [payload["app_name"] for _, _, payload in store.pending(limit=10 ** 6)]
+        store.ack(10 ** 12); store.delete("counter"); store.close()
+        # Подтвержденное процессом (напечатанное) — в базе; запись, оборванная на середине, — целиком или никак
+        assert integrity == "ok" and counter >= last and counter - last <= 1, (integrity, counter, last)
+        assert games == [f"game{n}" for n in range(1, counter + 1)], "очередь с дырой или лишним"
+    print(f"Сбой питания (kill -9) {rounds} раз: база цела, очередь и значения совпадают с подтвержденным")
+
+
+def offline_replay(server, store_path):
+    import utils.api_client as api_client
+    from utils.kiosk_store import KioskStore
+    from utils.workers import replay_outbox, kiosk_sync
+    from werkzeug.security import generate_password_hash
+
+    with server.db_connection() as conn:
+        conn.execute("INSERT INTO users (username, password_hash, balance, time_left) VALUES (?, ?, 1000, 3600)",
+                     (USERNAME, generate_password_hash("x", method="pbkdf2:sha256:1000")))
+    httpd = PooledWSGIServer("127.0.0.1", 0, server.app, 4)
+    base = serve(httpd)
+    try:
+        store = KioskStore(store_path)
+        api_client.get_session(); api_client._base_url = base
+
+        def exchange():
+            """Как MainWindow.sync_exchange + on_kiosk_synced."""
+            payload = {"pc_name": "PC-001", "status": "Используется", "user": USERNAME, "time_left": None}
+            offline = store.offline_report(USERNAME)
+            if offline: payload["offline"] = offline
+            if store.outbox_size(): replay_outbox(store, "PC-001")
+            data = kiosk_sync(payload)
+            if offline: store.clear_offline(offline["since"])
+            return data
+
+        assert exchange()["time_left"] == 3600
+        # Сервер пропал: киоск помечает момент потери связи, сервер останавливает сессию на последнем пульсе
+        api_client._base_url = "http://127.0.0.1:9"
+        try:
+            exchange(); raise AssertionError("сервер должен быть недоступен")
+        except RuntimeError:
+            store.mark_offline(USERNAME)
+        now = int(time.time())
+        with server.db_connection() as conn:
+            server.pause_session(conn, USERNAME, now - 600)
+        store.set("offline_since", dict(store.get("offline_since"), at=now - 600))
+        for game in ("Dota 2", "PUBG", "Valorant"):
+            store.enqueue("launch", {"user": USERNAME, "app_name": game, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())})
+        # Покупка без связи: сначала в очередь уходят 10 минут без связи, затем покупка
+        store.flush_offline_time(still_offline=True)
+        store.enqueue("purchase", {"user": USERNAME, "price": 150, "seconds": 1800, "package_name": "30 мин",
+                                   "order_id": f"kiosk_{store.get('store_id')}_1", "token": None})
+        store.set("offline_since", dict(store.get("offline_since"), at=now - 300))
+        queued = store.outbox_size()
+
+        api_client._base_url = base
+        writes_before = store.writes
+        data = exchange()
+        expected = 3600 - 600 + 1800 - 300
+        print(f"Без связи: 15 мин игры, 3 запуска и покупка пакета в очереди ({queued} изменений)")
+        print(f"  после восстановления связи: баланс {data['balance']}, остаток {data['time_left']} сек "
+              f"(ожидается 850 и ~{expected}), записей в kiosk.db при отправке: {store.writes - writes_before}")
+        assert data["balance"] == 850 and abs(data["time_left"] - expected) <= 3, data
+        assert store.outbox_size() == 0 and store.get("offline_since") is None
+
+        # Ответ сервера потерялся: киоск шлет ту же пачку еще раз — ничего не применяется повторно
+        mutations = [{"id": 1, "kind": "launch", "user": USERNAME, "app_name": "Dota 2"},
+                     {"id": 5, "kind": "purchase", "user": USERNAME, "price": 150, "seconds": 1800,
+                      "package_name": "30 мин", "order_id": f"kiosk_{store.get('store_id')}_1"}]
+        import requests
+        response = requests.post(f"{base}/api/kiosk/outbox", json={"store_id": store.get("store_id"), "pc_name": "PC-001",
+                                                                  "mutations": mutations}).json()
+        again = requests.post(f"{base}/api/buy_package", json={"username": USERNAME, "seconds": 1800, "price": 150,
+                                                               "package_name": "30 мин", "pc_name": "PC-001",
+                                                               "order_id": f"kiosk_{store.get('store_id')}_1"}).json()
+        with server.db_read() as conn:
+            launches = conn.execute("SELECT COUNT(*) FROM launch_logs WHERE user = ?", (USERNAME,)).fetchone()[0]
+            purchases = conn.execute("SELECT COUNT(*) FROM transactions WHERE username = ?", (USERNAME,)).fetchone()[0]
+            balance = conn.execute("SELECT balance FROM users WHERE username = ?", (USERNAME,)).fetchone()[0]
+        print(f"  повтор пачки: повторов {len(response['duplicates'])}, применено {len(response['applied'])}; "
+              f"повтор покупки онлайн: duplicate={again.get('duplicate')}; запусков {launches}, покупок {purchases}, баланс {balance}")
+        assert response["duplicates"] == [1, 5] and again.get("duplicate") and (launches, purchases, balance) == (3, 1, 850)
+        store.close()
+    finally:
+        httpd.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--syncs", type=int, default=720, help="синхронизаций (по 5 сек)")
+    parser.add_argument("--crashes", type=int, default=5, help="сколько раз убить пишущий процесс")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("server").setLevel(logging.CRITICAL)
+
+    server, workdir = load_server()
+    try:
+        server.next_log_maintenance = float("inf")
+        disk_writes(workdir, args.syncs)
+        crash_safety(workdir, args.crashes)
+        offline_replay(server, os.path.join(workdir, "kiosk.db"))
+        print("OK")
+    finally:
+        server.shutdown_worker()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
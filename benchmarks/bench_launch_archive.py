@@ -0,0 +1,131 @@
+"""
+Бенчмарк журнала запусков за год работы клуба.
+
+  "до"    — вся история в одной launch_logs; чтобы убрать старое, остается
+            построчный DELETE (или /clear_logs, который стирает все);
+  "после" — launch_logs хранит текущий месяц, прошлые месяцы лежат в архивах
+            launch_logs_ГГГГММ, старше срока хранения — DROP TABLE
+            (server.maintain_launch_logs, utils/launch_archive.py).
+
+Замеряется страница /logs и удаление устаревших месяцев, затем проверяется,
+что перенос и удаление не меняют топ-игру дашборда и сводки по приложениям и ПК.
+
+Запуск:  py benchmarks/bench_launch_archive.py --months 12 --per-month 50000 --keep 6
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from _sandbox import load_server, cleanup
+
+ADMIN = ("bench_admin", "bench_password")
+GAMES = ["Dota 2", "Counter-Strike 2", "Valorant", "PUBG", "Fortnite", "Apex Legends"]
+
+
+def month_rows(rng, first_day, last_moment, count, pcs):
+    span = max(1, int((last_moment - first_day).total_seconds()))
+    for _ in range(count):
+        ts = first_day + timedelta(seconds=rng.randrange(span))
+        pc = rng.randrange(pcs)
+        yield (f"PC-{pc:03d}", f"10.0.0.{pc}", f"user_{pc}", rng.choice(GAMES), ts.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def timed(fn, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) * 1000 / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=12, help="месяцев истории, включая текущий")
+    parser.add_argument("--per-month", type=int, default=50000, help="запусков в месяц")
+    parser.add_argument("--keep", type=int, default=6, help="[Logs] RetentionMonths")
+    parser.add_argument("--pcs", type=int, default=100)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    server, workdir = load_server(f"[Admin]\nAdminUsername = {ADMIN[0]}\nAdminPassword = {ADMIN[1]}\n"
+                                  f"[Logs]\nRetentionMonths = {args.keep}\n")
+    try:
+        from utils.launch_archive import month_start, archive_tables, launch_summary, rotate_launch_logs, apply_retention, ROTATE_BATCH
+        from utils.migrations import backup_database
+        server.next_log_maintenance = float("inf")  # перенос запускает сам бенчмарк, а не такт буфера пульсов
+        rng = random.Random(1)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with server.db_connection() as conn:
+            for back in range(args.months - 1, -1, -1):
+                first_day = datetime.strptime(month_start(now, back), "%Y-%m-%d")
+                last_moment = min(now, datetime.strptime(month_start(now, back - 1), "%Y-%m-%d")) if back else now
+                conn.executemany("INSERT INTO launch_logs (computer_name, ip_address, user, app_name, timestamp) VALUES (?, ?, ?, ?, ?)",
+                                 month_rows(rng, first_day, last_moment, args.per_month, args.pcs))
+        total = args.months * args.per_month
+        with server.db_read() as conn:
+            counts_before = dict(conn.execute("SELECT app_name, launches FROM app_launch_counts").fetchall())
+            summary_before = launch_summary(conn, "2000-01-01")
+            expired = conn.execute("SELECT COUNT(*) FROM launch_logs WHERE timestamp < ?", (month_start(now, args.keep - 1),)).fetchone()[0]
+            logs_before = [row[0] for row in conn.execute("SELECT timestamp FROM launch_logs ORDER BY timestamp DESC LIMIT 100")]
+
+        logs_ms_before, _ = timed(server.get_logs)
+        # "до": те же месяцы удаляются построчно — на копии базы, чтобы не трогать замер "после"
+        copy_path = os.path.join(workdir, "legacy_copy.db")
+        with server.db_read() as conn:
+            backup_database(conn, copy_path)
+        legacy = sqlite3.connect(copy_path)
+        started = time.perf_counter()
+        with legacy:
+            legacy.execute("DELETE FROM launch_logs WHERE timestamp < ?", (month_start(now, args.keep - 1),))
+        delete_ms = (time.perf_counter() - started) * 1000
+        legacy.close()
+
+        # "после": раз в месяц прошлый месяц переносится в архив порциями, устаревшие архивы — DROP TABLE
+        server.db_pool.stats(reset=True)
+        started = time.perf_counter()
+        moved = batch = ROTATE_BATCH
+        while batch == ROTATE_BATCH:
+            with server.db_connection() as conn: batch = rotate_launch_logs(conn)
+            moved += batch
+        moved -= ROTATE_BATCH
+        rotate_ms = (time.perf_counter() - started) * 1000
+        writes = server.db_pool.stats(reset=True)
+        started = time.perf_counter()
+        with server.db_connection() as conn:
+            dropped = apply_retention(conn, args.keep, 90)
+        drop_ms = (time.perf_counter() - started) * 1000
+        assert server.maintain_launch_logs() == (0, []), "повторное обслуживание журнала что-то изменило"
+        logs_ms_after, logs_after = timed(server.get_logs)
+
+        with server.db_read() as conn:
+            hot = conn.execute("SELECT COUNT(*) FROM launch_logs").fetchone()[0]
+            archived = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for _, table in archive_tables(conn))
+            counts_after = dict(conn.execute("SELECT app_name, launches FROM app_launch_counts").fetchall())
+            summary_after = launch_summary(conn, "2000-01-01")
+        client = server.app.test_client()
+        stats_ms, response = timed(lambda: client.get("/api/admin/launch_stats", query_string={"days": 400}, auth=ADMIN))
+
+        print(f"Запусков: {total} за {args.months} мес., хранится {args.keep} мес.")
+        print(f"  /logs (100 последних): до {logs_ms_before:6.2f} мс, после {logs_ms_after:6.2f} мс")
+        print(f"  удаление {expired} устаревших записей: до — DELETE {delete_ms:7.1f} мс, после — DROP {len(dropped)} архивов {drop_ms:7.1f} мс")
+        print(f"  перенос {moved} записей прошлых месяцев в архив: {rotate_ms:7.1f} мс, {writes['writes']} транзакций "
+              f"по {ROTATE_BATCH}, писатель занят в среднем {writes['writer_held_ms'] / max(1, writes['writes']):.1f} мс за раз")
+        print(f"  launch_logs: {hot} записей текущего месяца, в архивах {archived}")
+        print(f"  /api/admin/launch_stats за год: {stats_ms:6.2f} мс")
+
+        assert hot + archived == total - expired, "сырые записи потеряны или не удалены"
+        assert counts_after == counts_before, "перенос в архив изменил топ-игру дашборда"
+        assert summary_after == summary_before and sum(summary_after[0].values()) == total, "сводки изменились"
+        assert [row["timestamp"] for row in logs_after] == logs_before, "/logs показывает не последние запуски"
+        assert response.status_code == 200 and sum(a["launches"] for a in response.get_json()["apps"]) == total
+        print("OK: сводки и счетчики дашборда совпадают, /logs показывает последние запуски.")
+    finally:
+        server.heartbeat_buffer.stop(); server.db_pool.close()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
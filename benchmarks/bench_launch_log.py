@@ -0,0 +1,73 @@
+"""
+Бенчмарк журнала запусков в вечерний пик.
+
+  "до"    — POST /log_launch на каждый запуск: отдельный INSERT и commit;
+  "после" — киоск копит запуски в очереди utils/kiosk_store.py и отправляет
+            пачку на /api/kiosk/outbox: все вставки в одной транзакции.
+
+Замеряется время на запуск и сколько блокировка записи базы была занята
+(ConnectionPool.stats) — это время, на которое журнал задерживает покупки и
+пульсы. Отдельно проверяется, что очередь переживает перезапуск киоска.
+
+Запуск:  py benchmarks/bench_launch_log.py --kiosks 100 --launches 20
+"""
+import argparse
+import logging
+import os
+import time
+
+from _sandbox import load_server, cleanup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kiosks", type=int, default=100)
+    parser.add_argument("--launches", type=int, default=20, help="запусков на киоск")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    server, workdir = load_server()
+    try:
+        from utils.kiosk_store import KioskStore
+        client = server.app.test_client()
+        total = args.kiosks * args.launches
+
+        server.db_pool.stats(reset=True)
+        started = time.perf_counter()
+        for i in range(total):
+            client.post("/log_launch", json={"computer_name": f"PC-{i % args.kiosks:03d}", "ip_address": "10.0.0.1",
+                                             "user": "user", "app_name": "Dota 2"})
+        before = (time.perf_counter() - started) * 1000, server.db_pool.stats(reset=True)
+
+        stores = [KioskStore(os.path.join(workdir, "kiosks", f"PC-{k:03d}.db")) for k in range(args.kiosks)]
+        for store in stores:
+            for _ in range(args.launches):
+                store.enqueue("launch", {"user": "user", "app_name": "Dota 2", "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())})
+            store.close()
+        # Перезапуск киоска: хранилище, открытое заново, видит все неотправленное
+        stores = [KioskStore(store.path) for store in stores]
+        assert all(store.outbox_size() == args.launches for store in stores), "очередь не пережила перезапуск"
+        started = time.perf_counter()
+        for k, store in enumerate(stores):
+            batch = store.pending()
+            response = client.post("/api/kiosk/outbox", json={"store_id": store.get("store_id"), "pc_name": f"PC-{k:03d}",
+                                                              "mutations": [dict(p, id=i, kind=kind) for i, kind, p in batch]})
+            assert len(response.get_json()["applied"]) == len(batch)
+            store.ack(batch[-1][0])
+        after = (time.perf_counter() - started) * 1000, server.db_pool.stats(reset=True)
+        assert all(store.outbox_size() == 0 for store in stores)
+        for store in stores: store.close()
+
+        with server.db_read() as conn:
+            logged = conn.execute("SELECT COUNT(*) FROM launch_logs").fetchone()[0]
+        print(f"Киосков: {args.kiosks}, запусков: {total} (+{total}), в launch_logs: {logged}")
+        for name, (elapsed, stats) in (("до    (запрос на запуск)", before), ("после (пачка с киоска)", after)):
+            print(f"  {name}: {elapsed / total:6.3f} мс/запуск, записей в базу {stats['writes']:5d}, "
+                  f"блокировка записи занята {stats['writer_held_ms']:7.1f} мс")
+    finally:
+        server.heartbeat_buffer.stop(); server.db_pool.close()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Бенчмарк закрытия запущенных приложений по окончании времени (без Windows и
+psutil: Qt offscreen, процессы — core/process_monitor.FakeProcessBackend).
+
+  "до"    — kill_disallowed_apps в старом виде: обход всех процессов системы,
+            имя у каждого, kill по жесткому списку имен;
+  "после" — LaunchRegistry: деревья процессов, запущенных лаунчером
+            (лаунчер -> игра -> вспомогательные процессы), закрываются
+            параллельно — просьба завершиться всем сразу, общее ожидание,
+            kill оставшихся.
+
+Сессия на загруженном ПК: фоновые процессы системы, игры через лаунчеры,
+которые сразу выходят, игры с дочерними процессами; часть игр закрывается
+сама. Замеряется время закрытия, сколько запущенных процессов осталось и
+сколько закрыто чужих; затем время в каждом приложении сверяется с настоящим
+и проходит через очередь киоска до дневной сводки сервера.
+
+Запуск:  py benchmarks/bench_launch_registry.py --processes 300 --lookup-us 20
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from _sandbox import load_server, cleanup, REPO_ROOT
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from PyQt5.QtWidgets import QApplication
+
+from core.process_monitor import ProcessMonitor, FakeProcessBackend, POLL_INTERVAL
+from core.launch_registry import LaunchRegistry
+
+DISALLOWED = ["chrome.exe", "firefox.exe", "opera.exe", "steam.exe", "notepad.exe", "game.exe"]
+# (имя в каталоге, процессы дерева: (имя, родитель — индекс в списке или None, задержка штатного закрытия))
+APPS = [
+    ("Dota 2", [("dota2.exe", None, 0.05), ("steamwebhelper.exe", 0, 0.0)]),
+    ("Valorant", [("RiotClientServices.exe", None, 0.0), ("VALORANT.exe", 0, 0.2), ("vgtray.exe", 1, 0.0)]),
+    ("Fortnite", [("EpicGamesLauncher.exe", None, 0.0), ("FortniteClient-Win64-Shipping.exe", 0, 0.3),
+                  ("EasyAntiCheat.exe", 1, 0.0)]),
+    ("Browser", [("chrome.exe", None, 0.0), ("chrome.exe", 0, 0.0), ("chrome.exe", 0, 0.0)]),
+    ("PUBG", [("TslGame.exe", None, 0.1), ("BEService.exe", 0, 0.0)]),
+]
+LAUNCHERS_EXIT = {"RiotClientServices.exe", "EpicGamesLauncher.exe"}  # лаунчер запускает игру и выходит
+
+
+class CostlyBackend(FakeProcessBackend):
+    """Описание процесса стоит как у psutil на Windows (OpenProcess + имя образа): ~cost мкс."""
+
+    def __init__(self, cost_us, clock):
+        super().__init__(clock=clock)
+        self.cost = cost_us / 1e6
+
+    def describe(self, pid):
+        until = time.perf_counter() + self.cost
+        while time.perf_counter() < until:
+            pass
+        return super().describe(pid)
+
+
+def legacy_kill(backend):
+    """Старый kill_disallowed_apps: имя у каждого процесса системы, kill по списку."""
+    started = time.perf_counter()
+    for pid in backend.pids():
+        info = backend.describe(pid)
+        if info and info[0] in DISALLOWED:
+            backend.kill(pid, info[2])
+    return (time.perf_counter() - started) * 1000
+
+
+class Session:
+    """Сессия за ПК в симулированном времени: монитор опрашивается раз в POLL_INTERVAL секунд."""
+
+    def __init__(self, background, cost_us, stubborn, seed):
+        self.now = 0
+        self.rng = random.Random(seed)
+        self.backend = CostlyBackend(cost_us, clock=lambda: self.now)
+        self.monitor = ProcessMonitor(self.backend, interval=0)
+        self.registry = LaunchRegistry(self.monitor, clock=lambda: self.now)
+        self.finished = []
+        self.registry.app_finished.connect(lambda name, started, seconds: self.finished.append((name, started, seconds)))
+        self.next_pid = 4000
+        self.launched = {}  # pid -> имя приложения (все процессы, которые запустил киоск)
+        self.true_runtime = {}
+        for n in range(background):
+            self.backend.spawn(100 + n, "chrome.exe" if n % 50 == 0 else f"svc{n % 40}.exe")
+        self.stubborn = stubborn
+        self.monitor.poll(self.now)
+
+    def advance(self, seconds):
+        for _ in range(seconds):
+            self.now += 1
+            if self.now % POLL_INTERVAL == 0:
+                self.monitor.poll(self.now)
+                self.registry.expire()
+
+    def launch(self, name, tree):
+        """Как AppLauncherThread + MainWindow.on_app_launched; процессы дерева стартуют по одному в секунду."""
+        pids = []
+        for index, (proc_name, parent, delay) in enumerate(tree):
+            pid = self.next_pid; self.next_pid += 4
+            close_delay = None if self.stubborn and proc_name == "VALORANT.exe" else delay
+            self.backend.spawn(pid, proc_name, ppid=pids[parent] if parent is not None else 1, close_delay=close_delay)
+            pids.append(pid); self.launched[pid] = name
+            if index == 0:
+                self.registry.track(name, pid)
+                self.true_runtime[name] = [self.now, None]
+            if proc_name in LAUNCHERS_EXIT and index + 1 < len(tree):
+                self.advance(1)
+            elif index + 1 < len(tree):
+                self.advance(self.rng.randint(1, 3))
+            if proc_name in LAUNCHERS_EXIT:
+                self.backend.exit(pid)
+        return pids
+
+    def quit_app(self, pids, name):
+        """Игрок сам закрыл игру: процессы дерева выходят."""
+        for pid in pids:
+            self.backend.exit(pid)
+        self.true_runtime[name][1] = self.now
+
+    def left_running(self):
+        return sorted(pid for pid in self.launched if pid in self.backend._procs)
+
+
+def play(args, stubborn):
+    """Сессия до окончания времени."""
+    session = Session(args.processes, args.lookup_us, stubborn, args.seed)
+    trees = {}
+    for name, tree in APPS:
+        trees[name] = session.launch(name, tree)
+        session.advance(session.rng.randint(60, 300))
+    # Dota 2 и PUBG игрок закрыл сам, остальное работает до конца времени
+    for name in ("Dota 2", "PUBG"):
+        session.quit_app(trees[name], name)
+        session.advance(session.rng.randint(30, 120))
+    session.advance(10)
+    # Вышло время: лаунчер Valorant успел запустить еще один процесс, монитор его еще не видел
+    extra = session.next_pid
+    session.backend.spawn(extra, "VALORANT-crashreport.exe", ppid=trees["Valorant"][1])
+    session.launched[extra] = "Valorant"
+    for name, runtime in session.true_runtime.items():
+        if runtime[1] is None:
+            runtime[1] = session.now
+    return session
+
+
+def teardown(args, stubborn):
+    session = play(args, stubborn)
+    lookups = session.backend.lookups
+    report = session.registry.teardown(timeout=args.timeout, kill_timeout=args.timeout)
+    report["lookups"] = session.backend.lookups - lookups
+    return session, report
+
+
+def teardown_async(args, stubborn):
+    """Как on_core_time_up: start_teardown в цикле событий; самая долгая пауза цикла — сколько окно не отвечало."""
+    session = play(args, stubborn)
+    reports = []
+    session.registry.teardown_finished.connect(reports.append)
+    longest = 0.0
+    tick = time.perf_counter()
+    session.registry.start_teardown(timeout=args.timeout, kill_timeout=args.timeout)
+    longest = time.perf_counter() - tick
+    deadline = time.monotonic() + args.timeout * 2 + 5
+    while not reports and time.monotonic() < deadline:
+        tick = time.perf_counter()
+        QApplication.processEvents()
+        longest = max(longest, time.perf_counter() - tick)
+        time.sleep(0.001)
+    return session, reports[0] if reports else None, longest * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=300, help="фоновых процессов системы")
+    parser.add_argument("--lookup-us", type=float, default=20, help="стоимость описания одного процесса, мкс")
+    parser.add_argument("--timeout", type=float, default=0.5, help="ожидание штатного закрытия до kill, сек")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv)
+    logging.disable(logging.INFO)
+
+    # "до": то же состояние ПК к концу времени, закрытие по списку имен
+    legacy = play(args, stubborn=False)
+    lookups = legacy.backend.lookups
+    legacy_ms = legacy_kill(legacy.backend)
+    legacy_lookups = legacy.backend.lookups - lookups
+    legacy_left = legacy.left_running()
+    collateral = [pid for pid, _ in legacy.backend.killed if pid not in legacy.launched]
+    print(f"Конец времени, фоновых процессов {args.processes}, запущено приложений {len(APPS)}:")
+    print(f"  до    (обход всех процессов, список имен): {legacy_ms:7.1f} мс, описаний процессов {legacy_lookups}, "
+          f"запущенных процессов осталось {len(legacy_left)} "
+          f"({', '.join(sorted({legacy.backend._procs[pid][0] for pid in legacy_left}))}), закрыто чужих {len(collateral)}")
+
+    session, report = teardown(args, stubborn=False)
+    print(f"  после (деревья, игры сохраняются до 0.3 сек): {report['ms']:7.1f} мс, описаний процессов {report['lookups']}, "
+          f"штатно {report['terminated']}, принудительно {report['killed']}, осталось {len(report['left'])}")
+    stubborn, stubborn_report = teardown(args, stubborn=True)
+    print(f"  после (VALORANT не отвечает на закрытие):    {stubborn_report['ms']:7.1f} мс, штатно {stubborn_report['terminated']}, "
+          f"принудительно {stubborn_report['killed']} (таймаут {args.timeout} сек)")
+    assert legacy_left, "старый путь закрыл все запущенные игры — сценарий не показывает разницы"
+    assert not session.left_running() and not stubborn.left_running(), "после закрытия остались запущенные процессы"
+    assert report["killed"] == 0 and report["ms"] < 300 + 200, "штатное закрытие ждет дольше самой медленной игры"
+    assert stubborn_report["killed"] == 1 and stubborn_report["ms"] < (args.timeout * 2 + 0.5) * 1000
+    assert report["lookups"] * 10 < legacy_lookups, "закрытие описывает все процессы системы"
+    assert not any(pid not in session.launched for pid, _ in session.backend.terminated + session.backend.killed), "закрыт чужой процесс"
+
+    # В киоске закрытие идет по таймеру в цикле событий: окно отвечает, пока ждет VALORANT
+    async_session, async_report, frozen_ms = teardown_async(args, stubborn=True)
+    print(f"  после, в цикле событий (VALORANT не отвечает): {async_report['ms']:7.1f} мс, штатно {async_report['terminated']}, "
+          f"принудительно {async_report['killed']}, самая долгая пауза цикла событий {frozen_ms:.1f} мс")
+    assert async_report["killed"] == 1 and not async_session.left_running()
+    assert frozen_ms < 100, "закрытие блокирует GUI-поток"
+
+    # Время в приложениях: запись с точностью до опроса монитора
+    recorded = {name: seconds for name, _, seconds in session.finished}
+    print("  время в приложениях (записано / на самом деле, сек): " +
+          ", ".join(f"{name} {recorded[name]}/{end - start}" for name, (start, end) in session.true_runtime.items()))
+    assert set(recorded) == {name for name, _ in APPS}
+    assert all(abs(recorded[name] - (end - start)) <= POLL_INTERVAL for name, (start, end) in session.true_runtime.items())
+
+    server, workdir = load_server()
+    try:
+        server.next_log_maintenance = float("inf")
+        client = server.app.test_client()
+        mutations = [{"id": n, "kind": "app_runtime", "user": "gamer", "app_name": name, "seconds": seconds,
+                      "started": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - 3600 + started))}
+                     for n, (name, started, seconds) in enumerate(session.finished, 1)]
+        body = {"store_id": "bench", "pc_name": "PC-001", "mutations": mutations}
+        first = client.post("/api/kiosk/outbox", json=body).get_json()
+        again = client.post("/api/kiosk/outbox", json=body).get_json()
+        from utils.launch_archive import playtime_summary
+        with server.db_read() as conn:
+            playtime = playtime_summary(conn, "2000-01-01")
+        print(f"  сервер: применено {len(first['applied'])}, повтор пачки — повторов {len(again['duplicates'])}; "
+              f"сводка: {dict(sorted((name, seconds) for name, (seconds, _) in playtime.items()))}")
+        assert playtime == {name: (seconds, 1) for name, _, seconds in session.finished} and len(again["duplicates"]) == len(mutations)
+        print("OK: закрыты ровно запущенные деревья, время в приложениях совпадает и дошло до сводки сервера.")
+    finally:
+        server.shutdown_worker()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
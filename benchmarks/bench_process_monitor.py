@@ -0,0 +1,262 @@
+"""
+Бенчмарк монитора процессов (без Windows и psutil: Qt offscreen, процессы —
+core/process_monitor.FakeProcessBackend).
+
+  "до"    — копии старых потребителей: значки трея раз в 5 секунд, трей-окно
+            при открытии, проверка запуска игры из Steam и закрытие запрещенных
+            программ по окончании времени — каждый обходит все процессы и
+            запрашивает имя у каждого (как psutil.process_iter());
+  "после" — ProcessMonitor: раз в 2 секунды список PID, описание только новых
+            процессов, раз в минуту сверка времени старта; потребители
+            подписаны на события или читают таблицу.
+
+Сценарий — час за ПК: фоновые процессы системы, Steam и Discord запускаются и
+закрываются, игры стартуют из Steam, трей открывают несколько раз, в конце время
+выходит. Сверяются значки трея, ответы проверки игр и набор закрытых программ.
+В конце — события из фонового потока монитора и повторно выданный PID.
+
+Запуск:  py benchmarks/bench_process_monitor.py --minutes 60 --processes 250 --lookup-us 20
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from PyQt5.QtWidgets import QApplication, QPushButton
+
+from core.process_monitor import ProcessMonitor, FakeProcessBackend, POLL_INTERVAL
+from core.tray_manager import TrayManager
+
+TRAY_INTERVAL = 5  # сек, как у старого tray_check_timer
+CUSTOM_TRAY_APPS = ["steam.exe"]
+DISALLOWED = ["chrome.exe", "firefox.exe", "opera.exe", "steam.exe", "notepad.exe", "game.exe"]
+GAMES = ["dota2.exe", "cs2.exe", "pubg.exe", "game.exe"]
+APPS = ["steam.exe", "discord.exe", "Telegram.exe", "chrome.exe", "notepad.exe"]
+
+
+class CostlyBackend(FakeProcessBackend):
+    """Описание процесса стоит как у psutil на Windows (OpenProcess + имя образа): ~cost мкс."""
+
+    def __init__(self, cost_us):
+        super().__init__()
+        self.cost = cost_us / 1e6
+
+    def describe(self, pid):
+        until = time.perf_counter() + self.cost
+        while time.perf_counter() < until:
+            pass
+        return super().describe(pid)
+
+
+class LegacyConsumers:
+    """Копии старых обходов: имя запрашивается у каждого процесса при каждом обходе."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def names(self):
+        return [(pid, self.backend.describe(pid)) for pid in self.backend.pids()]
+
+    def custom_tray(self):
+        running = [info[0].lower() for _, info in self.names() if info]
+        return sorted(exe for exe in CUSTOM_TRAY_APPS if exe in running)
+
+    def tray_popup(self):
+        running = [info[0] for _, info in self.names() if info]
+        return sorted(name for name in ("discord.exe", "steam.exe", "OneDrive.exe", "Telegram.exe") if name in running)
+
+    def game_running(self, name):
+        return any(name.lower() in info[0].lower() for _, info in self.names() if info)
+
+    def kill(self):
+        killed = []
+        for pid, info in self.names():
+            if info and info[0] in DISALLOWED and self.backend.kill(pid, info[2]):
+                killed.append(info[0])
+        return sorted(killed)
+
+
+class TrackedTray:
+    """Как MainWindow.on_tray_app_started / on_tray_app_exited."""
+
+    def __init__(self, monitor):
+        self.buttons = {}
+        monitor.subscribe(CUSTOM_TRAY_APPS, on_start=self.started, on_exit=self.exited)
+
+    def started(self, pid, name):
+        if name.lower() not in self.buttons:
+            self.buttons[name.lower()] = (QPushButton(name), set())
+        self.buttons[name.lower()][1].add(pid)
+
+    def exited(self, pid, name):
+        button, pids = self.buttons.get(name.lower(), (None, set()))
+        pids.discard(pid)
+        if button is not None and not pids:
+            button.deleteLater(); del self.buttons[name.lower()]
+
+    def state(self):
+        return sorted(self.buttons)
+
+
+def scenario(rng, minutes, background):
+    """События часа: (секунда, действие, аргументы)."""
+    events = [(0, "spawn", (1000 + n, f"svc{n % 40}.exe")) for n in range(background)]
+    next_pid = 20000
+    t = 0
+    while t < minutes * 60:
+        t += rng.randint(5, 40)
+        roll = rng.random()
+        if roll < 0.35:
+            # Системные процессы живут недолго (обновления, службы, вспомогательные процессы браузера)
+            events.append((t, "spawn", (next_pid, rng.choice(["conhost.exe", "svchost.exe", "chrome.exe"]))))
+            events.append((t + rng.randint(3, 90), "exit", (next_pid,)))
+        elif roll < 0.55:
+            events.append((t, "spawn", (next_pid, rng.choice(APPS))))
+            events.append((t + rng.randint(60, 900), "exit", (next_pid,)))
+        elif roll < 0.7:
+            events.append((t, "steam_game", (next_pid, rng.choice(GAMES))))
+            events.append((t + rng.randint(300, 1500), "exit", (next_pid,)))
+        elif roll < 0.75:
+            events.append((t, "popup", ()))
+        next_pid += 1
+    events.append((minutes * 60, "spawn", (next_pid, "notepad.exe")))  # за секунду до конца времени
+    events.append((minutes * 60 + 1, "time_up", ()))
+    return sorted(events, key=lambda e: e[0])
+
+
+def run(minutes, background, seed, cost_us):
+    events = scenario(random.Random(seed), minutes, background)
+    results = {}
+    for name in ("до", "после"):
+        backend = CostlyBackend(cost_us)
+        if name == "до":
+            legacy = LegacyConsumers(backend)
+        else:
+            monitor = ProcessMonitor(backend, interval=0)
+            tray = TrackedTray(monitor)
+            popup = TrayManager(QPushButton(), monitor=monitor)
+        answers, popups, killed, trays = [], [], [], []
+        elapsed = 0.0
+        index = 0
+        for now in range(0, minutes * 60 + 2):
+            started = time.perf_counter()
+            while index < len(events) and events[index][0] <= now:
+                _, action, args = events[index]; index += 1
+                if action == "spawn":
+                    backend.spawn(*args)
+                elif action == "exit":
+                    backend.exit(*args)
+                elif action == "steam_game":
+                    # run_steam_game: игра стартует, через 3 секунды (здесь — сразу) проверка по имени
+                    backend.spawn(*args)
+                    query = args[1].replace(".exe", "")
+                    if name == "до":
+                        answers.append(legacy.game_running(query))
+                    else:
+                        monitor.poll(now)  # как check_if_game_running
+                        answers.append(monitor.is_running(f"*{query}*"))
+                elif action == "popup":
+                    if name == "до":
+                        popups.append(legacy.tray_popup())
+                    else:
+                        # Время на виджеты трей-окна не считается: старое окно строило те же виджеты
+                        built = time.perf_counter()
+                        popup.refresh_icons()
+                        started += time.perf_counter() - built
+                        popups.append(_popup_names(popup))
+                else:
+                    killed = legacy.kill() if name == "до" else sorted(n for _, n in monitor.kill(DISALLOWED))
+            if name == "до":
+                if now % TRAY_INTERVAL == 0:
+                    trays.append(legacy.custom_tray())
+            else:
+                if now % POLL_INTERVAL == 0:
+                    monitor.poll(now)
+                if now % TRAY_INTERVAL == 0:
+                    trays.append(tray.state())
+            elapsed += time.perf_counter() - started
+        QApplication.processEvents()
+        results[name] = {"мс": elapsed * 1000, "обходов PID": backend.pid_scans, "запросов имени": backend.lookups,
+                         "answers": answers, "popups": popups, "killed": killed, "trays": trays}
+    return results
+
+
+def _popup_names(popup):
+    from PyQt5.QtWidgets import QLabel
+    labels = [label.text() for label in popup.findChildren(QLabel) if label.text()]
+    return sorted(f"{text}.exe" for text in labels if text != "Нет активных значков")
+
+
+def lag(before, after):
+    """Сколько пятисекундных отметок значки трея расходятся (монитор видит раньше старого опроса)."""
+    return sum(1 for a, b in zip(before, after) if a != b)
+
+
+def background_thread():
+    """Опрос в фоновом потоке: колбэки подписчиков — в GUI-потоке; повторно выданный PID — выход и старт."""
+    backend = FakeProcessBackend()
+    monitor = ProcessMonitor(backend, interval=0.01, resync_interval=0.05)
+    calls = []
+    monitor.subscribe("*.exe", on_start=lambda pid, name: calls.append(("start", pid, name, threading.current_thread() is threading.main_thread())),
+                      on_exit=lambda pid, name: calls.append(("exit", pid, name, threading.current_thread() is threading.main_thread())))
+    monitor.start()
+    for pid in range(1, 31):
+        backend.spawn(pid, f"app{pid}.exe")
+    wait_for(lambda: len(calls) >= 30)
+    # Процесс 7 вышел, его PID сразу достался другой программе — список PID не изменился
+    backend.exit(7); backend.spawn(7, "other.exe")
+    wait_for(lambda: len(calls) >= 32)
+    monitor.stop()
+    return calls, monitor
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        QApplication.processEvents(); time.sleep(0.005)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--processes", type=int, default=250, help="фоновых процессов системы")
+    parser.add_argument("--lookup-us", type=float, default=20, help="стоимость описания одного процесса, мкс")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    results = run(args.minutes, args.processes, args.seed, args.lookup_us)
+    print(f"{args.minutes} мин за ПК, фоновых процессов {args.processes}, описание процесса {args.lookup_us:g} мкс:")
+    for name, result in results.items():
+        print(f"  {name:<6} мс: {result['мс']:8.1f}   обходов списка PID: {result['обходов PID']:5d}   "
+              f"запросов имени/описания: {result['запросов имени']:7d}")
+    before, after = results["до"], results["после"]
+    print(f"  проверок игр из Steam: {len(after['answers'])}, открытий трея: {len(after['popups'])}, "
+          f"закрыто по окончании времени: {after['killed']}")
+    print(f"  отметок, где значки трея разошлись (старый опрос отстает до 5 сек): {lag(before['trays'], after['trays'])} "
+          f"из {len(after['trays'])}")
+    assert before["answers"] == after["answers"], "проверка запуска игр разошлась"
+    assert before["popups"] == after["popups"], "трей-окно разошлось"
+    assert before["killed"] == after["killed"] and "notepad.exe" in after["killed"], "закрыты разные программы"
+    assert after["trays"][-1] == before["trays"][-1]
+    assert after["запросов имени"] * 5 < before["запросов имени"], "монитор запрашивает почти столько же, сколько старые обходы"
+
+    calls, monitor = background_thread()
+    starts = [c for c in calls if c[0] == "start"]
+    print(f"  фоновый поток: стартов {len(starts)}, все колбэки в GUI-потоке: {all(c[3] for c in calls)}; "
+          f"повторно выданный PID: {[c[:3] for c in calls[30:]]}")
+    assert len(starts) == 31 and all(c[3] for c in calls)
+    assert ("exit", 7, "app7.exe") in [c[:3] for c in calls] and ("start", 7, "other.exe") in [c[:3] for c in calls]
+    print("OK: трей, проверка игр и закрытие программ совпадают со старыми обходами.")
+
+
+if __name__ == "__main__":
+    main()
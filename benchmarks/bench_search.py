@@ -0,0 +1,79 @@
+"""
+Бенчмарк поиска по каталогу лаунчера (utils/search_index.py) против старого
+подстрочного поиска `search_text in name.lower()` по всему списку.
+
+Каталог генерируется случайно: латинские и кириллические названия, теги.
+Запросы набираются по буквам, как это делает игрок, включая транслит,
+неправильную раскладку и опечатки.
+
+Запуск:  py benchmarks/bench_search.py --apps 3000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from utils.search_index import SearchIndex
+
+LATIN = ["dota", "counter", "strike", "world", "tanks", "cyber", "punk", "dead", "space", "call", "duty",
+         "grand", "theft", "auto", "minecraft", "valorant", "apex", "legends", "rust", "forza", "horizon"]
+CYRILLIC = ["танки", "онлайн", "мир", "кораблей", "аллоды", "герои", "меча", "магии", "сталкер", "метро"]
+QUERIES = ["dota", "дота", "ljnf", "counter str", "кс", "tanki", "сталкер", "cyberpnk", "valor"]
+
+
+def make_catalog(count, seed=42):
+    rnd = random.Random(seed)
+    catalog = []
+    for i in range(count):
+        vocabulary = CYRILLIC if i % 4 == 0 else LATIN
+        name = " ".join(rnd.choice(vocabulary) for _ in range(rnd.randint(1, 3))).title() + f" {i}"
+        tags = "кс, cs2, шутер" if "Counter" in name else None
+        catalog.append({"id": i + 1, "name": name, "tags": tags})
+    return catalog
+
+
+def measure(func, queries, repeat):
+    timings = []
+    for query in queries:
+        for length in range(1, len(query) + 1):
+            prefix = query[:length]
+            started = time.perf_counter()
+            for _ in range(repeat):
+                func(prefix)
+            timings.append((time.perf_counter() - started) * 1000 / repeat)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95)], timings[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.apps)
+    started = time.perf_counter()
+    index = SearchIndex(catalog)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    def legacy(text):
+        text = text.lower()
+        return [item["id"] for item in catalog if text in item["name"].lower()]
+
+    print(f"Приложений: {args.apps}, построение индекса: {build_ms:.1f} мс")
+    for label, func in (("до   (подстрока)", legacy), ("после (индекс)   ", index.search)):
+        p50, p95, worst = measure(func, QUERIES, args.repeat)
+        print(f"  {label}: p50 {p50:.3f} мс, p95 {p95:.3f} мс, максимум {worst:.3f} мс на нажатие")
+    for query in QUERIES:
+        hits = index.search(query, limit=3)
+        print(f"  {query!r:>14} -> {[next(a['name'] for a in catalog if a['id'] == h) for h in hits]}")
+
+
+if __name__ == "__main__":
+    main()
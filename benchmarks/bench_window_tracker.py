@@ -0,0 +1,270 @@
+"""
+Бенчмарк панели задач киоска (без экрана и без Windows: Qt offscreen,
+окна — core/window_tracker.FakeWindowBackend).
+
+  "до"    — копия TaskbarWorker + update_taskbar_icons: раз в 3 секунды обход
+            всех окон, exe по PID и поиск иконки для каждого окна, панель
+            пересоздает все кнопки;
+  "после" — WindowTracker: события создания/закрытия/смены заголовка, PID -> exe
+            и exe -> иконка один раз, панель трогает только изменившиеся кнопки.
+
+Сценарий — вечер за одним ПК: фоновые окна (Steam, Discord, браузер), игры
+открываются и закрываются, заголовки меняются. Замеряется время, число
+определений exe и загрузок иконок, созданных кнопок и задержка появления окна
+на панели. В конце — окна, пришедшие из другого потока (как из потока хуков
+Windows), и сверка панели с реальным списком окон.
+
+Запуск:  py benchmarks/bench_window_tracker.py --minutes 60 --windows 12
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from PyQt5.QtWidgets import QApplication, QWidget, QHBoxLayout, QPushButton
+from PyQt5.QtGui import QIcon, QPixmap, QColor
+from PyQt5.QtCore import QSize
+
+from core.window_tracker import WindowTracker, FakeWindowBackend
+from utils.icon_cache import IconCache
+
+POLL_INTERVAL = 3  # сек, как у старого taskbar_timer
+GAMES = ["dota2", "cs2", "valorant", "pubg", "fortnite", "apex"]
+
+
+class FakeProcesses:
+    """PID -> путь exe, как GetModuleFileNameEx; exe — настоящие файлы, чтобы кэш иконок делал os.stat."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.exe_by_pid = {}
+        self.lookups = 0
+        self.extracts = 0
+
+    def spawn(self, pid, name):
+        path = os.path.join(self.folder, f"{name}.exe")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(b"MZ" + name.encode())
+        self.exe_by_pid[pid] = path
+
+    def resolve(self, pid):
+        self.lookups += 1
+        path = self.exe_by_pid.get(pid)
+        return path if path and os.path.exists(path) else None
+
+    def extract(self, path):
+        self.extracts += 1
+        pixmap = QPixmap(32, 32)
+        pixmap.fill(QColor(hash(path) & 0xFFFFFF))
+        return QIcon(pixmap)
+
+
+def button(hwnd, title, icon):
+    btn = QPushButton()
+    btn.setFixedSize(48, 48); btn.setToolTip(title); btn.setIcon(icon); btn.setIconSize(QSize(40, 40))
+    btn.setStyleSheet("QPushButton { background:none; border: none; border-radius: 4px; } QPushButton:hover { background-color: #666; }")
+    return btn
+
+
+class LegacyTaskbar:
+    """Копия старого пути: обход всех окон, exe и иконка для каждого, пересоздание всех кнопок."""
+
+    def __init__(self, backend, procs, icons):
+        self.backend, self.procs, self.icons = backend, procs, icons
+        self.panel = QWidget(); self.layout = QHBoxLayout(self.panel)
+        self.known_hwnds = []
+        self.buttons_created = 0
+
+    def poll(self):
+        result = []
+        for hwnd, (title, pid) in self.backend.windows().items():
+            exe_path = self.procs.resolve(pid)
+            if not exe_path:
+                continue
+            icon = self.icons.exe_icon(exe_path, self.procs.extract)
+            if icon.isNull():
+                continue
+            result.append((hwnd, title, icon))
+        self.update_taskbar_icons(result)
+
+    def update_taskbar_icons(self, hwnd_title_icon_list):
+        hwnd_to_data = {hwnd: (title, icon) for hwnd, title, icon in hwnd_title_icon_list}
+        current_hwnds = list(hwnd_to_data.keys())
+        for hwnd in current_hwnds:
+            if hwnd not in self.known_hwnds:
+                self.known_hwnds.append(hwnd)
+        self.known_hwnds = [hwnd for hwnd in self.known_hwnds if hwnd in current_hwnds]
+        for i in reversed(range(self.layout.count())):
+            widget = self.layout.itemAt(i).widget()
+            if widget: widget.deleteLater()
+            self.layout.removeWidget(widget)
+        for hwnd in self.known_hwnds:
+            title, icon = hwnd_to_data[hwnd]
+            self.layout.addWidget(button(hwnd, title, icon))
+            self.buttons_created += 1
+
+    def state(self):
+        return [self.layout.itemAt(i).widget().toolTip() for i in range(self.layout.count())]
+
+
+class TrackedTaskbar:
+    """Как MainWindow.add/remove/retitle_taskbar_button."""
+
+    def __init__(self, tracker):
+        self.panel = QWidget(); self.layout = QHBoxLayout(self.panel)
+        self.buttons = {}
+        self.buttons_created = 0
+        self.appeared = {}  # hwnd -> момент, когда кнопка появилась
+        tracker.window_created.connect(self.add)
+        tracker.window_destroyed.connect(self.remove)
+        tracker.title_changed.connect(lambda hwnd, title: self.buttons[hwnd].setToolTip(title))
+
+    def add(self, hwnd, title, icon):
+        self.buttons[hwnd] = button(hwnd, title, icon)
+        self.layout.addWidget(self.buttons[hwnd])
+        self.buttons_created += 1
+        self.appeared[hwnd] = time.perf_counter()
+
+    def remove(self, hwnd):
+        btn = self.buttons.pop(hwnd)
+        self.layout.removeWidget(btn); btn.deleteLater()
+
+    def state(self):
+        return [self.layout.itemAt(i).widget().toolTip() for i in range(self.layout.count())]
+
+
+def scenario(rng, minutes, background):
+    """События вечера: (секунда, действие, аргументы). Фоновые окна открыты с начала."""
+    events = [(0, "open", (100 + n, f"Фон {n}", 1000 + n, f"bg{n}")) for n in range(background)]
+    next_hwnd, next_pid = 500, 5000
+    t = 0
+    games = []
+    while t < minutes * 60:
+        t += rng.randint(60, 240)
+        if games and (len(games) > 2 or rng.random() < 0.4):
+            events.append((t, "close", (games.pop(0),)))
+        else:
+            name = rng.choice(GAMES)
+            events.append((t, "open", (next_hwnd, name.upper(), next_pid, name)))
+            games.append(next_hwnd); next_hwnd += 1; next_pid += 1
+    for s in range(10, minutes * 60, 10):
+        # Браузер и Discord меняют заголовок (вкладки, уведомления)
+        events.append((s, "rename", (100 + s // 10 % max(1, background), f"Фон {s // 10 % max(1, background)} ({s // 10})")))
+    return sorted(events, key=lambda e: e[0])
+
+
+def run(minutes, background, seed):
+    rng = random.Random(seed)
+    events = scenario(rng, minutes, background)
+    folder = tempfile.mkdtemp(prefix="lovhub_windows_")
+    results = {}
+    for name in ("до", "после"):
+        backend = FakeWindowBackend()
+        procs = FakeProcesses(folder)
+        icons = IconCache(cache_dir=os.path.join(folder, f"icons_{name}"))
+        if name == "до":
+            panel = LegacyTaskbar(backend, procs, icons)
+            tracker = None
+        else:
+            tracker = WindowTracker(backend, resolve_exe=procs.resolve,
+                                    load_icon=lambda path: icons.exe_icon(path, procs.extract), resync_interval=0)
+            panel = TrackedTaskbar(tracker)
+            tracker.start()
+        delays = []
+        opened_at = {}
+        elapsed = 0.0
+        index = 0
+        for now in range(0, minutes * 60 + 1, POLL_INTERVAL):
+            started = time.perf_counter()
+            while index < len(events) and events[index][0] <= now:
+                at, action, args = events[index]; index += 1
+                if action == "open":
+                    procs.spawn(args[2], args[3])
+                    if at > 0: opened_at[args[0]] = (at, time.perf_counter())  # фоновые окна открыты до старта
+                    backend.open(*args[:3])
+                elif action == "close":
+                    backend.close(*args)
+                else:
+                    backend.rename(*args)
+            if tracker is None:
+                panel.poll()  # старый путь: окно видно только после опроса
+                for hwnd, (at, _) in list(opened_at.items()):
+                    delays.append((now - at) * 1000); del opened_at[hwnd]
+            else:
+                for hwnd, (at, perf) in list(opened_at.items()):
+                    delays.append((panel.appeared[hwnd] - perf) * 1000); del opened_at[hwnd]
+            elapsed += time.perf_counter() - started
+            QApplication.processEvents()
+        results[name] = {
+            "мс на панель": elapsed * 1000, "exe по PID": procs.lookups, "извлечений иконки": procs.extracts,
+            "кнопок создано": panel.buttons_created,
+            "игра на панели, мс (ср.)": sum(delays) / max(1, len(delays)),
+            "state": panel.state(), "snapshots": backend.snapshots,
+        }
+        if tracker: tracker.stop()
+    shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def cross_thread():
+    """События из чужого потока (как из потока хуков Windows) доходят в GUI-поток и сверяются со снимком."""
+    backend = FakeWindowBackend()
+    delivered_in, icons_in = [], []
+
+    def load_icon(path):
+        # QPixmap можно строить только в GUI-потоке
+        icons_in.append(threading.current_thread() is threading.main_thread())
+        return QIcon(QPixmap(16, 16))
+
+    tracker = WindowTracker(backend, resolve_exe=lambda pid: f"app{pid}.exe", load_icon=load_icon, resync_interval=0)
+    tracker.window_created.connect(lambda hwnd, title, icon: delivered_in.append(threading.current_thread() is threading.main_thread()))
+    tracker.start()
+    worker = threading.Thread(target=lambda: [backend.open(hwnd, f"win{hwnd}", hwnd % 3) for hwnd in range(1, 41)])
+    worker.start(); worker.join()
+    for _ in range(20): QApplication.processEvents()
+    # Событие "потерялось": окно закрылось в обход хуков — сверка со снимком его уберет
+    backend._windows.pop(7)
+    tracker.resync()
+    hwnds = [hwnd for hwnd, _, _ in tracker.windows()]
+    tracker.stop()
+    return delivered_in, icons_in, hwnds, tracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--windows", type=int, default=12, help="фоновых окон")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    results = run(args.minutes, args.windows, args.seed)
+    print(f"{args.minutes} мин за ПК, фоновых окон {args.windows}, опрос раз в {POLL_INTERVAL} сек:")
+    for name, result in results.items():
+        print(f"  {name:<6} " + "   ".join(f"{k}: {v:.1f}" if isinstance(v, float) else f"{k}: {v}"
+                                         for k, v in result.items() if k not in ("state", "snapshots")))
+    assert results["до"]["state"] == results["после"]["state"], "панели разошлись"
+    assert results["после"]["snapshots"] == 1, "трекер обходит окна не только при старте"
+
+    delivered_in, icons_in, hwnds, tracker = cross_thread()
+    print(f"  из потока хуков: доставлено {len(delivered_in)} окон, все в GUI-потоке: {all(delivered_in)}, "
+          f"иконки построены в GUI-потоке: {all(icons_in)}; "
+          f"exe по PID: {tracker.exe_lookups}, иконок: {tracker.icon_loads}; после сверки окон: {len(hwnds)}")
+    assert len(delivered_in) == 40 and all(delivered_in) and len(hwnds) == 39 and 7 not in hwnds
+    assert tracker.exe_lookups == 3 and tracker.icon_loads == 3 and len(icons_in) == 3 and all(icons_in)
+    print("OK: панель совпадает со старой, окна из другого потока доставлены в GUI-поток.")
+
+
+if __name__ == "__main__":
+    main()
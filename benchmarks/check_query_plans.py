@@ -0,0 +1,36 @@
+"""
+Регрессионная проверка планов запросов: создает чистую базу последней
+версии схемы и убеждается, что ни один горячий запрос не делает полный
+проход по таблице. Код возврата 1, если план деградировал.
+
+Запуск:  py benchmarks/check_query_plans.py
+"""
+import sys
+
+from _sandbox import load_server, cleanup
+
+
+def main():
+    server, workdir = load_server()
+    try:
+        from utils.migrations import HOT_QUERIES, check_query_plans, explain
+        with server.db_read() as conn:
+            problems = check_query_plans(conn)
+            for name, sql, params in HOT_QUERIES:
+                print(f"{name}:")
+                for detail in explain(conn, sql, params):
+                    print(f"    {detail}")
+    finally:
+        server.heartbeat_buffer.stop()
+        server.db_pool.close()
+        cleanup(workdir)
+    if problems:
+        print("\nПолные проходы по таблицам:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\nOK: все горячие запросы используют индексы.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Симулятор клуба: сотни виртуальных мест работают с server.py по протоколу
+настоящего клиента, без экрана и Qt.
+
+Каждое место входит (POST /api/login), загружает каталог и дальше:
+
+  --protocol current (клиент сейчас): POST /api/kiosk/sync раз в 5 сек,
+      GET /api/apps?since= только когда сменилась версия каталога;
+  --protocol legacy (старые киоски): GET /api/apps раз в 10 сек,
+      get_user_status и update_time раз в 5 сек, /api/heartbeat раз в 15 сек;
+
+а также изредка запускает игры (/log_launch, в среднем раз в 2 мин) и покупает
+пакеты (/api/buy_package, раз в 10 мин). Пока идет тест, "администратор" раз
+в минуту добавляет приложение в каталог. --speed ускоряет все интервалы.
+
+Отчет: p50/p95/p99 и доля ошибок по каждому запросу плюс конкуренция за
+запись в SQLite на сервере (/api/admin/db_stats: ожидания блокировки писателя
+и ошибки "database is locked"). Набор повторяемый (случайность с --seed):
+--save сохраняет результат в JSON, --baseline сравнивает с сохраненным и
+завершается с кодом 1, если p95 какого-то запроса вырос больше чем на
+--tolerance или выросла доля ошибок.
+
+Запуск:  py benchmarks/club_sim.py --seats 200 --duration 120 --save sim_base.json
+         py benchmarks/club_sim.py --seats 200 --duration 120 --baseline sim_base.json
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+
+import requests
+from werkzeug.security import generate_password_hash
+
+from load_kiosks import start_server, percentile
+
+ADMIN = ("sim_admin", "sim_password")
+PASSWORD = "sim"
+
+PROTOCOLS = {
+    # действие -> (интервал в секундах, периодическое ли; иначе — среднее для случайных событий)
+    "current": {"kiosk_sync": (5, True), "log_launch": (120, False), "buy_package": (600, False)},
+    "legacy": {"apps": (10, True), "status": (5, True), "update_time": (5, True), "heartbeat": (15, True),
+               "log_launch": (120, False), "buy_package": (600, False)},
+}
+GAMES = ["Dota 2", "Counter-Strike 2", "Valorant", "PUBG", "Fortnite", "Apex Legends"]
+
+
+class Seat(threading.Thread):
+    def __init__(self, n, url, protocol, speed, until, seed, results):
+        super().__init__(daemon=True)
+        self.n = n; self.url = url; self.protocol = protocol; self.speed = speed; self.until = until
+        self.rng = random.Random(seed * 100003 + n)
+        self.results = results
+        self.session = requests.Session()
+        self.pc_name = f"SIM-{n:03d}"; self.user = f"sim_user_{n}"
+        self.version = 0
+
+    def call(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.url}{path}", timeout=(3, 10), verify=False, **kwargs)
+            ok = response.status_code < 400
+        except requests.exceptions.RequestException:
+            response, ok = None, False
+        self.results.setdefault(name, []).append(((time.perf_counter() - started) * 1000, ok))
+        return response if ok else None
+
+    def run(self):
+        response = self.call("login", "POST", "/api/login", json={"username": self.user, "password": PASSWORD})
+        if response is not None and response.json().get("token"):
+            self.session.headers["X-Session-Token"] = response.json()["token"]
+        if self.protocol == "current":
+            self.version = self._version(self.call("apps", "GET", "/api/apps", params={"since": 0}))
+        else:
+            self.apps()
+        queue = []
+        for action, (interval, periodic) in PROTOCOLS[self.protocol].items():
+            first = self.rng.uniform(0, interval) if periodic else self.rng.expovariate(1 / interval)
+            heapq.heappush(queue, (time.monotonic() + first / self.speed, action))
+        while queue:
+            due, action = heapq.heappop(queue)
+            time.sleep(max(0, due - time.monotonic()))
+            if time.monotonic() >= self.until:
+                return
+            getattr(self, action)()
+            interval, periodic = PROTOCOLS[self.protocol][action]
+            step = interval if periodic else self.rng.expovariate(1 / interval)
+            heapq.heappush(queue, (due + step / self.speed, action))
+
+    @staticmethod
+    def _version(response):
+        try:
+            return response.json().get("version", 0) if response is not None else 0
+        except ValueError:
+            return 0
+
+    # --- клиент сейчас ---
+
+    def kiosk_sync(self):
+        response = self.call("kiosk_sync", "POST", "/api/kiosk/sync", json={
+            "pc_name": self.pc_name, "status": "Используется", "user": self.user, "time_left": 3600})
+        version = response.json().get("catalog_version", self.version) if response is not None else self.version
+        if version != self.version:
+            delta = self.call("apps_delta", "GET", "/api/apps", params={"since": self.version},
+                              headers={"If-None-Match": f'"apps-{self.version}"'})
+            if delta is not None and delta.status_code == 200:
+                self.version = self._version(delta)
+
+    # --- старые киоски ---
+
+    def apps(self):
+        self.call("apps", "GET", "/api/apps")
+
+    def status(self):
+        self.call("status", "GET", "/api/get_user_status", params={"username": self.user})
+
+    def update_time(self):
+        self.call("update_time", "POST", "/api/update_time", json={"username": self.user, "time_left": 3600})
+
+    def heartbeat(self):
+        self.call("heartbeat", "POST", "/api/heartbeat", json={
+            "pc_name": self.pc_name, "status": "Используется", "user": self.user, "time_left": 3600})
+
+    # --- общие события ---
+
+    def log_launch(self):
+        self.call("log_launch", "POST", "/log_launch", json={
+            "computer_name": self.pc_name, "ip_address": f"10.0.{self.n // 250}.{self.n % 250}",
+            "user": self.user, "app_name": self.rng.choice(GAMES)})
+
+    def buy_package(self):
+        self.call("buy_package", "POST", "/api/buy_package", json={
+            "username": self.user, "seconds": 3600, "price": 500, "package_name": "1 час", "pc_name": self.pc_name})
+
+
+def seed_club(db_path, seats, apps):
+    password_hash = generate_password_hash(PASSWORD, method="pbkdf2:sha256:1000")
+    conn = sqlite3.connect(db_path, timeout=10)
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO users (username, password_hash, balance, time_left) VALUES (?, ?, 1000000, 36000)",
+                         [(f"sim_user_{n}", password_hash) for n in range(seats)])
+        conn.executemany("INSERT OR IGNORE INTO apps (name, path, type) VALUES (?, ?, ?)",
+                         [(f"Sim App {i}", f"C:/Games/sim{i}.exe", "game" if i % 3 else "app") for i in range(apps)])
+    conn.close()
+
+
+def catalog_admin(db_path, speed, until):
+    """Администратор раз в минуту добавляет приложение: киоски получают изменения каталога."""
+    n = 0
+    while time.monotonic() + 60 / speed < until:
+        time.sleep(60 / speed)
+        conn = sqlite3.connect(db_path, timeout=10)
+        with conn:
+            conn.execute("INSERT INTO apps (name, path, type) VALUES (?, ?, 'game')", (f"Sim New {n}", f"C:/Games/new{n}.exe"))
+        conn.close()
+        n += 1
+
+
+def db_stats(url, reset=False):
+    try:
+        response = requests.get(f"{url}/api/admin/db_stats", params={"reset": int(reset)}, auth=ADMIN, timeout=5, verify=False)
+        return response.json() if response.status_code == 200 else None
+    except requests.exceptions.RequestException:
+        return None
+
+
+def summarize(results):
+    report = {}
+    for name, samples in sorted(results.items()):
+        latencies = [ms for ms, ok in samples if ok]
+        errors = sum(1 for _, ok in samples if not ok)
+        report[name] = {"count": len(samples), "errors_pct": 100 * errors / len(samples),
+                        "p50": statistics.median(latencies) if latencies else 0.0,
+                        "p95": percentile(latencies, 95), "p99": percentile(latencies, 99)}
+    return report
+
+
+def compare(report, baseline, tolerance):
+    problems = []
+    for name, base in baseline.items():
+        now = report.get(name)
+        if now is None:
+            continue
+        # Шум в единицы миллисекунд регрессией не считается
+        if now["p95"] > base["p95"] * (1 + tolerance) and now["p95"] - base["p95"] > 5:
+            problems.append(f"{name}: p95 {base['p95']:.1f} -> {now['p95']:.1f} мс")
+        if now["errors_pct"] > base["errors_pct"] + 1:
+            problems.append(f"{name}: ошибок {base['errors_pct']:.1f}% -> {now['errors_pct']:.1f}%")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seats", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=120, help="сек реального времени")
+    parser.add_argument("--speed", type=float, default=1.0, help="во сколько раз ускорить интервалы клиента")
+    parser.add_argument("--protocol", choices=sorted(PROTOCOLS), default="current")
+    parser.add_argument("--apps", type=int, default=150, help="приложений в каталоге")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", default="dev", choices=["dev", "gunicorn", "waitress"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--port", type=int, default=5078)
+    parser.add_argument("--save", help="сохранить результат в JSON")
+    parser.add_argument("--baseline", help="сравнить с сохраненным результатом")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимый рост p95 (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    proc, workdir, url = start_server(args.backend, args.port, args.workers, args.threads,
+                                      f"[Admin]\nAdminUsername = {ADMIN[0]}\nAdminPassword = {ADMIN[1]}\n")
+    db_path = os.path.join(workdir, "central_club.db")
+    try:
+        seed_club(db_path, args.seats, args.apps)
+        db_stats(url, reset=True)
+        results = {}
+        until = time.monotonic() + args.duration
+        seats = [Seat(n, url, args.protocol, args.speed, until, args.seed, results) for n in range(args.seats)]
+        admin = threading.Thread(target=catalog_admin, args=(db_path, args.speed, until), daemon=True)
+        admin.start()
+        for seat in seats: seat.start()
+        for seat in seats: seat.join()
+        stats = db_stats(url)
+    finally:
+        proc.terminate(); proc.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = summarize(results)
+    print(f"Мест: {args.seats}, протокол {args.protocol}, {args.duration:g} сек x{args.speed:g} "
+          f"({args.backend}, процессов {args.workers}, потоков {args.threads})")
+    print(f"  {'запрос':<12} {'всего':>7} {'ошибок':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for name, row in report.items():
+        print(f"  {name:<12} {row['count']:>7} {row['errors_pct']:>7.1f}% {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f}")
+    if stats:
+        db = stats["db"]
+        print(f"  SQLite (процесс {stats['pid']}): записей {db['writes']}, ждали писателя {db['writer_waits']} раз "
+              f"(всего {db['writer_wait_ms']:.0f} мс, max {db['writer_wait_max_ms']:.1f} мс), "
+              f"блокировка занята {db['writer_held_ms']:.0f} мс, 'database is locked': {db['locked_errors']}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "requests": report, "db": stats and stats["db"]}, f, ensure_ascii=False, indent=2)
+        print(f"Результат сохранен: {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(report, json.load(f)["requests"], args.tolerance)
+        if problems:
+            print("Регрессия относительно базы:")
+            for problem in problems: print(f"  {problem}")
+            raise SystemExit(1)
+        print("OK: регрессий относительно базы нет.")
+
+
+if __name__ == "__main__":
+    main()
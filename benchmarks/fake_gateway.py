@@ -0,0 +1,52 @@
+"""
+Фейковый платежный шлюз для нагрузочных тестов (как fake_payment_page, только
+со стороны Kaspi): принимает POST /v2/invoices и через `latency` секунд
+возвращает paymentUrl на страницу /fake_payment_page сервера клуба.
+Часть ответов можно сделать ошибками 503 (--fail-rate), чтобы проверить
+повторы и предохранитель utils/payment_gateway.py.
+
+Запуск отдельно:  py benchmarks/fake_gateway.py --port 5055 --latency 2
+и в config.ini сервера:  [Kaspi] ApiUrl = http://127.0.0.1:5055/v2/invoices
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+from flask import Flask, request, jsonify
+
+
+def create_app(latency=1.0, fail_rate=0.0, payment_page="https://127.0.0.1:5000/fake_payment_page"):
+    app = Flask("fake_gateway")
+    app.stats = {"invoices": 0, "failed": 0}
+    lock = threading.Lock()
+
+    @app.route("/v2/invoices", methods=["POST"])
+    def invoices():
+        time.sleep(latency)
+        if random.random() < fail_rate:
+            with lock: app.stats["failed"] += 1
+            return jsonify({"error": "temporarily unavailable"}), 503
+        data = json.loads(request.get_data(as_text=True))
+        with lock: app.stats["invoices"] += 1
+        query = urlencode({"order_id": data["orderId"], "amount": int(data["amount"]),
+                           "user": data.get("metadata", {}).get("username", "")})
+        return jsonify({"invoiceId": data["orderId"], "paymentUrl": f"{payment_page}?{query}"})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--payment-page", default="https://127.0.0.1:5000/fake_payment_page")
+    args = parser.parse_args()
+    create_app(args.latency, args.fail_rate, args.payment_page).run(port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Нагрузочный тест для подбора сервера под число мест: N виртуальных киосков
+синхронизируются с сервером так же, как настоящий клиент (POST /api/kiosk/sync
+раз в 5 секунд — пульс, время и уведомления одним запросом, у каждого своя
+keep-alive сессия). Половина киосков "занята" клиентом с идущей сессией.
+
+Сервер поднимается из serve.py на временной базе (--backend dev|gunicorn|waitress)
+или берется уже запущенный (--url). Результат: сколько запросов в секунду
+сервер реально обслужил против нужного, задержки p50/p95/p99 и ошибки.
+Если p95 растет, а фактическая частота отстает от нужной — серверу не хватает
+потоков (Threads) или процессов (Workers).
+
+Запуск:  py benchmarks/load_kiosks.py --kiosks 150 --duration 60 --backend gunicorn --workers 2
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import urllib3
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def start_server(backend, port, workers, threads, extra_config=""):
+    workdir = tempfile.mkdtemp(prefix="lovhub_load_")
+    with open(os.path.join(workdir, "config.ini"), "w", encoding="utf-8") as f:
+        # Все виртуальные киоски приходят с 127.0.0.1: ограничение входов по IP выключено
+        f.write(f"[Server]\nBind = 127.0.0.1:{port}\nWorkers = {workers}\nThreads = {threads}\nLoginAttemptsPerIp = 0\n"
+                f"CertFile = {os.path.join(REPO_ROOT, 'cert.pem')}\nKeyFile = {os.path.join(REPO_ROOT, 'key.pem')}\n"
+                + extra_config)
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "serve.py"), "--backend", backend],
+                            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    scheme = "http" if backend == "waitress" else "https"
+    url = f"{scheme}://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{url}/api/apps", timeout=1, verify=False)
+            return proc, workdir, url
+        except requests.exceptions.RequestException:
+            if proc.poll() is not None:
+                raise RuntimeError(f"serve.py --backend {backend} не запустился (код {proc.returncode})")
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Сервер не ответил за 20 секунд")
+
+
+def seed_users(db_path, count):
+    conn = sqlite3.connect(db_path, timeout=10)
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO users (username, password_hash, balance, time_left) VALUES (?, 'x', 0, 36000)",
+                         [(f"load_user_{i}",) for i in range(count)])
+    conn.close()
+
+
+class Kiosk(threading.Thread):
+    def __init__(self, n, url, interval, until, results):
+        super().__init__(daemon=True)
+        self.n = n; self.url = url; self.interval = interval; self.until = until; self.results = results
+        self.session = requests.Session()
+
+    def run(self):
+        user = f"load_user_{self.n}" if self.n % 2 == 0 else None
+        # Киоски включаются не одновременно: первые синхронизации размазаны по интервалу
+        next_at = time.monotonic() + self.interval * (self.n % 97) / 97
+        while True:
+            time.sleep(max(0, next_at - time.monotonic()))
+            if time.monotonic() >= self.until:
+                return
+            payload = {"pc_name": f"LOAD-{self.n:03d}", "status": "Используется" if user else "Активен",
+                       "user": user, "time_left": 3600 if user else 0}
+            started = time.perf_counter()
+            try:
+                response = self.session.post(f"{self.url}/api/kiosk/sync", json=payload, timeout=(2, 4), verify=False)
+                ok = response.status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            self.results.append(((time.perf_counter() - started) * 1000, ok))
+            next_at += self.interval
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kiosks", type=int, default=150)
+    parser.add_argument("--duration", type=float, default=60, help="сек")
+    parser.add_argument("--interval", type=float, default=5, help="сек между синхронизациями киоска")
+    parser.add_argument("--url", help="уже запущенный сервер, например https://192.168.1.101:5000")
+    parser.add_argument("--backend", default="dev", choices=["dev", "gunicorn", "waitress"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--port", type=int, default=5077)
+    args = parser.parse_args()
+
+    proc = workdir = None
+    url = args.url
+    if not url:
+        proc, workdir, url = start_server(args.backend, args.port, args.workers, args.threads)
+        seed_users(os.path.join(workdir, "central_club.db"), args.kiosks)
+    try:
+        results = []
+        until = time.monotonic() + args.duration
+        kiosks = [Kiosk(n, url, args.interval, until, results) for n in range(args.kiosks)]
+        for kiosk in kiosks: kiosk.start()
+        for kiosk in kiosks: kiosk.join()
+
+        latencies = [ms for ms, ok in results if ok]
+        errors = sum(1 for _, ok in results if not ok)
+        where = url if args.url else f"{args.backend}, процессов {args.workers}, потоков {args.threads}"
+        print(f"Киосков: {args.kiosks}, синхронизация раз в {args.interval:g} сек, {args.duration:g} сек ({where})")
+        print(f"  нужно {args.kiosks / args.interval:7.1f} запр/с, обслужено {len(latencies) / args.duration:7.1f} запр/с")
+        if latencies:
+            print(f"  задержка p50 {statistics.median(latencies):7.1f} мс   p95 {percentile(latencies, 95):7.1f} мс   "
+                  f"p99 {percentile(latencies, 99):7.1f} мс   max {max(latencies):7.1f} мс")
+        print(f"  ошибок: {errors} из {len(results)} ({100 * errors / max(1, len(results)):.1f}%)")
+    finally:
+        if proc:
+            proc.terminate(); proc.wait(timeout=30)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
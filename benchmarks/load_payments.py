@@ -0,0 +1,150 @@
+"""
+Нагрузочный тест создания счетов при медленном платежном шлюзе.
+
+Сервер работает с фиксированным числом потоков (как waitress/gunicorn --threads),
+шлюз — benchmarks/fake_gateway.py с задержкой ответа. Пока киоски массово
+создают счета, отдельный "киоск" шлет пульсы и замеряет их задержку.
+
+  "до"    — как раньше: requests.post в Kaspi прямо в потоке Flask, таймаут 10 сек;
+  "после" — /api/create_payment через utils/payment_gateway.py: свой пул потоков,
+            поток Flask ждет ссылку не дольше PAYMENT_INLINE_WAIT, дальше киоск
+            опрашивает /api/payment_status.
+
+Третий замер — шлюз недоступен: после нескольких сбоев предохранитель
+размыкает цепь, и сервер сразу отвечает 503 вместо ожидания таймаутов.
+
+Запуск:  py benchmarks/load_payments.py --payments 24 --latency 2 --threads 8
+"""
+import argparse
+import json
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import BaseWSGIServer, make_server
+
+from _sandbox import load_server, cleanup
+from fake_gateway import create_app
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI-сервер с фиксированным пулом потоков: лишние запросы ждут свободный поток."""
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve(httpd):
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_port}"
+
+
+def legacy_route(server, gateway_url):
+    """Копия старого create_payment: блокирующий запрос к Kaspi в потоке Flask."""
+    from flask import request, jsonify
+
+    def legacy_create_payment():
+        data = request.get_json()
+        payload_string = json.dumps({"orderId": f"legacy_{time.time_ns()}", "amount": float(data["amount"]),
+                                     "metadata": {"username": data["username"], "amount": data["amount"]}})
+        try:
+            response = requests.post(gateway_url, data=payload_string, timeout=10)
+            response.raise_for_status()
+            return jsonify({"status": "success", "payment_url": response.json().get("paymentUrl")})
+        except requests.exceptions.RequestException as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
+
+    server.app.add_url_rule("/bench/legacy_create_payment", "legacy_create_payment",
+                            server.csrf.exempt(legacy_create_payment), methods=["POST"])
+
+
+def buy_link(base, endpoint, n):
+    started = time.perf_counter()
+    response = requests.post(f"{base}{endpoint}", json={"username": f"user{n}", "amount": 1000}, timeout=30)
+    while response.status_code == 202:
+        time.sleep(0.2)
+        response = requests.get(f"{base}/api/payment_status", params={"order_id": response.json()["order_id"]}, timeout=30)
+    return response.status_code, time.perf_counter() - started
+
+
+def run(base, endpoint, payments):
+    latencies = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            requests.post(f"{base}/api/heartbeat", json={"pc_name": "PROBE", "status": "Активен"}, timeout=60)
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe); prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=payments) as pool:
+        results = list(pool.map(lambda n: buy_link(base, endpoint, n), range(payments)))
+    elapsed = time.perf_counter() - started
+    stop.set(); prober.join()
+    codes = {}
+    for code, _ in results: codes[code] = codes.get(code, 0) + 1
+    return {
+        "пульс p50, мс": statistics.median(latencies),
+        "пульс max, мс": max(latencies),
+        "все счета, сек": elapsed,
+        "ответы": dict(sorted(codes.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=2.0, help="задержка ответа шлюза, сек")
+    parser.add_argument("--threads", type=int, default=8, help="потоков у сервера")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("server").setLevel(logging.CRITICAL)
+    logging.getLogger("utils.payment_gateway").setLevel(logging.CRITICAL)
+
+    gateway = make_server("127.0.0.1", 0, create_app(latency=args.latency), threaded=True)
+    gateway_url = f"{serve(gateway)}/v2/invoices"
+    server, workdir = load_server(f"[Kaspi]\nPublicKey = bench\nPrivateKey = bench\nApiUrl = {gateway_url}\n")
+    httpd = None
+    try:
+        legacy_route(server, gateway_url)
+        httpd = PooledWSGIServer("127.0.0.1", 0, server.app, args.threads)
+        base = serve(httpd)
+        print(f"Счетов: {args.payments}, задержка шлюза {args.latency} сек, потоков сервера: {args.threads}")
+        for name, endpoint in (("до", "/bench/legacy_create_payment"), ("после", "/api/create_payment")):
+            result = run(base, endpoint, args.payments)
+            print(f"  {name:<6} " + "   ".join(f"{k}: {v:.1f}" if isinstance(v, float) else f"{k}: {v}" for k, v in result.items()))
+
+        # Шлюз недоступен: порт, на котором никто не слушает
+        server.payment_gateway.close()
+        server.payment_gateway = server.PaymentGateway("http://127.0.0.1:9/v2/invoices", backoff=0.05)
+        for wave in (1, 2):
+            result = run(base, "/api/create_payment", args.payments)
+            print(f"  шлюз недоступен, волна {wave}: ответы {result['ответы']}, все за {result['все счета, сек']:.2f} сек, "
+                  f"цепь: {server.payment_gateway.breaker.state}")
+    finally:
+        if httpd: httpd.shutdown()
+        gateway.shutdown()
+        server.payment_gateway.close()
+        server.heartbeat_buffer.stop(); server.db_pool.close()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
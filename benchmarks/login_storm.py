@@ -0,0 +1,141 @@
+"""
+Нагрузочный тест входа клиентов в час открытия клуба.
+
+Пароли хешированы как в рабочей базе (werkzeug scrypt, N=32768). Сервер
+работает с фиксированным числом потоков (как waitress/gunicorn --threads);
+пока киоски разом входят, отдельный "киоск" шлет пульсы и замеряет их задержку.
+
+  "до"    — как раньше: check_password_hash прямо в потоке Flask, столько
+            хешей одновременно, сколько потоков у сервера;
+  "после" — /api/login: хеши считает пул utils/kiosk_auth.py (LoginWorkers),
+            при переполнении очереди сервер отвечает 503 с retry_after, и
+            киоск повторяет вход.
+
+Затем проверяется токен сессии (запросы клиента без повторной проверки
+пароля) и ограничение попыток входа: перебор пароля получает 429.
+
+Запуск:  py benchmarks/login_storm.py --logins 40 --threads 8
+"""
+import argparse
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from _sandbox import load_server, cleanup
+from load_payments import PooledWSGIServer, serve
+
+PASSWORD = "opening-night"
+
+
+def legacy_route(server):
+    """Копия старого api_login: хеш пароля в потоке Flask."""
+    from flask import request, jsonify
+
+    def legacy_login():
+        data = request.get_json()
+        with server.db_read() as conn:
+            user = conn.execute("SELECT password_hash FROM users WHERE username = ?", (data["username"],)).fetchone()
+        if user and check_password_hash(user["password_hash"], data["password"]):
+            return jsonify({"status": "success", "username": data["username"]})
+        return jsonify({"status": "error"}), 401
+
+    server.app.add_url_rule("/bench/legacy_login", "legacy_login", server.csrf.exempt(legacy_login), methods=["POST"])
+
+
+def login(base, endpoint, n):
+    """Вход как у киоска: на 503 ждет retry_after и повторяет. (код, секунд до входа, повторов)"""
+    started = time.perf_counter()
+    retries = 0
+    while True:
+        response = requests.post(f"{base}{endpoint}", json={"username": f"user{n}", "password": PASSWORD}, timeout=60)
+        if response.status_code != 503:
+            return response.status_code, time.perf_counter() - started, retries
+        retries += 1
+        time.sleep(response.json().get("retry_after", 1))
+
+
+def storm(base, endpoint, logins):
+    latencies = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            requests.post(f"{base}/api/heartbeat", json={"pc_name": "PROBE", "status": "Активен"}, timeout=60)
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe); prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=logins) as pool:
+        results = list(pool.map(lambda n: login(base, endpoint, n), range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set(); prober.join()
+    return {
+        "пульс p50, мс": statistics.median(latencies),
+        "пульс p95, мс": sorted(latencies)[int(len(latencies) * 0.95)],
+        "пульс max, мс": max(latencies),
+        "все вошли, сек": elapsed,
+        "повторов": sum(r for _, _, r in results),
+        "успешно": sum(1 for code, _, _ in results if code == 200),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40, help="клиентов входят одновременно")
+    parser.add_argument("--threads", type=int, default=8, help="потоков у сервера")
+    parser.add_argument("--login-workers", type=int, default=2, help="[Server] LoginWorkers")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("server").setLevel(logging.CRITICAL)
+
+    server, workdir = load_server(f"[Server]\nLoginWorkers = {args.login_workers}\nLoginAttemptsPerIp = 0\n")
+    httpd = None
+    try:
+        password_hash = generate_password_hash(PASSWORD)
+        with server.db_connection() as conn:
+            conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                             [(f"user{n}", password_hash) for n in range(args.logins)])
+        legacy_route(server)
+        httpd = PooledWSGIServer("127.0.0.1", 0, server.app, args.threads)
+        base = serve(httpd)
+        print(f"Входов: {args.logins} одновременно ({password_hash.split('$')[0]}), потоков сервера: {args.threads}, "
+              f"проверок пароля одновременно: {args.login_workers}")
+        for name, endpoint in (("до", "/bench/legacy_login"), ("после", "/api/login")):
+            result = storm(base, endpoint, args.logins)
+            print(f"  {name:<6} " + "   ".join(f"{k}: {v:.1f}" if isinstance(v, float) else f"{k}: {v}" for k, v in result.items()))
+            assert result["успешно"] == args.logins, "не все клиенты вошли"
+
+        # Дальше клиент работает по токену: пароль больше не проверяется
+        session = requests.Session()
+        token = session.post(f"{base}/api/login", json={"username": "user0", "password": PASSWORD}).json()["token"]
+        session.headers["X-Session-Token"] = token
+        started = time.perf_counter()
+        for _ in range(200):
+            assert session.get(f"{base}/api/get_user_status", params={"username": "user0"}).status_code == 200
+        status_ms = (time.perf_counter() - started) * 1000 / 200
+        foreign = session.get(f"{base}/api/get_user_status", params={"username": "user1"}).status_code
+        forged = requests.get(f"{base}/api/get_user_status", params={"username": "user0"},
+                              headers={"X-Session-Token": token[:-2] + "xx"}).status_code
+        print(f"  статус по токену: {status_ms:.2f} мс на запрос; чужой логин -> {foreign}, подделанный токен -> {forged}")
+        assert (foreign, forged) == (403, 401)
+
+        codes = [requests.post(f"{base}/api/login", json={"username": "user1", "password": f"guess{i}"}).status_code
+                 for i in range(8)]
+        print(f"  перебор пароля user1: {codes}")
+        assert codes[:5] == [401] * 5 and set(codes[5:]) == {429}
+        print("OK")
+    finally:
+        if httpd: httpd.shutdown()
+        server.shutdown_worker()
+        cleanup(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Повторы вебхука оплаты: несколько процессов сервера, в каждом несколько потоков,
+одновременно присылают одни и те же подписанные вебхуки PAID. Каждый заказ
+должен быть зачислен ровно один раз (уникальный transactions.order_id),
+а повторы, уже известные процессу, — отвечаться из памяти (RecentOrders).
+
+В конце замеряется цена повтора в одном процессе: ответ из памяти против
+проверки по базе (кэш очищается перед каждым запросом).
+Код возврата 1, если какой-то заказ зачислен не один раз.
+
+Запуск:  py benchmarks/replay_webhook.py --workers 4 --threads 4 --orders 20 --replays 10
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from _sandbox import load_server, cleanup, REPO_ROOT
+
+USERNAME = "replay_user"
+AMOUNT = 500
+
+
+def signed_webhooks(server, orders):
+    key = server.get_kaspi_private_key()
+    webhooks = []
+    for n in range(orders):
+        body = json.dumps({"orderId": f"lovhub_{USERNAME}_{n}", "status": "PAID",
+                           "metadata": {"username": USERNAME, "amount": AMOUNT}})
+        webhooks.append((body, server.create_kaspi_signature(body, key)))
+    return webhooks
+
+
+def post(client, server, body, signature):
+    return client.post("/api/payment_webhook", data=body, content_type="application/json",
+                       headers={server.KASPI_SIGNATURE_HEADER: signature})
+
+
+def worker(workdir, webhooks, threads, replays, barrier, results):
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    logging.disable(logging.CRITICAL)
+    import server
+    server.app.config.update(TESTING=True)
+    codes = {}
+    lock = threading.Lock()
+
+    def replay():
+        client = server.app.test_client()
+        for _ in range(replays):
+            for body, signature in webhooks:
+                code = post(client, server, body, signature).status_code
+                with lock: codes[code] = codes.get(code, 0) + 1
+
+    pool = [threading.Thread(target=replay) for _ in range(threads)]
+    barrier.wait()
+    for thread in pool: thread.start()
+    for thread in pool: thread.join()
+    results.put((codes, server.processed_orders.hits))
+    server.heartbeat_buffer.stop(); server.db_pool.close()
+
+
+def replay_cost(server, body, signature, count, cached):
+    client = server.app.test_client()
+    post(client, server, body, signature)
+    started = time.perf_counter()
+    for _ in range(count):
+        if not cached:
+            server.processed_orders = server.RecentOrders()
+        post(client, server, body, signature)
+    return (time.perf_counter() - started) * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--replays", type=int, default=10, help="повторов каждого заказа в каждом потоке")
+    args = parser.parse_args()
+
+    server, workdir = load_server("[Kaspi]\nPrivateKey = bench-replay-key\n")
+    try:
+        server.app.config.update(TESTING=True)
+        with server.db_connection() as conn:
+            conn.execute("INSERT INTO users (username, password_hash, balance, time_left) VALUES (?, 'x', 0, 0)", (USERNAME,))
+        webhooks = signed_webhooks(server, args.orders)
+
+        ctx = multiprocessing.get_context("spawn")
+        barrier = ctx.Barrier(args.workers + 1); results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(workdir, webhooks, args.threads, args.replays, barrier, results))
+                 for _ in range(args.workers)]
+        for proc in procs: proc.start()
+        barrier.wait()
+        started = time.perf_counter()
+        totals = [results.get() for _ in procs]
+        elapsed = time.perf_counter() - started
+        for proc in procs: proc.join()
+
+        codes = {}
+        for worker_codes, _ in totals:
+            for code, count in worker_codes.items(): codes[code] = codes.get(code, 0) + count
+        cache_hits = sum(hits for _, hits in totals)
+        sent = sum(codes.values())
+        with server.db_read() as conn:
+            balance = conn.execute("SELECT balance FROM users WHERE username = ?", (USERNAME,)).fetchone()[0]
+            rows = conn.execute("SELECT COUNT(*) FROM transactions WHERE order_id LIKE ?", (f"lovhub_{USERNAME}_%",)).fetchone()[0]
+
+        print(f"Вебхуков: {sent} ({args.orders} заказов, {args.workers} процессов x {args.threads} потоков), {sent / elapsed:.0f} в секунду")
+        print(f"  ответы: {dict(sorted(codes.items()))}, из памяти: {cache_hits}")
+        print(f"  баланс {balance} (ожидается {args.orders * AMOUNT}), записей заказов {rows} (ожидается {args.orders})")
+        body, signature = webhooks[0]
+        print(f"  повтор из памяти:   {replay_cost(server, body, signature, 300, cached=True):6.2f} мс")
+        print(f"  повтор через базу:  {replay_cost(server, body, signature, 300, cached=False):6.2f} мс")
+        failed = balance != args.orders * AMOUNT or rows != args.orders or set(codes) != {200}
+    finally:
+        server.heartbeat_buffer.stop(); server.db_pool.close()
+        cleanup(workdir)
+    if failed:
+        print("ОШИБКА: заказ зачислен не один раз или повтор получил не 200")
+        sys.exit(1)
+    print("OK: каждый заказ зачислен ровно один раз.")
+
+
+if __name__ == "__main__":
+    main()
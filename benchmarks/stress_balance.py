@@ -0,0 +1,141 @@
+"""
+Стресс-тест денег и минут: несколько процессов сервера одновременно покупают
+пакеты и пополняют баланс одних и тех же клиентов на общей базе.
+
+  "до"    — как раньше в server.py: SELECT balance/time_left, расчет в Python,
+            затем UPDATE (маршруты-копии регистрируются только в этом тесте);
+  "после" — настоящие /api/buy_package и /web/add_balance, то есть
+            utils/balance_service.py: одно условное UPDATE ... RETURNING.
+
+В конце сверяются инварианты: баланс = начальный + пополнения - покупки,
+time_left = начальное + купленные секунды, записей в transactions столько же,
+сколько успешных операций, баланс не ушел в минус. Код возврата 1, если
+"после" что-то потеряло. Скорость "после" ниже не из-за UPDATE: настоящий
+маршрут покупки еще занимает ПК в таблице computers и обновляет табло мест.
+
+Запуск:  py benchmarks/stress_balance.py --workers 6 --ops 300
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from _sandbox import load_server, cleanup, REPO_ROOT
+
+USERS = ["stress_a", "stress_b"]
+PRICE = 100
+SECONDS = 3600
+START_BALANCE = 1000
+
+
+def legacy_routes(server):
+    """Копии старых маршрутов: чтение, расчет в Python, запись."""
+    from flask import request, jsonify
+
+    def legacy_buy():
+        data = request.get_json()
+        with server.db_connection() as conn:
+            row = conn.execute("SELECT balance, time_left FROM users WHERE username = ?", (data["username"],)).fetchone()
+            if row['balance'] < data["price"]: return jsonify({"status": "error"}), 402
+            conn.execute("UPDATE users SET balance = ?, time_left = ? WHERE username = ?",
+                         (row['balance'] - data["price"], row['time_left'] + data["seconds"], data["username"]))
+            conn.execute("INSERT INTO transactions (type, username, amount) VALUES (?, ?, ?)", ('package_purchase', data["username"], data["price"]))
+        return jsonify({"status": "success"})
+
+    def legacy_topup():
+        with server.db_connection() as conn:
+            row = conn.execute("SELECT balance FROM users WHERE username = ?", (request.form['username'],)).fetchone()
+            conn.execute("UPDATE users SET balance = ? WHERE username = ?", (row['balance'] + int(request.form['amount']), request.form['username']))
+            conn.execute("INSERT INTO transactions (type, username, amount) VALUES (?, ?, ?)", ('admin_topup', request.form['username'], int(request.form['amount'])))
+        return "ok"
+
+    server.app.add_url_rule("/bench/legacy_buy", "legacy_buy", server.csrf.exempt(legacy_buy), methods=["POST"])
+    server.app.add_url_rule("/bench/legacy_topup", "legacy_topup", server.csrf.exempt(legacy_topup), methods=["POST"])
+
+
+def worker(workdir, mode, worker_id, ops, barrier, results):
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    logging.disable(logging.CRITICAL)
+    import server
+    server.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, LOGIN_DISABLED=True)
+    if mode == "legacy":
+        legacy_routes(server)
+    buy_url = "/bench/legacy_buy" if mode == "legacy" else "/api/buy_package"
+    topup_url = "/bench/legacy_topup" if mode == "legacy" else "/web/add_balance"
+    client = server.app.test_client()
+    bought = declined = topped = 0
+    barrier.wait()
+    for i in range(ops):
+        username = USERS[(i // 2 + worker_id) % len(USERS)]
+        if i % 2:
+            client.post(topup_url, data={"username": username, "amount": PRICE})
+            topped += 1
+            continue
+        response = client.post(buy_url, json={"username": username, "seconds": SECONDS, "price": PRICE,
+                                              "package_name": "1 час", "pc_name": f"PC-{worker_id:02d}"})
+        if response.status_code == 200: bought += 1
+        elif response.status_code == 402: declined += 1
+        else: raise RuntimeError(f"{buy_url}: {response.status_code} {response.get_data(as_text=True)}")
+    server.heartbeat_buffer.stop(); server.db_pool.close()
+    results.put((bought, declined, topped))
+
+
+def run(server, workdir, mode, workers, ops):
+    with server.db_connection() as conn:
+        conn.execute("DELETE FROM transactions"); conn.execute("DELETE FROM users")
+        for username in USERS:
+            conn.execute("INSERT INTO users (username, password_hash, balance, time_left) VALUES (?, 'x', ?, 0)",
+                         (username, START_BALANCE))
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers + 1); results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(workdir, mode, n, ops, barrier, results)) for n in range(workers)]
+    for proc in procs: proc.start()
+    barrier.wait()
+    started = time.perf_counter()
+    totals = [results.get() for _ in procs]
+    elapsed = time.perf_counter() - started
+    for proc in procs: proc.join()
+    bought = sum(t[0] for t in totals); declined = sum(t[1] for t in totals); topped = sum(t[2] for t in totals)
+
+    with server.db_read() as conn:
+        rows = conn.execute("SELECT SUM(balance) AS balance, SUM(time_left) AS time_left, MIN(balance) AS low FROM users").fetchone()
+        tx_count = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    expected_balance = START_BALANCE * len(USERS) + topped * PRICE - bought * PRICE
+    problems = []
+    if rows['balance'] != expected_balance:
+        problems.append(f"баланс {rows['balance']} вместо {expected_balance} (расхождение {rows['balance'] - expected_balance:+} тг)")
+    if rows['time_left'] != bought * SECONDS:
+        problems.append(f"time_left {rows['time_left']} вместо {bought * SECONDS} (расхождение {(rows['time_left'] - bought * SECONDS) // 60:+} мин)")
+    if tx_count != bought + topped:
+        problems.append(f"транзакций {tx_count} вместо {bought + topped}")
+    if rows['low'] < 0:
+        problems.append(f"баланс ушел в минус: {rows['low']}")
+    print(f"  {mode:<7} {workers * ops / elapsed:8.0f} оп/с   покупок {bought}, отказов {declined}, пополнений {topped}")
+    for problem in problems or ["инварианты сошлись"]:
+        print(f"          {problem}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=6)
+    parser.add_argument("--ops", type=int, default=300, help="операций на процесс")
+    args = parser.parse_args()
+
+    server, workdir = load_server()
+    try:
+        print(f"Процессов: {args.workers}, операций на процесс: {args.ops}, клиентов: {len(USERS)}")
+        run(server, workdir, "legacy", args.workers, args.ops)
+        problems = run(server, workdir, "atomic", args.workers, args.ops)
+    finally:
+        server.heartbeat_buffer.stop(); server.db_pool.close()
+        cleanup(workdir)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
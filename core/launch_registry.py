@@ -0,0 +1,213 @@
+"""
+Приложения, запущенные киоском, и их дерево процессов.
+
+AppLauncherThread знает PID каждого запущенного приложения, но игры и
+лаунчеры запускают дочерние процессы (лаунчер -> игра -> античит), а сам
+лаунчер часто сразу выходит. Раньше по окончании времени
+kill_disallowed_apps обходил все процессы системы и сверял их с жестким
+списком имен — запущенные игры с другими именами продолжали работать, а
+длительность игры нигде не учитывалась. Теперь:
+
+  LaunchRegistry — по событиям монитора процессов (core/process_monitor.py)
+                   следит за деревом каждого запущенного приложения: процесс,
+                   родитель которого входит в дерево, добавляется в него.
+                   Дерево, в котором не осталось процессов (и за ADOPT_GRACE
+                   секунд не появилось новых потомков вышедшего лаунчера),
+                   закрыто — сигнал app_finished(имя, время старта, секунд).
+
+По окончании сессии закрываются ровно эти деревья: всем процессам сразу
+отправляется просьба завершиться (WM_CLOSE / terminate), ожидание общее на
+TERMINATE_TIMEOUT секунд, оставшиеся процессы убиваются. В GUI-потоке это
+start_teardown(): ожидание ведет QTimer, окно не замирает, а итог приходит
+сигналом teardown_finished; teardown() делает то же самое, блокируя поток.
+"""
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+ADOPT_GRACE = 5          # сек: столько ждать потомков после выхода последнего процесса дерева
+TERMINATE_TIMEOUT = 3    # сек на штатное закрытие до kill
+KILL_TIMEOUT = 1         # сек на kill
+WAIT_STEP = 0.02
+
+
+class _Tree:
+    def __init__(self, name, root, started):
+        self.name = name
+        self.root = root
+        self.started = started   # время старта корня (UNIX)
+        self.pids = {}           # pid -> время старта, живые процессы дерева
+        self.exited = {}         # pid -> время старта, вышедшие (их потомки еще могут появиться)
+        self.emptied_at = None   # когда вышел последний процесс дерева (time.time)
+
+
+class LaunchRegistry(QObject):
+    """
+    Сигналы приходят в GUI-потоке: app_finished(имя, время старта (UNIX), секунд работы),
+    teardown_finished({"terminated", "killed", "left", "ms"}).
+    """
+    app_finished = pyqtSignal(str, float, int)
+    teardown_finished = pyqtSignal(dict)
+
+    def __init__(self, monitor, grace=ADOPT_GRACE, clock=time.time, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.backend = monitor.backend
+        self.grace = grace
+        self.clock = clock
+        self._trees = []
+        self.runtimes = []  # (имя, время старта, секунд) закрытых деревьев
+        monitor.process_started.connect(self._on_started)
+        monitor.process_exited.connect(self._on_exited)
+        self._expire_timer = QTimer(self)
+        self._expire_timer.setSingleShot(True)
+        self._expire_timer.timeout.connect(self.expire)
+        self._teardown = None    # закрытие, которое ведет start_teardown
+        self._teardown_timer = QTimer(self)
+        self._teardown_timer.timeout.connect(self._teardown_step)
+
+    def track(self, name, pid):
+        """Начинает следить за приложением, запущенным с этим PID. False — процесс уже вышел."""
+        info = self.backend.describe(pid)
+        if info is None:
+            return False
+        tree = _Tree(name, pid, info[2])
+        tree.pids[pid] = info[2]
+        self._trees.append(tree)
+        # Потомки, которых монитор уже увидел до вызова track
+        self._adopt_known(tree)
+        return True
+
+    def running(self):
+        """{имя: [pid]} приложений, у которых есть живые процессы."""
+        result = {}
+        for tree in self._trees:
+            if tree.pids:
+                result.setdefault(tree.name, []).extend(tree.pids)
+        return result
+
+    def expire(self, now=None):
+        """Закрывает деревья, пустые дольше grace секунд."""
+        now = self.clock() if now is None else now
+        for tree in [t for t in self._trees if not t.pids and t.emptied_at is not None and now - t.emptied_at >= self.grace]:
+            self._finish(tree, tree.emptied_at)
+        self._schedule_expire()
+
+    def teardown(self, timeout=TERMINATE_TIMEOUT, kill_timeout=KILL_TIMEOUT):
+        """
+        Закрывает все отслеживаемые деревья параллельно: просьба завершиться
+        всем процессам, общее ожидание, затем kill оставшихся. Возвращает
+        {"terminated", "killed", "left", "ms"}.
+        """
+        started = time.perf_counter()
+        targets = self._terminate_all()
+        alive = self._wait(targets, timeout)
+        killed = [target for target in alive if self.backend.kill(*target)]
+        left = self._wait(alive, kill_timeout) if killed else alive
+        return self._teardown_report(started, targets, alive, killed, left)
+
+    def start_teardown(self, timeout=TERMINATE_TIMEOUT, kill_timeout=KILL_TIMEOUT):
+        """То же, что teardown(), без блокировки GUI-потока: итог — сигнал teardown_finished."""
+        if self._teardown is not None:
+            return
+        started = time.perf_counter()
+        targets = self._terminate_all()
+        self._teardown = {"started": started, "targets": targets, "alive": targets, "killed": None,
+                          "deadline": time.monotonic() + timeout, "kill_timeout": kill_timeout}
+        self._teardown_step()
+        if self._teardown is not None:
+            self._teardown_timer.start(int(WAIT_STEP * 1000))
+
+    def _teardown_step(self):
+        state = self._teardown
+        state["alive"] = [target for target in state["alive"] if self.backend.is_alive(*target)]
+        if state["alive"] and time.monotonic() < state["deadline"]:
+            return
+        if state["killed"] is None and state["alive"]:
+            # Штатно не закрылись: kill и еще kill_timeout на то, чтобы процессы исчезли
+            state["survivors"] = state["alive"]
+            state["killed"] = [target for target in state["alive"] if self.backend.kill(*target)]
+            state["deadline"] = time.monotonic() + state["kill_timeout"] if state["killed"] else 0
+            return
+        self._teardown_timer.stop()
+        self._teardown = None
+        report = self._teardown_report(state["started"], state["targets"], state.get("survivors", []),
+                                       state["killed"] or [], state["alive"])
+        self.teardown_finished.emit(report)
+
+    def _terminate_all(self):
+        self.monitor.poll(resync=False)  # потомки, запущенные после последнего опроса монитора
+        for tree in self._trees:
+            self._adopt_known(tree)
+        targets = [(pid, created) for tree in self._trees for pid, created in tree.pids.items()]
+        for pid, created in targets:
+            self.backend.terminate(pid, created)
+        return targets
+
+    def _teardown_report(self, started, targets, alive, killed, left):
+        now = self.clock()
+        for tree in list(self._trees):
+            self._finish(tree, tree.emptied_at if not tree.pids and tree.emptied_at else now)
+        if left:
+            print(f"[LaunchRegistry] Не удалось завершить процессы: {[pid for pid, _ in left]}")
+        return {"terminated": len(targets) - len(alive), "killed": len(killed), "left": [pid for pid, _ in left],
+                "ms": (time.perf_counter() - started) * 1000}
+
+    def close(self):
+        """Выход без закрытия приложений (админ): учитывает время еще идущих приложений."""
+        now = self.clock()
+        for tree in list(self._trees):
+            self._finish(tree, tree.emptied_at if not tree.pids and tree.emptied_at else now)
+
+    def _wait(self, targets, timeout):
+        deadline = time.monotonic() + timeout
+        alive = [target for target in targets if self.backend.is_alive(*target)]
+        while alive and time.monotonic() < deadline:
+            time.sleep(WAIT_STEP)
+            alive = [target for target in alive if self.backend.is_alive(*target)]
+        return alive
+
+    def _adopt_known(self, tree):
+        table = self.monitor.snapshot()
+        changed = True
+        while changed:
+            changed = False
+            for pid, (_, _, created, ppid) in table.items():
+                if pid not in tree.pids and tree.exited.get(pid) != created and self._is_child(tree, ppid, created):
+                    tree.pids[pid] = created
+                    tree.emptied_at = None
+                    changed = True
+
+    @staticmethod
+    def _is_child(tree, ppid, created):
+        # Родитель с тем же PID мог выйти и смениться другим процессом: потомок не старше родителя
+        parent_created = tree.pids.get(ppid, tree.exited.get(ppid))
+        return parent_created is not None and created >= parent_created
+
+    def _on_started(self, pid, name):
+        info = self.monitor.info(pid)
+        if info is None:
+            return
+        for tree in self._trees:
+            if pid not in tree.pids and self._is_child(tree, info[3], info[2]):
+                tree.pids[pid] = info[2]
+                tree.emptied_at = None
+                return
+
+    def _on_exited(self, pid, name):
+        for tree in self._trees:
+            if pid in tree.pids:
+                tree.exited[pid] = tree.pids.pop(pid)
+                if not tree.pids:
+                    tree.emptied_at = self.clock()
+                    self._schedule_expire()
+                return
+
+    def _schedule_expire(self):
+        if any(not t.pids and t.emptied_at is not None for t in self._trees) and not self._expire_timer.isActive():
+            self._expire_timer.start(int(self.grace * 1000))
+
+    def _finish(self, tree, ended):
+        self._trees.remove(tree)
+        seconds = max(0, int(round(ended - tree.started)))
+        self.runtimes.append((tree.name, tree.started, seconds))
+        self.app_finished.emit(tree.name, float(tree.started), seconds)
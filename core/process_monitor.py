@@ -0,0 +1,360 @@
+"""
+Процессы киоска: один источник для значков трея, проверки запуска игр и
+закрытия запрещенных программ по окончании времени.
+
+Раньше каждый потребитель сам обходил все процессы (psutil.process_iter()):
+MainWindow.update_custom_tray_apps раз в 5 секунд, TrayManager.refresh_icons
+при открытии трея, check_if_game_running после запуска игры из Steam и
+SettingsWindow.kill_disallowed_apps по окончании времени — и каждый раз
+запрашивал имя у всех процессов системы. Теперь:
+
+  ProcessBackend        — источник процессов: список PID, описание одного
+                          процесса (имя, exe, время старта, родитель),
+                          terminate/kill;
+  PsutilProcessBackend  — то же через psutil (импортируется лениво);
+  FakeProcessBackend    — процессы в памяти: монитор работает и замеряется
+                          без Windows и psutil;
+  ProcessMonitor        — таблица PID -> (имя, exe, время старта, родитель) в фоновом
+                          потоке. Раз в POLL_INTERVAL секунд берется только
+                          список PID, описание запрашивается у новых процессов.
+                          Потребители подписываются на старт и выход процессов
+                          по шаблонам имен (fnmatch, без учета регистра);
+                          колбэки вызываются в GUI-потоке.
+
+Раз в RESYNC_INTERVAL секунд монитор сверяет время старта известных процессов:
+PID, доставшийся новому процессу между опросами, превращается в выход и старт.
+"""
+import fnmatch
+import os
+import threading
+import time
+from PyQt5.QtCore import QObject, pyqtSignal
+
+STARTED, EXITED = "started", "exited"
+POLL_INTERVAL = 2     # сек, список PID
+RESYNC_INTERVAL = 60  # сек, проверка времени старта (повторно выданные PID)
+
+
+class ProcessBackend:
+    """Источник процессов. Описание процесса — (имя, exe, время старта, pid родителя) или None, если процесса уже нет."""
+
+    def pids(self):
+        raise NotImplementedError
+
+    def describe(self, pid):
+        raise NotImplementedError
+
+    def kill(self, pid, create_time):
+        """Завершает процесс, если PID все еще принадлежит процессу с этим временем старта. True — завершен."""
+        raise NotImplementedError
+
+    def terminate(self, pid, create_time):
+        """Просит процесс завершиться (он может сохраниться или отказаться). True — просьба отправлена."""
+        raise NotImplementedError
+
+    def is_alive(self, pid, create_time):
+        raise NotImplementedError
+
+
+class PsutilProcessBackend(ProcessBackend):
+    def __init__(self):
+        import psutil
+        self.psutil = psutil
+
+    def pids(self):
+        return self.psutil.pids()
+
+    def describe(self, pid):
+        try:
+            proc = self.psutil.Process(pid)
+            with proc.oneshot():
+                name, create_time, ppid = proc.name(), proc.create_time(), proc.ppid()
+                try:
+                    exe = proc.exe()
+                except (self.psutil.AccessDenied, self.psutil.ZombieProcess, OSError):
+                    exe = None  # системные процессы: имя доступно, путь — нет
+            return name, exe, create_time, ppid
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+            return None
+
+    def kill(self, pid, create_time):
+        try:
+            proc = self.psutil.Process(pid)
+            if proc.create_time() != create_time:
+                return False
+            proc.kill()
+            return True
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+            return False
+
+    def terminate(self, pid, create_time):
+        try:
+            proc = self.psutil.Process(pid)
+            if proc.create_time() != create_time:
+                return False
+            if os.name == "nt" and self._close_windows(pid):
+                return True  # игра получает WM_CLOSE и может сохраниться; TerminateProcess — только после таймаута
+            proc.terminate()
+            return True
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+            return False
+
+    def is_alive(self, pid, create_time):
+        try:
+            return self.psutil.Process(pid).create_time() == create_time
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+            return False
+
+    @staticmethod
+    def _close_windows(pid):
+        import win32con
+        import win32gui
+        import win32process
+        windows = []
+
+        def handle(hwnd, _):
+            if win32gui.IsWindowVisible(hwnd) and win32process.GetWindowThreadProcessId(hwnd)[1] == pid:
+                windows.append(hwnd)
+        win32gui.EnumWindows(handle, None)
+        for hwnd in windows:
+            win32gui.PostMessage(hwnd, win32con.WM_CLOSE, 0, 0)
+        return bool(windows)
+
+
+class FakeProcessBackend(ProcessBackend):
+    """
+    Процессы в памяти. Счетчики: обходов списка PID и запросов описания.
+    После terminate процесс выходит через close_delay секунд; close_delay=None — не выходит, пока не убьют.
+    """
+
+    def __init__(self, clock=None):
+        self._procs = {}
+        self._clock_fn = clock   # время старта процессов (по умолчанию — счетчик)
+        self._close_delay = {}
+        self._closing = {}   # pid -> момент выхода после terminate (time.monotonic)
+        self._clock = 0.0
+        self.pid_scans = 0
+        self.lookups = 0
+        self.killed = []
+        self.terminated = []
+
+    def pids(self):
+        self.pid_scans += 1
+        return list(self._procs)
+
+    def describe(self, pid):
+        self.lookups += 1
+        return self._procs.get(pid)
+
+    def kill(self, pid, create_time):
+        proc = self._procs.get(pid)
+        if proc is None or proc[2] != create_time:
+            return False
+        self.exit(pid)
+        self.killed.append((pid, proc[0]))
+        return True
+
+    def terminate(self, pid, create_time):
+        proc = self._procs.get(pid)
+        if proc is None or proc[2] != create_time:
+            return False
+        self.terminated.append((pid, proc[0]))
+        if self._close_delay.get(pid) is not None:
+            self._closing.setdefault(pid, time.monotonic() + self._close_delay[pid])
+        return True
+
+    def is_alive(self, pid, create_time):
+        if pid in self._closing and time.monotonic() >= self._closing[pid]:
+            self.exit(pid)
+        proc = self._procs.get(pid)
+        return proc is not None and proc[2] == create_time
+
+    def spawn(self, pid, name, exe=None, ppid=0, close_delay=0.0):
+        self._clock += 1
+        self._procs[pid] = (name, exe, self._clock_fn() if self._clock_fn else self._clock, ppid)
+        self._close_delay[pid] = close_delay
+        self._closing.pop(pid, None)
+
+    def exit(self, pid):
+        self._procs.pop(pid, None)
+        self._closing.pop(pid, None)
+
+
+class ProcessMonitor(QObject):
+    """
+    Таблица процессов с подписками. process_started(pid, имя) и
+    process_exited(pid, имя) приходят в GUI-потоке; так же вызываются колбэки
+    subscribe(). Таблицу можно читать из любого потока (processes, is_running).
+    """
+    process_started = pyqtSignal(int, str)
+    process_exited = pyqtSignal(int, str)
+    _delivered = pyqtSignal(object)
+
+    def __init__(self, backend, interval=POLL_INTERVAL, resync_interval=RESYNC_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.interval = interval
+        self.resync_interval = resync_interval
+        self._table = {}          # pid -> (имя, exe, время старта, родитель)
+        self._lock = threading.Lock()        # таблица
+        self._poll_lock = threading.Lock()   # один опрос за раз (фоновый поток или poll() из GUI)
+        self._subscriptions = {}  # handle -> [шаблоны, on_start, on_exit, pid подписчика]
+        self._next_handle = 0
+        self._last_resync = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self._delivered.connect(self._apply)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.poll()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="ProcessMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+    # --- таблица ---
+
+    def processes(self, pattern=None):
+        """[(pid, имя, exe, время старта)]; pattern — шаблон или список шаблонов имени."""
+        patterns = _patterns(pattern) if pattern is not None else None
+        with self._lock:
+            items = list(self._table.items())
+        return [(pid, name, exe, started) for pid, (name, exe, started, _) in items
+                if patterns is None or _matches(name, patterns)]
+
+    def info(self, pid):
+        """(имя, exe, время старта, pid родителя) из таблицы или None."""
+        with self._lock:
+            return self._table.get(pid)
+
+    def snapshot(self):
+        """Копия таблицы: {pid: (имя, exe, время старта, pid родителя)}."""
+        with self._lock:
+            return dict(self._table)
+
+    def is_running(self, pattern):
+        return bool(self.processes(pattern))
+
+    def poll(self, now=None, resync=True):
+        """
+        Один опрос: список PID, описание новых процессов. resync=False — без
+        сверки времени старта, даже если пора (срочный опрос перед закрытием).
+        Возвращает (стартовало, вышло).
+        """
+        with self._poll_lock:
+            self.polls += 1
+            current = set(self.backend.pids())
+            with self._lock:
+                known = dict(self._table)
+            events = [(EXITED, pid, known[pid][0]) for pid in known if pid not in current]
+            fresh = {}
+            for pid in current:
+                if pid not in known:
+                    info = self.backend.describe(pid)
+                    if info is not None:
+                        fresh[pid] = info
+            now = time.monotonic() if now is None else now
+            if resync and self.resync_interval and now - self._last_resync >= self.resync_interval:
+                self._last_resync = now
+                for pid, info in known.items():
+                    if pid not in current:
+                        continue
+                    actual = self.backend.describe(pid)
+                    if actual is None:
+                        events.append((EXITED, pid, info[0]))
+                    elif actual[2] != info[2]:
+                        # PID достался другому процессу, пока старый не был замечен завершившимся
+                        events.append((EXITED, pid, info[0]))
+                        fresh[pid] = actual
+            with self._lock:
+                for kind, pid, _ in events:
+                    self._table.pop(pid, None)
+                self._table.update(fresh)
+            events += [(STARTED, pid, info[0]) for pid, info in fresh.items()]
+        if events:
+            self._delivered.emit(events)
+        return len(fresh), len(events) - len(fresh)
+
+    def kill(self, pattern):
+        """
+        Завершает процессы, имя которых подходит под шаблоны. Перед этим
+        опрашивает PID, чтобы не пропустить только что запущенные.
+        Возвращает [(pid, имя)] завершенных.
+        """
+        self.poll()
+        killed = []
+        for pid, name, _, started in self.processes(pattern):
+            if self.backend.kill(pid, started):
+                killed.append((pid, name))
+        return killed
+
+    # --- подписки ---
+
+    def subscribe(self, pattern, on_start=None, on_exit=None):
+        """
+        Подписка на процессы по шаблону (или списку шаблонов) имени:
+        on_start(pid, имя), on_exit(pid, имя). Уже запущенные процессы сразу
+        приходят в on_start. Вызывать из GUI-потока. Возвращает handle для unsubscribe.
+        """
+        self._next_handle += 1
+        subscription = [_patterns(pattern), on_start, on_exit, set()]
+        self._subscriptions[self._next_handle] = subscription
+        for pid, name, _, _ in self.processes(pattern):
+            self._notify(subscription, STARTED, pid, name)
+        return self._next_handle
+
+    def unsubscribe(self, handle):
+        self._subscriptions.pop(handle, None)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[ProcessMonitor] Ошибка опроса процессов: {e}")
+
+    def _apply(self, events):
+        for kind, pid, name in events:
+            (self.process_started if kind == STARTED else self.process_exited).emit(pid, name)
+            for subscription in list(self._subscriptions.values()):
+                if _matches(name, subscription[0]):
+                    self._notify(subscription, kind, pid, name)
+
+    @staticmethod
+    def _notify(subscription, kind, pid, name):
+        # Подписчик видит каждый процесс один раз: событие, пришедшее после subscribe(), не дублирует снимок
+        patterns, on_start, on_exit, seen = subscription
+        if kind == STARTED and pid not in seen:
+            seen.add(pid)
+            if on_start: on_start(pid, name)
+        elif kind == EXITED and pid in seen:
+            seen.discard(pid)
+            if on_exit: on_exit(pid, name)
+
+
+def _patterns(pattern):
+    return [p.lower() for p in ([pattern] if isinstance(pattern, str) else pattern)]
+
+
+def _matches(name, patterns):
+    name = name.lower()
+    return any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+
+_monitor = None
+
+
+def get_process_monitor():
+    """Монитор процессов клиента (psutil); запускается тем, кто его использует (MainWindow)."""
+    global _monitor
+    if _monitor is None:
+        _monitor = ProcessMonitor(PsutilProcessBackend())
+    return _monitor
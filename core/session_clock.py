@@ -0,0 +1,186 @@
+"""
+Часы сессии киоска и пул фоновых сетевых задач.
+
+SessionClock — единственный планировщик клиента. Оставшееся время не
+уменьшается счетчиком раз в секунду, а вычисляется от монотонного дедлайна
+(time.monotonic()), поэтому задержки цикла событий или перевод системных часов
+не накапливают расхождение. Тот же QTimer запускает периодические задачи
+(heartbeat, синхронизация времени): таймер взводится на ближайшее из событий —
+границу следующей секунды сессии или срок очередной задачи.
+
+JobPool выполняет сетевые запросы на маленьком QThreadPool. Задачи с одним
+ключом не копятся: пока запрос выполняется, новая задача с тем же ключом
+заменяет ожидающую, так что медленный сервер не порождает очередь потоков.
+Колбэки вызываются в GUI-потоке.
+"""
+import math
+import time
+from PyQt5.QtCore import QObject, QTimer, QThreadPool, QRunnable, Qt, pyqtSignal
+
+WARN_AT = 300  # за сколько секунд до конца предупреждать пользователя
+
+
+class SessionClock(QObject):
+    tick = pyqtSignal(int)
+    warning = pyqtSignal(int)
+    time_up = pyqtSignal()
+
+    def __init__(self, warn_at=WARN_AT, parent=None):
+        super().__init__(parent)
+        self.warn_at = warn_at
+        self._deadline = None
+        self._reported = None
+        self._warned = False
+        self._periodic = {}  # ключ -> [интервал, следующий запуск, callback]
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._on_timeout)
+
+    # --- время сессии ---
+
+    def start(self, seconds):
+        self._deadline = time.monotonic() + seconds
+        self._reported = None
+        # Если сессия начата уже с малым остатком, предупреждение не показывается
+        self._warned = seconds <= self.warn_at
+        self._on_timeout()
+
+    def stop(self):
+        self._deadline = None
+        self._reschedule()
+
+    def is_running(self):
+        return self._deadline is not None
+
+    def remaining(self):
+        if self._deadline is None:
+            return 0
+        return max(0, math.ceil(self._deadline - time.monotonic()))
+
+    # --- периодические задачи ---
+
+    def every(self, key, interval, callback, first_in=None):
+        """Вызывает callback раз в `interval` секунд (первый раз — через `first_in`)."""
+        first_in = interval if first_in is None else first_in
+        self._periodic[key] = [interval, time.monotonic() + first_in, callback]
+        self._reschedule()
+
+    def cancel(self, key):
+        self._periodic.pop(key, None)
+        self._reschedule()
+
+    def shutdown(self):
+        """Останавливает и сессию, и все периодические задачи."""
+        self._periodic.clear()
+        self.stop()
+
+    def _on_timeout(self):
+        if self._deadline is not None:
+            left = self.remaining()
+            if left != self._reported:
+                self._reported = left
+                self.tick.emit(left)
+                if not self._warned and 0 < left <= self.warn_at:
+                    self._warned = True
+                    self.warning.emit(left)
+            if left == 0:
+                self._deadline = None
+                self.time_up.emit()
+        now = time.monotonic()
+        for key, task in list(self._periodic.items()):
+            interval, due, callback = task
+            if due > now or self._periodic.get(key) is not task:
+                continue
+            # После долгой паузы задача выполняется один раз, без "догоняющей" серии
+            task[1] = due + interval if due + interval > now else now + interval
+            callback()
+        self._reschedule()
+
+    def _reschedule(self):
+        now = time.monotonic()
+        wakeups = [task[1] for task in self._periodic.values()]
+        if self._deadline is not None:
+            left = max(0, math.ceil(self._deadline - now))
+            # Следующая граница секунды, на которой остаток уменьшится
+            wakeups.append(self._deadline - max(0, left - 1))
+        if not wakeups:
+            self._timer.stop()
+            return
+        self._timer.start(max(0, math.ceil((min(wakeups) - now) * 1000)))
+
+
+class _Job(QRunnable):
+    def __init__(self, done_signal, key, func):
+        super().__init__()
+        self.done_signal = done_signal
+        self.key = key
+        self.func = func
+
+    def run(self):
+        try:
+            result, error = self.func(), None
+        except Exception as e:
+            result, error = None, str(e)
+        self.done_signal.emit(self.key, result, error)
+
+
+class JobPool(QObject):
+    _done = pyqtSignal(str, object, object)
+
+    def __init__(self, max_threads=2, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._running = {}  # ключ -> (func, on_done, on_error)
+        self._pending = {}  # ключ -> задача, ожидающая окончания текущей
+        self.coalesced = 0
+        self._done.connect(self._on_done)
+
+    def submit(self, key, func, on_done=None, on_error=None):
+        """
+        Ставит func() в очередь. on_done(result) / on_error(str) вызываются в GUI-потоке.
+        Возвращает False, если задача с таким ключом уже выполняется — тогда
+        новая задача запустится после нее, заменив ранее ожидавшую.
+        """
+        job = (func, on_done, on_error)
+        if key in self._running:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = job
+            return False
+        self._start(key, job)
+        return True
+
+    def is_busy(self, key):
+        return key in self._running
+
+    def wait_for_done(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+    def _start(self, key, job):
+        self._running[key] = job
+        self._pool.start(_Job(self._done, key, job[0]))
+
+    def _on_done(self, key, result, error):
+        _, on_done, on_error = self._running.pop(key)
+        try:
+            if error is None:
+                if on_done: on_done(result)
+            elif on_error:
+                on_error(error)
+        finally:
+            pending = self._pending.pop(key, None)
+            if pending is not None:
+                self._start(key, pending)
+
+
+_job_pool = None
+
+
+def get_job_pool():
+    """Общий для всего клиента пул сетевых задач (создается при первом обращении)."""
+    global _job_pool
+    if _job_pool is None:
+        _job_pool = JobPool()
+    return _job_pool
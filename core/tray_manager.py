@@ -1,13 +1,14 @@
 from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt
-import psutil
 import os
+from core.process_monitor import get_process_monitor
 
 class TrayManager(QWidget):
-    def __init__(self, tray_btn):
+    def __init__(self, tray_btn, monitor=None):
         super().__init__()
         self.tray_btn = tray_btn
+        self.monitor = monitor or get_process_monitor()
         self.setWindowFlags(Qt.Popup)
         self.setStyleSheet("background-color: #222; color: white; border-radius: 10px;")
         self.setLayout(QVBoxLayout())
@@ -33,8 +34,7 @@ class TrayManager(QWidget):
             "Telegram.exe": "images/telegram.png"
         }
 
-        running = [p.name() for p in psutil.process_iter()]
-        active_tray = [(name, icon) for name, icon in tray_apps.items() if name in running]
+        active_tray = [(name, icon) for name, icon in tray_apps.items() if self.monitor.is_running(name)]
 
         while self.layout().count():
             item = self.layout().takeAt(0)
@@ -0,0 +1,304 @@
+"""
+Окна программ для панели задач киоска.
+
+Раньше TaskbarWorker раз в 3 секунды обходил все окна верхнего уровня
+(EnumWindows), для каждого заново определял exe по PID (OpenProcess) и искал
+его иконку, а панель задач пересоздавала все кнопки. Теперь:
+
+  WindowBackend       — источник окон: снимок (windows()) и события
+                        created / destroyed / title;
+  Win32HookBackend    — события Windows (SetWinEventHook) в отдельном потоке
+                        с циклом сообщений: окно приходит, когда появилось,
+                        а не на следующем опросе;
+  FakeWindowBackend   — окна в памяти: трекер работает и замеряется без Windows;
+  WindowTracker       — держит список окон, переводит события в GUI-поток и
+                        отдает панели задач только изменения. PID -> exe
+                        определяется в потоке бэкенда, exe -> иконка — в
+                        GUI-потоке (QPixmap вне него Qt не поддерживает);
+                        оба — один раз.
+
+Раз в RESYNC_INTERVAL секунд трекер сверяется со снимком окон: если какое-то
+событие потерялось, панель все равно догонит реальное состояние.
+"""
+import threading
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QIcon
+
+CREATED, DESTROYED, TITLE = "created", "destroyed", "title"
+RESYNC_INTERVAL = 60  # сек, сверка со снимком на случай потерянных событий
+
+
+class WindowBackend:
+    """Источник окон. Событие — (вид, hwnd, заголовок, pid); у destroyed заголовок и pid — None."""
+
+    def windows(self):
+        """Снимок окон для панели задач: {hwnd: (заголовок, pid)}."""
+        raise NotImplementedError
+
+    def start(self, on_event):
+        """Начинает присылать события в on_event (из любого потока)."""
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+
+def is_taskbar_window(hwnd):
+    """Окно, которое показывается на панели задач: видимое, активное, с заголовком и системным меню."""
+    import win32gui
+    import win32con
+    try:
+        if not win32gui.IsWindowVisible(hwnd) or not win32gui.IsWindowEnabled(hwnd):
+            return False
+        if not win32gui.GetWindowText(hwnd).strip():
+            return False
+        style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
+        return bool(style & win32con.WS_CAPTION) and bool(style & win32con.WS_SYSMENU)
+    except Exception:
+        return False  # окно закрылось, пока его проверяли
+
+
+class Win32HookBackend(WindowBackend):
+    EVENT_OBJECT_CREATE = 0x8000
+    EVENT_OBJECT_DESTROY = 0x8001
+    EVENT_OBJECT_SHOW = 0x8002
+    EVENT_OBJECT_HIDE = 0x8003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    OBJID_WINDOW = 0
+    CHILDID_SELF = 0
+    GA_ROOT = 2
+    WM_QUIT = 0x0012
+
+    def __init__(self):
+        self._on_event = None
+        self._thread = None
+        self._thread_id = None
+        self._visible = set()   # hwnd окон, уже отданных трекеру (только поток хуков)
+        self._ready = threading.Event()
+
+    def windows(self):
+        import win32gui
+        import win32process
+        result = {}
+
+        def handle(hwnd, _):
+            if is_taskbar_window(hwnd):
+                result[hwnd] = (win32gui.GetWindowText(hwnd), win32process.GetWindowThreadProcessId(hwnd)[1])
+        win32gui.EnumWindows(handle, None)
+        return result
+
+    def start(self, on_event):
+        self._on_event = on_event
+        self._thread = threading.Thread(target=self._loop, name="WindowHooks", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+
+    def stop(self):
+        if self._thread_id is not None:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+            self._thread.join(2)
+        self._on_event = None
+
+    def _loop(self):
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        proc_type = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                       wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.GetAncestor.restype = wintypes.HWND
+        # Ссылку на колбэк держит объект: собранный сборщиком мусора колбэк уронит процесс
+        self._proc = proc_type(lambda hook, event, hwnd, id_object, id_child, thread, ms:
+                               self._on_win_event(user32, event, hwnd, id_object, id_child))
+        # Два диапазона: create..hide и namechange (между ними — частые события фокуса и перемещения)
+        hooks = [user32.SetWinEventHook(self.EVENT_OBJECT_CREATE, self.EVENT_OBJECT_HIDE, 0, self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT),
+                 user32.SetWinEventHook(self.EVENT_OBJECT_NAMECHANGE, self.EVENT_OBJECT_NAMECHANGE, 0, self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT)]
+        self._visible = set(self.windows())
+        self._thread_id = kernel32.GetCurrentThreadId()
+        self._ready.set()
+        msg = wintypes.MSG()
+        try:
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in hooks:
+                if hook: user32.UnhookWinEvent(hook)
+            self._thread_id = None
+
+    def _on_win_event(self, user32, event, hwnd, id_object, id_child):
+        if id_object != self.OBJID_WINDOW or id_child != self.CHILDID_SELF or not hwnd or self._on_event is None:
+            return
+        try:
+            if event in (self.EVENT_OBJECT_DESTROY, self.EVENT_OBJECT_HIDE):
+                if hwnd in self._visible:
+                    self._visible.discard(hwnd)
+                    self._on_event((DESTROYED, hwnd, None, None))
+                return
+            if user32.GetAncestor(hwnd, self.GA_ROOT) != hwnd:
+                return  # дочерние элементы окон (кнопки, поля) панели задач не интересны
+            import win32gui
+            import win32process
+            valid = is_taskbar_window(hwnd)
+            if valid and hwnd not in self._visible:
+                self._visible.add(hwnd)
+                self._on_event((CREATED, hwnd, win32gui.GetWindowText(hwnd), win32process.GetWindowThreadProcessId(hwnd)[1]))
+            elif valid and event == self.EVENT_OBJECT_NAMECHANGE:
+                self._on_event((TITLE, hwnd, win32gui.GetWindowText(hwnd), None))
+            elif not valid and hwnd in self._visible:
+                # Заголовок стал пустым или окно потеряло стиль — с панели задач его убираем
+                self._visible.discard(hwnd)
+                self._on_event((DESTROYED, hwnd, None, None))
+        except Exception as e:
+            print(f"[WindowHooks] Ошибка обработки события окна {hwnd}: {e}")
+
+
+class FakeWindowBackend(WindowBackend):
+    """Окна в памяти: события приходят сразу, в потоке того, кто открыл/закрыл окно."""
+
+    def __init__(self):
+        self._windows = {}
+        self._on_event = None
+        self.snapshots = 0
+
+    def windows(self):
+        self.snapshots += 1
+        return dict(self._windows)
+
+    def start(self, on_event):
+        self._on_event = on_event
+
+    def stop(self):
+        self._on_event = None
+
+    def open(self, hwnd, title, pid):
+        self._windows[hwnd] = (title, pid)
+        self._emit((CREATED, hwnd, title, pid))
+
+    def close(self, hwnd):
+        if self._windows.pop(hwnd, None) is not None:
+            self._emit((DESTROYED, hwnd, None, None))
+
+    def rename(self, hwnd, title):
+        if hwnd in self._windows:
+            self._windows[hwnd] = (title, self._windows[hwnd][1])
+            self._emit((TITLE, hwnd, title, None))
+
+    def _emit(self, event):
+        if self._on_event is not None:
+            self._on_event(event)
+
+
+def _default_resolve_exe(pid):
+    import os
+    from utils.win_tools import get_exe_path_from_pid
+    exe_path = get_exe_path_from_pid(pid)
+    return exe_path if exe_path and os.path.exists(exe_path) else None
+
+
+def _default_load_icon(exe_path):
+    from utils.icons import extract_icon_from_exe
+    from utils.icon_cache import get_icon_cache
+    return get_icon_cache().exe_icon(exe_path, extract_icon_from_exe)
+
+
+class WindowTracker(QObject):
+    """
+    Окна для панели задач. Сигналы приходят в GUI-потоке и только на изменения:
+    window_created(hwnd, заголовок, иконка), window_destroyed(hwnd), title_changed(hwnd, заголовок).
+    Окна, для которых не нашлись exe или иконка, на панель не попадают (как раньше).
+    """
+    window_created = pyqtSignal(int, str, QIcon)
+    window_destroyed = pyqtSignal(int)
+    title_changed = pyqtSignal(int, str)
+    _delivered = pyqtSignal(object)
+
+    def __init__(self, backend, resolve_exe=_default_resolve_exe, load_icon=_default_load_icon,
+                 resync_interval=RESYNC_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.resolve_exe = resolve_exe
+        self.load_icon = load_icon
+        self._windows = {}       # hwnd -> [заголовок, иконка, pid], в порядке появления (только GUI-поток)
+        self._exe_by_pid = {}    # pid -> путь exe или None (поток бэкенда и GUI-поток, под _lock)
+        self._icon_by_exe = {}   # путь exe -> QIcon (только GUI-поток: QPixmap вне него Qt не поддерживает)
+        self._lock = threading.Lock()
+        self.exe_lookups = 0; self.icon_loads = 0
+        self._delivered.connect(self._apply)
+        self._resync_timer = QTimer(self)
+        self._resync_timer.timeout.connect(self.resync)
+        self.resync_interval = resync_interval
+
+    def start(self):
+        self.backend.start(self._on_backend_event)
+        self.resync()
+        if self.resync_interval:
+            self._resync_timer.start(int(self.resync_interval * 1000))
+
+    def stop(self):
+        self._resync_timer.stop()
+        self.backend.stop()
+
+    def windows(self):
+        """[(hwnd, заголовок, иконка)] в порядке появления."""
+        return [(hwnd, title, icon) for hwnd, (title, icon, _) in self._windows.items()]
+
+    def resync(self):
+        """Сверяет список со снимком окон (GUI-поток): потерянные события превращаются в изменения."""
+        snapshot = self.backend.windows()
+        for hwnd in [hwnd for hwnd in self._windows if hwnd not in snapshot]:
+            self._apply((DESTROYED, hwnd, None, None, None))
+        for hwnd, (title, pid) in snapshot.items():
+            if hwnd in self._windows:
+                self._apply((TITLE, hwnd, title, None, None))
+            else:
+                self._apply((CREATED, hwnd, title, pid, self.exe_for_pid(pid)))
+
+    def exe_for_pid(self, pid):
+        """Путь exe по PID (None, если не определить); запоминается до закрытия последнего окна процесса."""
+        with self._lock:
+            if pid in self._exe_by_pid:
+                return self._exe_by_pid[pid]
+        exe_path = self.resolve_exe(pid)
+        with self._lock:
+            self._exe_by_pid[pid] = exe_path
+            self.exe_lookups += 1
+        return exe_path
+
+    def icon_for_exe(self, exe_path):
+        """Иконка программы (GUI-поток): извлекается один раз на exe, пустая — если exe не определен."""
+        if exe_path is None:
+            return QIcon()
+        icon = self._icon_by_exe.get(exe_path)
+        if icon is None:
+            icon = self._icon_by_exe[exe_path] = self.load_icon(exe_path)
+            self.icon_loads += 1
+        return icon
+
+    def _on_backend_event(self, event):
+        # Поток бэкенда: здесь только PID -> exe (OpenProcess), иконку из exe строит GUI-поток в _apply
+        kind, hwnd, title, pid = event
+        self._delivered.emit((kind, hwnd, title, pid, self.exe_for_pid(pid) if kind == CREATED else None))
+
+    def _apply(self, event):
+        kind, hwnd, title, pid, exe_path = event
+        known = self._windows.get(hwnd)
+        if kind == CREATED and known is None:
+            icon = self.icon_for_exe(exe_path)
+            if icon is None or icon.isNull():
+                return
+            self._windows[hwnd] = [title, icon, pid]
+            self.window_created.emit(hwnd, title, icon)
+        elif kind == DESTROYED and known is not None:
+            del self._windows[hwnd]
+            if not any(entry[2] == known[2] for entry in self._windows.values()):
+                # У процесса не осталось окон: PID может достаться другой программе
+                with self._lock:
+                    self._exe_by_pid.pop(known[2], None)
+            self.window_destroyed.emit(hwnd)
+        elif kind == TITLE and known is not None and known[0] != title:
+            known[0] = title
+            self.title_changed.emit(hwnd, title)
@@ -9,8 +9,8 @@ set DD=%date:~0,2%
 set TODAY=%YYYY%-%MM%-%DD%
 
 :: --- НАСТРОЙКИ ---
-:: 1. Укажи, где лежит твоя "живая" база данных
-set SOURCE_FILE="C:\Users\HIkkvl\Documents\GitHub\LoVHub\central_club.db"
+:: 1. Укажи папку сервера (где лежат server.py и "живая" central_club.db)
+set SERVER_FOLDER="C:\Users\HIkkvl\Documents\GitHub\LoVHub"
 
 :: 2. Укажи, куда сохранять бэкапы (папка из Шага 1)
 set BACKUP_FOLDER="C:\MyLauncherBackups"
@@ -19,9 +19,11 @@ set BACKUP_FOLDER="C:\MyLauncherBackups"
 set BACKUP_FILE="central_club_backup_%TODAY%.db"
 :: --- КОНЕЦ НАСТРОЕК ---
 
-echo Backing up %SOURCE_FILE% to %BACKUP_FOLDER%\%BACKUP_FILE%
+echo Backing up %SERVER_FOLDER%\central_club.db to %BACKUP_FOLDER%\%BACKUP_FILE%
 
-:: Копируем файл
-copy %SOURCE_FILE% %BACKUP_FOLDER%\%BACKUP_FILE%
+:: База работает в режиме WAL, поэтому простой copy может захватить ее
+:: в несогласованном состоянии. Копию снимает сам SQLite (backup API).
+cd /d %SERVER_FOLDER%
+py -m flask --app server backup-db %BACKUP_FOLDER%\%BACKUP_FILE%
 
 echo --- Backup Complete ---
\ No newline at end of file
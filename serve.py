@@ -0,0 +1,106 @@
+"""
+Запуск сервера клуба в рабочем режиме вместо встроенного сервера Flask.
+
+  py serve.py                    — сервер из config.ini ([Server] -> Backend)
+  py serve.py --backend dev      — как раньше "py server.py"
+
+gunicorn (Linux): Workers процессов по Threads потоков, HTTPS делает сам
+gunicorn (CertFile/KeyFile). Схема базы мигрируется один раз в мастере, затем
+каждый рабочий процесс поднимает свое состояние (server.init_worker): пул
+соединений SQLite, буфер пульсов, пул платежного шлюза. Общее для процессов
+состояние — команды киоскам, счета Kaspi, попытки входа, срок обслуживания
+журнала — лежит в базе, поэтому киоск может попасть в любой процесс. Плавная
+перезагрузка процессов без обрыва запросов: kill -HUP $(cat lovhub.pid).
+
+waitress (Windows): один процесс, Threads потоков (Workers не используется).
+waitress не умеет TLS, а киоски подключаются только по HTTPS, поэтому перед
+ним обязателен HTTPS-прокси (Caddy, nginx, stunnel), а сам сервер слушает
+Bind без шифрования на 127.0.0.1 — на другом адресе serve.py его не запустит.
+"""
+import argparse
+import logging
+import sys
+
+from utils.config_loader import (get_server_backend, get_server_bind, get_server_workers,
+                                 get_server_threads, get_tls_files)
+
+logger = logging.getLogger("serve")
+
+PID_FILE = "lovhub.pid"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1", "[::1]")
+
+
+def split_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def run_gunicorn(bind, workers, threads, cert_files):
+    from gunicorn.app.base import BaseApplication
+
+    class ClubServer(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": bind, "workers": workers, "threads": threads, "worker_class": "gthread",
+                "certfile": cert_files[0], "keyfile": cert_files[1],
+                # Приложение импортируется в мастере (миграции схемы выполняются один раз),
+                # а фоновое состояние каждый процесс поднимает сам после fork
+                "preload_app": True, "post_fork": lambda arbiter, worker: self.server.init_worker(),
+                "pidfile": PID_FILE, "graceful_timeout": 30,
+                # Поток с подпиской SSE занят все время, поэтому таймаут — только на зависший процесс
+                "timeout": 120, "keepalive": 30,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import server
+            # В мастере запросы не обслуживаются: потоки и соединения, созданные при импорте, закрываются до fork
+            server.shutdown_worker()
+            self.server = server
+            return server.app
+
+    ClubServer().run()
+
+
+def run_waitress(bind, threads):
+    host, port = split_bind(bind)
+    if host not in LOOPBACK_HOSTS:
+        # Без TLS на внешнем адресе киоски (только https://) не подключатся, а пароли шли бы открытым текстом
+        sys.exit(f"waitress не завершает TLS: поставьте перед ним HTTPS-прокси (Caddy, nginx, stunnel) "
+                 f"и укажите Bind = 127.0.0.1:{port} (сейчас {bind})")
+    from waitress import serve
+    import server
+    serve(server.app, host=host, port=port, threads=threads, ident="LoVHub")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["auto", "gunicorn", "waitress", "dev"], default=None)
+    parser.add_argument("--bind", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    backend = args.backend or get_server_backend()
+    if backend == "auto":
+        backend = "waitress" if sys.platform == "win32" else "gunicorn"
+    bind = args.bind or get_server_bind()
+    workers = args.workers or get_server_workers()
+    threads = args.threads or get_server_threads()
+    cert_files = get_tls_files()
+    logger.info(f"Сервер клуба: {backend}, {bind}, процессов {workers if backend == 'gunicorn' else 1}, потоков {threads}")
+
+    if backend == "gunicorn":
+        run_gunicorn(bind, workers, threads, cert_files)
+    elif backend == "waitress":
+        run_waitress(bind, threads)
+    else:
+        import server
+        host, port = split_bind(bind)
+        server.run_dev_server(host, port, cert_files)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session
+from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session, Response
 import os
 import sqlite3
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
 from functools import wraps
 import logging
 from contextlib import contextmanager
 from flask_cors import CORS
 import ssl
 import sys
-from datetime import datetime, timedelta 
+from datetime import datetime, timedelta, timezone
 
 from flask_basicauth import BasicAuth 
 from flask_login import (LoginManager, UserMixin, login_user, 
@@ -22,23 +22,50 @@ from wtforms.validators import DataRequired, Length, EqualTo, Optional
 
 from utils.config_loader import (
     get_admin_username, get_admin_password, get_secret_key,
-    get_kaspi_public_key, get_kaspi_private_key 
+    get_kaspi_public_key, get_kaspi_private_key, get_kaspi_api_url,
+    get_heartbeat_flush_interval, get_db_reader_count, get_db_synchronous,
+    get_log_retention_months, get_hourly_rollup_days,
+    get_login_workers, get_login_attempts_per_ip, get_session_token_ttl, get_require_session_token
 )
+from utils.heartbeat_buffer import HeartbeatBuffer
+from utils.db_pool import ConnectionPool
+from utils.dashboard_stats import rebuild_stats, read_stats
+from utils.migrations import run_migrations, check_query_plans, backup_database
+from utils.seat_board import SeatBoard, KioskActions, OFFLINE_AFTER_SEC
+from utils.app_catalog import catalog_version, catalog_etag, catalog_changes_since
+from utils.session_ledger import (read_account, remaining, start_session, extend_session,
+                                  pause_session, stale_sessions)
+from utils.payment_gateway import PaymentGateway, GatewayUnavailable, save_invoice, load_invoice, forget_old_invoices
+from utils.balance_service import credit, credit_order, buy_package, is_kiosk_order, RecentOrders, UserNotFound, InsufficientFunds
+from utils.kiosk_auth import (PasswordVerifier, AdmissionLimiter, SessionTokens, LoginBusy, LoginThrottled,
+                              SESSION_TOKEN_HEADER)
+from utils.launch_archive import (rotate_launch_logs, apply_retention, clear_raw_logs, recent_launches,
+                                  launch_summary, playtime_summary, launch_timestamp, claim_maintenance, ROTATE_BATCH)
+from utils.kiosk_outbox import (apply_mutations, apply_offline_time, forget_old_mutations, MutationRejected,
+                                MAX_OUTBOX_BATCH, OFFLINE_TOKEN_MAX_AGE)
 
 import json
-import requests
+import secrets
 import time
 import hashlib
 import hmac
 import base64
+import atexit
+import math
+import click
+import threading
 
-KASPI_API_URL = "https://api.kaspi.kz/v2/invoices" 
 KASPI_SIGNATURE_HEADER = "X-Signature" 
 
 DATABASE_NAME = "central_club.db"
 ICON_FOLDER = 'static/icons'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 2 * 1024 * 1024  # 2MB
+MAX_HEARTBEAT_BATCH = 1000
+MAX_LAUNCH_BATCH = 1000
+SEAT_STREAM_KEEPALIVE = 15  # сек, комментарий-пинг в SSE, чтобы прокси не рвали соединение
+PAYMENT_INLINE_WAIT = 1.0  # сек, сколько create_payment ждет ссылку, прежде чем ответить "pending"
+LOG_MAINTENANCE_INTERVAL = 3600  # сек, как часто журнал запусков переносится в архив и чистится по сроку хранения
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -57,37 +84,23 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def init_db():
-    """Создает ВСЕ таблицы в ЕДИНОЙ базе данных central_club.db"""
+    """Приводит схему central_club.db к последней версии (см. utils/migrations.py)"""
     with db_connection() as conn:
-        conn.execute('''CREATE TABLE IF NOT EXISTS apps (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, path TEXT NOT NULL, type TEXT NOT NULL CHECK(type IN ('game', 'app')), icon TEXT)''')
-        conn.execute('''CREATE TABLE IF NOT EXISTS launch_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, computer_name TEXT, ip_address TEXT, user TEXT, app_name TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-        conn.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, password_hash TEXT NOT NULL, balance INTEGER DEFAULT 0, time_left INTEGER DEFAULT 0)''')
-        conn.execute('''CREATE TABLE IF NOT EXISTS computers (id INTEGER PRIMARY KEY AUTOINCREMENT, pc_name TEXT NOT NULL UNIQUE, ip_address TEXT, status TEXT DEFAULT 'Отключен', current_user TEXT, last_heartbeat DATETIME, time_remaining INTEGER DEFAULT 0, session_name TEXT, session_start_time DATETIME, session_end_time DATETIME, display_name TEXT )''')
-        conn.execute('''CREATE TABLE IF NOT EXISTS transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, type TEXT NOT NULL CHECK(type IN ('kaspi_topup', 'package_purchase', 'admin_topup')), username TEXT, amount INTEGER NOT NULL, order_id TEXT)''')
-        
-        conn.execute('''CREATE TABLE IF NOT EXISTS tariffs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            duration_text TEXT, 
-            price_common INTEGER DEFAULT 0,
-            price_vip INTEGER DEFAULT 0,
-            schedule_text TEXT,
-            schedule_icons TEXT,
-            is_active BOOLEAN DEFAULT 0 
-        )''')
+        run_migrations(conn, backup_path=f"{DATABASE_NAME}.pre-migration.bak")
+
+db_pool = ConnectionPool(DATABASE_NAME, readers=get_db_reader_count(), synchronous=get_db_synchronous())
 
 @contextmanager
-def db_connection(db_path=DATABASE_NAME):
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    try:
+def db_connection():
+    """Соединение-писатель из пула (для всех запросов, которые что-то меняют)"""
+    with db_pool.writer() as conn:
+        yield conn
+
+@contextmanager
+def db_read():
+    """Соединение-читатель из пула (только SELECT, не блокируется записями)"""
+    with db_pool.reader() as conn:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
 
 app = Flask(__name__)
 CORS(app) 
@@ -104,9 +117,122 @@ app.config['BASIC_AUTH_USERNAME'] = get_admin_username()
 app.config['BASIC_AUTH_PASSWORD'] = get_admin_password()
 app.config['BASIC_AUTH_REALM'] = 'Launcher API Login' 
 basic_auth = BasicAuth(app)
+session_tokens = SessionTokens(app.config['SECRET_KEY'], ttl=get_session_token_ttl())
+login_limiter = AdmissionLimiter(per_ip=get_login_attempts_per_ip())
+REQUIRE_SESSION_TOKEN = get_require_session_token()
 os.makedirs(ICON_FOLDER, exist_ok=True)
 init_db() 
 
+def flush_heartbeats(beats):
+    """Записывает пачку heartbeat'ов из буфера в таблицу computers одной транзакцией"""
+    with db_connection() as conn:
+        conn.executemany(
+            """INSERT INTO computers (pc_name, ip_address, status, current_user, last_heartbeat, time_remaining)
+               VALUES (:pc_name, :ip_address, :status, :user, :timestamp, :time_left)
+               ON CONFLICT(pc_name) DO UPDATE SET
+                   ip_address = excluded.ip_address, status = excluded.status,
+                   current_user = excluded.current_user, last_heartbeat = excluded.last_heartbeat,
+                   time_remaining = excluded.time_remaining""",
+            beats
+        )
+
+seat_board = SeatBoard()
+seat_board_lock = threading.Lock()
+
+def refresh_seat_board():
+    """Перечитывает computers и обновляет состояние зала (подписчики SSE получают только изменившиеся ПК)"""
+    with seat_board_lock:
+        with db_read() as conn:
+            rows = conn.execute("SELECT * FROM computers").fetchall()
+        return seat_board.refresh([dict(row) for row in rows])
+
+def ensure_seat_board():
+    if not seat_board.version:
+        refresh_seat_board()
+
+kiosk_actions = KioskActions()
+processed_orders = RecentOrders()
+
+def notify_user_seat(conn, username, text):
+    """Кладет уведомление для ПК, за которым сейчас сидит клиент (доставит /api/kiosk/sync)"""
+    pc = conn.execute("SELECT id, pc_name FROM computers WHERE current_user = ?", (username,)).fetchone()
+    if pc: kiosk_actions.push(conn, pc['pc_name'], {"type": "notify", "text": text})
+    return pc
+
+def sweep_sessions():
+    """Ставит на паузу сессии клиентов, чей ПК замолчал, и закрывает закончившиеся"""
+    with db_read() as conn:
+        stale = stale_sessions(conn, OFFLINE_AFTER_SEC)
+    if stale:
+        with db_connection() as conn:
+            for username, at in stale: pause_session(conn, username, at)
+        logger.info(f"Остановлено сессий: {len(stale)} ({', '.join(name for name, _ in stale)})")
+
+next_log_maintenance = 0.0
+
+def maintain_launch_logs():
+    """Переносит прошлые месяцы журнала запусков в архив порциями и удаляет то, что старше срока хранения"""
+    moved = 0
+    while True:
+        with db_connection() as conn: batch = rotate_launch_logs(conn)
+        moved += batch
+        if batch < ROTATE_BATCH: break
+    with db_connection() as conn:
+        dropped = apply_retention(conn, get_log_retention_months(), get_hourly_rollup_days())
+        forget_old_mutations(conn)
+        # Заодно чистятся общие таблицы процессов: недоставленные команды, старые счета и попытки входа
+        kiosk_actions.forget_old(conn); login_limiter.forget_old(conn)
+        if payment_gateway: forget_old_invoices(conn, payment_gateway.invoice_ttl)
+    if moved or dropped:
+        logger.info(f"Журнал запусков: в архив перенесено {moved}, удалено архивов по сроку хранения: {len(dropped)} {' '.join(dropped)}")
+    return moved, dropped
+
+def on_heartbeat_tick():
+    global next_log_maintenance
+    sweep_sessions()
+    refresh_seat_board()
+    if time.monotonic() >= next_log_maintenance:
+        # Срок в базе общий: из нескольких процессов сервера обслуживание запускает один
+        next_log_maintenance = time.monotonic() + LOG_MAINTENANCE_INTERVAL
+        with db_connection() as conn: due = claim_maintenance(conn, "launch_logs", LOG_MAINTENANCE_INTERVAL)
+        if due: maintain_launch_logs()
+
+# Такт буфера: сначала сброс пульсов в БД, затем остановка "зависших" сессий и пересчет зала (ловит и переходы в "Отключен")
+heartbeat_buffer = HeartbeatBuffer(flush_heartbeats, interval=get_heartbeat_flush_interval(), on_tick=on_heartbeat_tick)
+payment_gateway = None
+password_verifier = None
+
+def init_worker():
+    """
+    Фоновое состояние процесса: поток буфера пульсов, пул платежного шлюза и пул проверки паролей;
+    соединения SQLite пул открывает сам при первом запросе. serve.py вызывает
+    это в каждом рабочем процессе gunicorn после fork — потоки и соединения
+    мастера в дочерний процесс не переходят. Все, что процессы должны видеть
+    одинаково (команды киоскам, счета Kaspi, попытки входа, срок обслуживания
+    журнала), лежит в базе; в памяти — только кэши и доска зала, которую каждый
+    процесс перечитывает из computers на такте буфера пульсов.
+    """
+    global payment_gateway, password_verifier
+    db_pool.close()
+    payment_gateway = PaymentGateway(get_kaspi_api_url(), store=store_invoice)
+    password_verifier = PasswordVerifier(workers=get_login_workers())
+    heartbeat_buffer.start()
+
+def store_invoice(invoice):
+    """Состояние счета Kaspi в базе: статус опрашивают через любой процесс сервера"""
+    with db_connection() as conn:
+        save_invoice(conn, invoice)
+
+def shutdown_worker():
+    """Сбрасывает накопленные пульсы и закрывает соединения процесса"""
+    heartbeat_buffer.stop()
+    if payment_gateway: payment_gateway.close()
+    if password_verifier: password_verifier.close()
+    db_pool.close()
+
+init_worker()
+atexit.register(shutdown_worker)
+
 def save_icon(file):
     if not file or not allowed_file(file.filename): return None
     if len(file.read()) > MAX_FILE_SIZE: return None
@@ -114,47 +240,30 @@ def save_icon(file):
     filename = secure_filename(file.filename); file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     file.save(file_path); return filename
 def get_apps():
-    with db_connection() as conn:
-        rows = conn.execute("SELECT id, name, path, type, icon FROM apps").fetchall()
+    with db_read() as conn:
+        rows = conn.execute("SELECT id, name, path, type, icon, tags FROM apps").fetchall()
         return [dict(row) for row in rows]
 def get_logs(limit=100):
-    with db_connection() as conn:
-        rows = conn.execute(
-            """SELECT 
-                   T1.ip_address, T1.user, T1.app_name, T1.timestamp,
-                   COALESCE(T2.display_name, T1.computer_name) as computer_name_to_display
-               FROM launch_logs AS T1
-               LEFT JOIN computers AS T2 ON T1.computer_name = T2.pc_name
-               ORDER BY T1.timestamp DESC 
-               LIMIT ?""",
-            (limit,)
-        ).fetchall()
-        return [dict(row) for row in rows]
+    with db_read() as conn:
+        return [dict(row) for row in recent_launches(conn, limit)]
 def get_users(search_term=None):
-    with db_connection() as conn:
+    with db_read() as conn:
         if search_term:
-            query = "SELECT id, username, balance, time_left FROM users WHERE username LIKE ? ORDER BY username"; params = (f'%{search_term}%',)
+            query = "SELECT id, username, balance, time_left, session_deadline FROM users WHERE username LIKE ? ORDER BY username"; params = (f'%{search_term}%',)
         else:
-            query = "SELECT id, username, balance, time_left FROM users ORDER BY username"; params = ()
-        rows = conn.execute(query, params).fetchall(); return [dict(row) for row in rows]
+            query = "SELECT id, username, balance, time_left, session_deadline FROM users ORDER BY username"; params = ()
+        rows = conn.execute(query, params).fetchall()
+    return [dict(row, time_left=remaining(row)) for row in rows]
 def get_dashboard_stats():
     try:
-        with db_connection() as conn:
-            users_count = conn.execute("SELECT COUNT(id) FROM users").fetchone()[0]; apps_count = conn.execute("SELECT COUNT(id) FROM apps").fetchone()[0]
-            total_computers = conn.execute("SELECT COUNT(id) FROM computers").fetchone()[0]
+        with db_read() as conn:
+            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            stats = read_stats(conn, today_start.strftime('%Y-%m-%d'))
             active_threshold = datetime.now() - timedelta(seconds=60)
             enabled_computers = conn.execute("SELECT COUNT(id) FROM computers WHERE last_heartbeat > ?", (active_threshold,)).fetchone()[0]
-            disabled_computers = total_computers - enabled_computers
-            top_app = conn.execute("SELECT app_name, COUNT(app_name) as count FROM launch_logs GROUP BY app_name ORDER BY count DESC LIMIT 1").fetchone()
-            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            revenue_total = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE timestamp >= ? AND type IN ('kaspi_topup', 'admin_topup')", (today_start,)).fetchone()[0]
-            revenue_packages = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE timestamp >= ? AND type = 'package_purchase'", (today_start,)).fetchone()[0]
-            revenue_kaspi = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE timestamp >= ? AND type = 'kaspi_topup'", (today_start,)).fetchone()[0]
-        return {
-            "users_count": users_count, "apps_count": apps_count, "total_computers": total_computers, "enabled_computers": enabled_computers, "disabled_computers": disabled_computers,
-            "top_app_name": top_app['app_name'] if top_app else "N/A", "top_app_count": top_app['count'] if top_app else 0,
-            "revenue_total": revenue_total, "revenue_packages": revenue_packages, "revenue_kaspi": revenue_kaspi
-        }
+        stats["enabled_computers"] = enabled_computers
+        stats["disabled_computers"] = stats["total_computers"] - enabled_computers
+        return stats
     except Exception as e:
         logger.error(f"Ошибка сбора статистики: {e}")
         return {"users_count": 0, "apps_count": 0, "total_computers": 0, "enabled_computers": 0, "disabled_computers": 0, "top_app_name": "Error", "top_app_count": 0, "revenue_total": 0, "revenue_packages": 0, "revenue_kaspi": 0}
@@ -169,6 +278,7 @@ class AppForm(FlaskForm):
     path = StringField('Путь к .exe или URL', validators=[DataRequired(), Length(min=3, max=500)])
     type = SelectField('Тип', choices=[('game', 'Игра'), ('app', 'Приложение')], validators=[DataRequired()])
     icon = FileField('Иконка (png, jpg)', validators=[FileAllowed(['jpg', 'jpeg', 'png'], 'Только изображения!')])
+    tags = StringField('Теги и другие названия (через запятую)', validators=[Optional(), Length(max=300)])
     submit = SubmitField('Сохранить')
 class RegisterUserForm(FlaskForm):
     username = StringField('Имя пользователя (Логин)', validators=[DataRequired(), Length(min=3, max=100)])
@@ -210,7 +320,7 @@ def index():
     search_term = request.args.get('search', '') 
     error_pcs = []
     try:
-        with db_connection() as conn:
+        with db_read() as conn:
             active_threshold = datetime.now() - timedelta(seconds=60)
             rows = conn.execute(
                 """SELECT pc_name, display_name, last_heartbeat 
@@ -235,42 +345,13 @@ def index():
 @app.route('/computers')
 @login_required
 def computers_page():
-    search_term = request.args.get('search', ''); computers_list = []
+    search_term = request.args.get('search', ''); computers_list = []; seats_version = 0
     try:
-        with db_connection() as conn:
-            rows = conn.execute("SELECT * FROM computers ORDER BY pc_name")
-            for row in rows:
-                pc_data = dict(row); last_beat = pc_data.get('last_heartbeat')
-                if not last_beat:
-                    pc_data['status'] = "Неизвестно"; pc_data['status_class'] = "status-offline" ; pc_data['current_user'] = "-"
-                else:
-                    time_diff = datetime.now() - datetime.fromisoformat(last_beat)
-                    if time_diff.total_seconds() > 60:
-                        pc_data['status'] = "Отключен"; pc_data['status_class'] = "status-offline"; pc_data['current_user'] = "-"
-                    else:
-                        if pc_data['current_user']:
-                            pc_data['status'] = "Используется"; pc_data['status_class'] = "status-active"
-                        else:
-                            pc_data['status'] = "Активен"; pc_data['status_class'] = "status-active"
-                pc_data['client'] = pc_data['current_user'] if pc_data['current_user'] else "-"
-                time_sec = pc_data.get('time_remaining')
-                if time_sec is not None and time_sec > 0:
-                    hours = time_sec // 3600; mins = (time_sec % 3600) // 60
-                    pc_data['remaining'] = f"{hours}ч {mins}м"
-                else:
-                    pc_data['remaining'] = "-"
-                if pc_data['status'] != "Отключен" and pc_data.get('session_name'):
-                    pc_data['session'] = pc_data['session_name']; pc_data['start'] = datetime.fromisoformat(pc_data['session_start_time']).strftime('%H:%M'); pc_data['end'] = datetime.fromisoformat(pc_data['session_end_time']).strftime('%H:%M')
-                else:
-                    pc_data['session'] = "-"; pc_data['start'] = "-"; pc_data['end'] = "-"
-                if pc_data['display_name']:
-                    pc_data['name_to_display'] = pc_data['display_name']
-                else:
-                    pc_data['name_to_display'] = pc_data['pc_name']
-                pc_data['version'] = "0.1221"; computers_list.append(pc_data)
+        ensure_seat_board()
+        seats_version, computers_list = seat_board.snapshot()
     except Exception as e:
         logger.error(f"Ошибка get_computers: {e}"); flash(f"Ошибка загрузки списка ПК: {e}", "error")
-    return render_template('computers.html', computers=computers_list, search_term=search_term)
+    return render_template('computers.html', computers=computers_list, search_term=search_term, seats_version=seat_board.event_id(seats_version))
 @app.route('/clients')
 @login_required
 def clients_page():
@@ -312,7 +393,7 @@ def tariffs_page():
 
     tariffs = []
     try:
-        with db_connection() as conn:
+        with db_read() as conn:
             rows = conn.execute("SELECT * FROM tariffs ORDER BY price_common").fetchall()
             tariffs = [dict(row) for row in rows]
     except Exception as e:
@@ -326,12 +407,12 @@ def tariffs_page():
 def apps_page():
     form = AppForm()
     if form.validate_on_submit(): 
-        app_name = form.name.data; app_path = form.path.data; app_type = form.type.data
+        app_name = form.name.data; app_path = form.path.data; app_type = form.type.data; app_tags = form.tags.data or None
         icon_file = form.icon.data; icon_filename = None
         if icon_file: icon_filename = save_icon(icon_file)
         try:
             with db_connection() as conn:
-                conn.execute("INSERT INTO apps (name, path, type, icon) VALUES (?, ?, ?, ?)", (app_name, app_path, app_type, icon_filename))
+                conn.execute("INSERT INTO apps (name, path, type, icon, tags) VALUES (?, ?, ?, ?, ?)", (app_name, app_path, app_type, icon_filename, app_tags))
             logger.info(f"App added: {app_name}"); flash(f'Приложение "{app_name}" успешно добавлено!', 'success')
             return redirect(url_for('apps_page')) 
         except sqlite3.IntegrityError:
@@ -363,22 +444,22 @@ def delete_app(app_name):
 @app.route('/edit/<int:app_id>', methods=['GET', 'POST'])
 @login_required
 def edit_app(app_id):
-    with db_connection() as conn:
-        app_data = conn.execute("SELECT name, path, type, icon FROM apps WHERE id = ?", (app_id,)).fetchone()
+    with db_read() as conn:
+        app_data = conn.execute("SELECT name, path, type, icon, tags FROM apps WHERE id = ?", (app_id,)).fetchone()
     if not app_data: return "App not found", 404
     form = AppForm()
     if form.validate_on_submit():
-        app_name = form.name.data; app_path = form.path.data; app_type = form.type.data
+        app_name = form.name.data; app_path = form.path.data; app_type = form.type.data; app_tags = form.tags.data or None
         icon_file = form.icon.data; icon_filename = None
         if icon_file: icon_filename = save_icon(icon_file)
         try:
             with db_connection() as conn:
-                conn.execute("UPDATE apps SET name = ?, path = ?, type = ?, icon = COALESCE(?, icon) WHERE id = ?", (app_name, app_path, app_type, icon_filename, app_id))
+                conn.execute("UPDATE apps SET name = ?, path = ?, type = ?, icon = COALESCE(?, icon), tags = ? WHERE id = ?", (app_name, app_path, app_type, icon_filename, app_tags, app_id))
             logger.info(f"App updated: {app_name}"); return redirect(url_for('apps_page')) 
         except Exception as e:
             logger.error(f"Error updating app: {e}"); form.submit.errors.append("Ошибка сервера")
     elif request.method == 'GET':
-        form.name.data = app_data['name']; form.path.data = app_data['path']; form.type.data = app_data['type']
+        form.name.data = app_data['name']; form.path.data = app_data['path']; form.type.data = app_data['type']; form.tags.data = app_data['tags']
     return render_template('edit_app.html', form=form, app_id=app_id)
 @app.route('/edit_pc/<int:pc_id>', methods=['GET', 'POST'])
 @login_required
@@ -389,12 +470,13 @@ def edit_pc(pc_id):
         else:
             try:
                 with db_connection() as conn: conn.execute("UPDATE computers SET display_name = ? WHERE id = ?", (new_name, pc_id))
+                refresh_seat_board()
                 logger.info(f"ПК с ID {pc_id} переименован в '{new_name}'"); flash(f"ПК успешно переименован в '{new_name}'", "success")
                 return redirect(url_for('computers_page'))
             except Exception as e:
                 logger.error(f"Ошибка переименования ПК: {e}"); flash(f"Ошибка сервера: {e}", "error")
     try:
-        with db_connection() as conn:
+        with db_read() as conn:
             pc_data = conn.execute("SELECT id, pc_name, display_name FROM computers WHERE id = ?", (pc_id,)).fetchone()
         if not pc_data: return "ПК не найден", 404
         return render_template('edit_pc.html', pc=pc_data)
@@ -404,8 +486,8 @@ def edit_pc(pc_id):
 @login_required
 def clear_logs():
     try:
-        with db_connection() as conn: conn.execute("DELETE FROM launch_logs")
-        logger.info("Logs cleared"); return redirect(url_for('logs_page')) 
+        with db_connection() as conn: clear_raw_logs(conn)
+        logger.info("Logs cleared (rollups kept)"); return redirect(url_for('logs_page')) 
     except Exception as e:
         logger.error(f"Error clearing logs: {e}"); return "Server error", 500
 @app.route('/web/add_balance', methods=['POST'])
@@ -415,11 +497,9 @@ def web_add_balance():
         username = request.form['username']; amount = int(request.form['amount'])
         if amount <= 0: flash('Сумма должна быть положительной', 'error'); return redirect(url_for('clients_page'))
         with db_connection() as conn:
-            result = conn.execute("SELECT balance FROM users WHERE username = ?", (username,)).fetchone()
-            if not result: flash(f'Пользователь "{username}" не найден', 'error'); return redirect(url_for('clients_page'))
-            new_balance = (result['balance'] if result['balance'] is not None else 0) + amount
-            conn.execute("UPDATE users SET balance = ? WHERE username = ?", (new_balance, username))
-            conn.execute("INSERT INTO transactions (type, username, amount) VALUES (?, ?, ?)", ('admin_topup', username, amount))
+            try: credit(conn, username, amount, 'admin_topup')
+            except UserNotFound: flash(f'Пользователь "{username}" не найден', 'error'); return redirect(url_for('clients_page'))
+            notify_user_seat(conn, username, f"Администратор пополнил ваш баланс на {amount} тг")
         logger.info(f"Админ пополнил баланс {username} на {amount} тг"); flash(f'Баланс {username} пополнен на {amount} тг', 'success')
         return redirect(url_for('clients_page'))
     except Exception as e:
@@ -431,13 +511,10 @@ def web_add_time():
         username = request.form['username']; minutes = int(request.form['minutes']); seconds_to_add = minutes * 60
         if seconds_to_add <= 0: flash('Время должно быть положительным', 'error'); return redirect(url_for('clients_page'))
         with db_connection() as conn:
-            result = conn.execute("SELECT time_left FROM users WHERE username = ?", (username,)).fetchone()
-            if not result:
+            new_time_total = extend_session(conn, username, seconds_to_add)
+            if new_time_total is None:
                 flash(f'Пользователь "{username}" не найден', 'error'); return redirect(url_for('clients_page'))
-            current_time_total = (result['time_left'] if result['time_left'] is not None else 0)
-            new_time_total = current_time_total + seconds_to_add
-            conn.execute("UPDATE users SET time_left = ? WHERE username = ?", (new_time_total, username))
-            pc = conn.execute("SELECT id FROM computers WHERE current_user = ?", (username,)).fetchone()
+            pc = notify_user_seat(conn, username, f"Администратор добавил вам {minutes} мин.")
             if pc:
                 new_session_end_time = datetime.now() + timedelta(seconds=new_time_total)
                 conn.execute(
@@ -446,6 +523,7 @@ def web_add_time():
                     (new_time_total, new_session_end_time, username)
                 )
                 logger.info(f"Также обновлена АКТИВНАЯ сессия для {username}.")
+        if pc: refresh_seat_board()
         logger.info(f"Админ добавил {minutes} минут пользователю {username}"); flash(f'{minutes} минут добавлено пользователю {username}', 'success')
         return redirect(url_for('clients_page'))
     except Exception as e:
@@ -564,77 +642,253 @@ def log_launch():
         return jsonify({"status": "success"})
     except Exception as e:
         logger.error(f"Error logging launch: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
+@app.route('/log_launch/batch', methods=['POST'])
+@csrf.exempt 
+def log_launch_batch():
+    """
+    Пачка запусков из очереди киоска: {"launches": [{computer_name, ip_address, user, app_name, timestamp}, ...]}.
+    timestamp — время запуска на киоске (UTC, "ГГГГ-ММ-ДД ЧЧ:ММ:СС"): пачка может прийти позже. Вся пачка — одна транзакция.
+    """
+    data = request.get_json(silent=True)
+    launches = data.get('launches') if isinstance(data, dict) else None
+    if not isinstance(launches, list): return jsonify({"status": "error", "message": "Missing launches list"}), 400
+    if len(launches) > MAX_LAUNCH_BATCH: return jsonify({"status": "error", "message": f"Batch too large (max {MAX_LAUNCH_BATCH})"}), 413
+    rows = []; rejected = 0
+    for launch in launches:
+        if not isinstance(launch, dict) or not launch.get('computer_name') or not launch.get('app_name'):
+            rejected += 1; continue
+        rows.append((launch['computer_name'], launch.get('ip_address') or request.remote_addr, launch.get('user'),
+                     launch['app_name'], launch_timestamp(launch.get('timestamp'))))
+    try:
+        if rows:
+            with db_connection() as conn:
+                conn.executemany("INSERT INTO launch_logs (computer_name, ip_address, user, app_name, timestamp) VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))", rows)
+        return jsonify({"status": "success", "accepted": len(rows), "rejected": rejected})
+    except Exception as e:
+        logger.error(f"Error logging launch batch: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
 @app.route('/api/apps')
 @csrf.exempt 
 def api_apps():
-    return jsonify(get_apps())
+    """
+    Каталог приложений с ETag "apps-<версия>". Без параметров — полный список (как раньше);
+    с ?since=<версия> — только изменения: {"version", "changed", "removed", "full"}.
+    Если каталог не менялся, отвечает 304 без тела.
+    """
+    since = request.args.get('since', type=int)
+    with db_read() as conn:
+        version = catalog_version(conn)
+        etag = catalog_etag(version)
+        if etag in request.if_none_match or (since is not None and since == version):
+            return Response(status=304, headers={"ETag": f'"{etag}"'})
+        if since is None:
+            response = jsonify(get_apps())
+        else:
+            response = jsonify(catalog_changes_since(conn, since))
+    response.set_etag(etag)
+    return response
 @app.route('/api/login', methods=['POST'])
 @csrf.exempt 
 def api_login():
-    data = request.get_json(); username = data.get('username'); password = data.get('password')
+    """
+    Вход клиента с киоска. Пароль проверяет ограниченный пул (utils/kiosk_auth.py), а не поток запроса;
+    при перегрузке — 503, при переборе — 429, с Retry-After (в теле — retry_after в долях секунды).
+    Ответ: {username, token, token_ttl} — дальше киоск присылает token в заголовке X-Session-Token.
+    """
+    data = request.get_json(silent=True) or {}; username = data.get('username'); password = data.get('password')
     if not username or not password: return jsonify({"status": "error", "message": "Нужен логин и пароль"}), 400
     try:
         with db_connection() as conn:
+            login_limiter.admit(conn, request.remote_addr, username)
+        with db_read() as conn:
             user = conn.execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
         if not user: return jsonify({"status": "error", "message": "Неверный логин или пароль"}), 401
-        if check_password_hash(user['password_hash'], password):
-            return jsonify({"status": "success", "username": username})
+        if password_verifier.verify(user['password_hash'], password):
+            with db_connection() as conn: login_limiter.reset(conn, username)
+            return jsonify({"status": "success", "username": username,
+                            "token": session_tokens.issue(username), "token_ttl": session_tokens.ttl})
         else:
             return jsonify({"status": "error", "message": "Неверный логин или пароль"}), 401
+    except LoginBusy as e:
+        status = 429 if isinstance(e, LoginThrottled) else 503
+        if status == 503:
+            with db_connection() as conn: login_limiter.refund(conn, request.remote_addr, username)
+        return (jsonify({"status": "error", "message": str(e), "retry_after": e.retry_after}), status,
+                {"Retry-After": str(max(1, math.ceil(e.retry_after)))})
     except Exception as e:
         logger.error(f"Ошибка логина: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
+def check_session_token(username):
+    """
+    Токен сессии клиента из заголовка X-Session-Token: (ответ-ошибка или None, продленный токен или None).
+    Без токена запрос проходит, пока [Server] RequireSessionToken выключен (старые киоски).
+    """
+    token = request.headers.get(SESSION_TOKEN_HEADER)
+    if not token:
+        if REQUIRE_SESSION_TOKEN: return (jsonify({"status": "error", "message": "Нужен вход"}), 401), None
+        return None, None
+    loaded = session_tokens.load(token)
+    if loaded is None: return (jsonify({"status": "error", "message": "Сессия истекла, войдите снова"}), 401), None
+    owner, age = loaded
+    if owner != username: return (jsonify({"status": "error", "message": "Токен выдан другому клиенту"}), 403), None
+    return None, session_tokens.renew(owner, age)
 @app.route('/api/get_user_status', methods=['GET'])
 @csrf.exempt 
 def api_get_user_status():
     username = request.args.get('username')
     if not username: return jsonify({"status": "error", "message": "Username required"}), 400
+    denied, renewed = check_session_token(username)
+    if denied: return denied
     try:
-        with db_connection() as conn:
-            result = conn.execute("SELECT balance, time_left FROM users WHERE username = ?", (username,)).fetchone()
-        if not result:
-            return jsonify({"status": "success", "username": username, "balance": 0, "time_left": 0})
-        balance = result['balance'] if result['balance'] is not None else 0
-        time_left = result['time_left'] if result['time_left'] is not None else 0
-        return jsonify({"status": "success", "username": username, "balance": balance, "time_left": time_left})
+        with db_read() as conn:
+            account = read_account(conn, username)
+        balance, time_left = account[:2] if account else (0, 0)
+        result = {"status": "success", "username": username, "balance": balance, "time_left": time_left}
+        if renewed: result["token"] = renewed
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error getting user status for {username}: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
 @app.route('/api/update_time', methods=['POST'])
 @csrf.exempt 
 def api_update_time():
+    """
+    Для старых киосков. Время клиента больше не записывается: киосок, который его
+    присылает, значит, идет сессия — сервер запускает отсчет (если он еще не идет)
+    и возвращает свой остаток.
+    """
     data = request.get_json()
     if not data: return jsonify({"status": "error", "message": "No JSON data"}), 400
     username = data.get("username"); time_left = data.get("time_left")
     if not username or not isinstance(time_left, int): return jsonify({"status": "error", "message": "Invalid input"}), 400
+    denied, renewed = check_session_token(username)
+    if denied: return denied
     try:
-        with db_connection() as conn:
-            conn.execute("UPDATE users SET time_left = ? WHERE username = ?", (time_left, username))
-        return jsonify({"status": "success", "username": username, "time_left": time_left})
+        time_left = ensure_session(username)[1]
+        result = {"status": "success", "username": username, "time_left": time_left}
+        if renewed: result["token"] = renewed
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error in api_update_time: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
 
+def ensure_session(username):
+    """(баланс, остаток) клиента, сидящего за ПК; запускает отсчет, если он еще не идет. В покое — только чтение."""
+    with db_read() as conn:
+        account = read_account(conn, username)
+    if not account: return 0, 0
+    balance, time_left, running = account
+    if not running and time_left > 0:
+        with db_connection() as conn:
+            start_session(conn, username)
+            balance, time_left, _ = read_account(conn, username)
+    return balance, time_left
+@app.route('/api/kiosk/sync', methods=['POST'])
+@csrf.exempt 
+def api_kiosk_sync():
+    """
+    Один обмен киоска с сервером вместо get_user_status + update_time + heartbeat.
+    Тело: {pc_name, status, user, time_left, event}. user — клиент, вошедший на этом ПК;
+    пока он на связи, его сессия идет на сервере (см. utils/session_ledger.py).
+    time_left киоска идет только в пульс для таблицы "Компьютеры", остаток считает сервер.
+    event = "pause" — клиент вышел (админ-выход): отсчет останавливается сразу.
+    offline = {store_id, since, seconds} — первая синхронизация после потери связи: сыгранное без
+    сервера время списывается (один раз) до того, как сессия запустится снова.
+    Ответ: {balance, time_left, catalog_version, actions} и token, если токен сессии пора продлить.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return jsonify({"status": "error", "message": "No JSON data"}), 400
+    pc_name = data.get('pc_name'); status = data.get('status'); user = data.get('user'); time_left = data.get('time_left')
+    if not pc_name or not status: return jsonify({"status": "error", "message": "Missing pc_name or status"}), 400
+    if time_left is not None and not isinstance(time_left, int): return jsonify({"status": "error", "message": "Invalid time_left"}), 400
+    balance = 0; server_time = time_left or 0; renewed = None
+    if user:
+        denied, renewed = check_session_token(user)
+        if denied: return denied
+    offline = data.get('offline')
+    try:
+        if user and isinstance(offline, dict) and offline.get('store_id'):
+            with db_connection() as conn:
+                try: apply_offline_time(conn, offline['store_id'], offline.get('since'), user, offline.get('seconds'))
+                except MutationRejected as e: logger.warning(f"Время без связи от {pc_name} не списано: {e}")
+        if user and data.get('event') == 'pause':
+            with db_connection() as conn:
+                pause_session(conn, user)
+                account = read_account(conn, user)
+            balance, server_time = account[:2] if account else (0, 0)
+            user = None; status = "Активен"
+        elif user:
+            balance, server_time = ensure_session(user)
+        heartbeat_buffer.record(pc_name, request.remote_addr, status, user, server_time)
+        with db_read() as conn:
+            version = catalog_version(conn); waiting = kiosk_actions.pending(conn, pc_name)
+        actions = []
+        if waiting:
+            with db_connection() as conn: actions = kiosk_actions.take(conn, pc_name)
+        result = {"status": "success", "balance": balance, "time_left": server_time,
+                  "catalog_version": version, "actions": actions}
+        if renewed: result["token"] = renewed
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error in api_kiosk_sync: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
+@app.route('/api/kiosk/outbox', methods=['POST'])
+@csrf.exempt 
+def api_kiosk_outbox():
+    """
+    Очередь изменений киоска, накопленная без связи (utils/kiosk_store.py): {store_id, pc_name, mutations: [{id, kind, ...}]}.
+    Изменения применяются по порядку в одной транзакции (utils/kiosk_outbox.py), повторы пачки не применяются второй раз.
+    Ответ: {applied, duplicates, rejected: [{id, message}]} — киоск убирает из очереди все присланное.
+    """
+    data = request.get_json(silent=True)
+    mutations = data.get('mutations') if isinstance(data, dict) else None
+    store_id = data.get('store_id') if isinstance(data, dict) else None; pc_name = data.get('pc_name') if isinstance(data, dict) else None
+    if not isinstance(mutations, list) or not store_id or not pc_name: return jsonify({"status": "error", "message": "Missing store_id, pc_name or mutations"}), 400
+    if len(mutations) > MAX_OUTBOX_BATCH: return jsonify({"status": "error", "message": f"Batch too large (max {MAX_OUTBOX_BATCH})"}), 413
+    try:
+        with db_connection() as conn:
+            applied, duplicates, rejected = apply_mutations(conn, store_id, pc_name, request.remote_addr, mutations, authorize_offline)
+    except MutationRejected as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in api_kiosk_outbox: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
+    if rejected: logger.warning(f"Очередь киоска {pc_name}: отклонено {len(rejected)}: {rejected[:5]}")
+    if any(m.get('kind') not in ('launch', 'app_runtime') for m in mutations if m.get('id') in applied): refresh_seat_board()
+    return jsonify({"status": "success", "applied": applied, "duplicates": duplicates, "rejected": rejected})
+
+def authorize_offline(username, token):
+    """Проверка токена, под которым киоск записал изменение без связи: токен мог истечь, пока связи не было."""
+    if not token: return "Нужен вход" if REQUIRE_SESSION_TOKEN else None
+    loaded = session_tokens.load(token, max_age=OFFLINE_TOKEN_MAX_AGE)
+    if loaded is None: return "Сессия истекла, войдите снова"
+    if loaded[0] != username: return "Токен выдан другому клиенту"
+    return None
 @app.route('/api/buy_package', methods=['POST'])
 @csrf.exempt 
 def api_buy_package():
     data = request.get_json()
     if not data: return jsonify({"status": "error", "message": "No JSON data"}), 400
     username = data.get("username"); seconds_to_add = data.get("seconds"); price = data.get("price"); package_name = data.get("package_name"); pc_name = data.get("pc_name")
+    order_id = data.get("order_id")  # номер покупки киоска: повтор после обрыва связи не списывает второй раз
     if not all([username, isinstance(seconds_to_add, int), isinstance(price, int), package_name, pc_name]):
         return jsonify({"status": "error", "message": "Invalid input (отсутствует username, seconds, price, package_name или pc_name)"}), 400
+    if order_id is not None and not is_kiosk_order(order_id): return jsonify({"status": "error", "message": "Invalid order_id"}), 400
+    denied, renewed = check_session_token(username)
+    if denied: return denied
     try:
         with db_connection() as conn:
-            result = conn.execute("SELECT balance, time_left FROM users WHERE username = ?", (username,)).fetchone()
-            if not result: return jsonify({"status": "error", "message": "User not found"}), 404
-            current_balance = result['balance'] if result['balance'] is not None else 0
-            current_time = result['time_left'] if result['time_left'] is not None else 0
-            if current_balance < price: return jsonify({"status": "error", "message": "Недостаточно средств"}), 402
-            new_balance = current_balance - price; new_time = current_time + seconds_to_add
-            conn.execute("UPDATE users SET balance = ?, time_left = ? WHERE username = ?", (new_balance, new_time, username))
-            conn.execute("INSERT INTO transactions (type, username, amount) VALUES (?, ?, ?)", ('package_purchase', username, price))
+            try: bought = buy_package(conn, username, price, seconds_to_add, order_id=order_id)
+            except UserNotFound: return jsonify({"status": "error", "message": "User not found"}), 404
+            except InsufficientFunds: return jsonify({"status": "error", "message": "Недостаточно средств"}), 402
+            if bought is None:
+                new_balance, new_time, _ = read_account(conn, username)
+                result = {"status": "success", "new_balance": new_balance, "new_time": new_time, "duplicate": True}
+                if renewed: result["token"] = renewed
+                return jsonify(result)
+            new_balance, new_time = bought
             start_time = datetime.now(); end_time = start_time + timedelta(seconds=seconds_to_add)
             cursor = conn.execute("""UPDATE computers SET status = ?, current_user = ?, time_remaining = ?, session_name = ?, session_start_time = ?, session_end_time = ?, last_heartbeat = ? WHERE pc_name = ?""", ("Используется", username, new_time, package_name, start_time, end_time, start_time, pc_name ))
             if cursor.rowcount == 0:
                 conn.execute("""INSERT INTO computers (pc_name, status, current_user, time_remaining, session_name, session_start_time, session_end_time, last_heartbeat, ip_address) VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT ip_address FROM computers WHERE pc_name = ?))""", (pc_name, "Используется", username, new_time, package_name, start_time, end_time, start_time, pc_name ))
-        return jsonify({"status": "success", "new_balance": new_balance, "new_time": new_time})
+        refresh_seat_board()
+        result = {"status": "success", "new_balance": new_balance, "new_time": new_time}
+        if renewed: result["token"] = renewed
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error in api_buy_package: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
 @app.route('/api/heartbeat', methods=['POST'])
@@ -644,20 +898,71 @@ def api_heartbeat():
     if not data: return jsonify({"status": "error", "message": "No JSON data"}), 400
     pc_name = data.get('pc_name'); status = data.get('status'); user = data.get('user'); time_left = data.get('time_left'); ip = request.remote_addr
     if not pc_name or not status: return jsonify({"status": "error", "message": "Missing pc_name or status"}), 400
-    try:
-        with db_connection() as conn:
-            cursor = conn.execute("""UPDATE computers SET ip_address = ?, status = ?, current_user = ?, last_heartbeat = ?, time_remaining = ? WHERE pc_name = ?""", (ip, status, user, datetime.now(), time_left, pc_name))
-            if cursor.rowcount == 0:
-                conn.execute("""INSERT INTO computers (pc_name, ip_address, status, current_user, last_heartbeat, time_remaining) VALUES (?, ?, ?, ?, ?, ?)""", (pc_name, ip, status, user, datetime.now(), time_left))
-        return jsonify({"status": "success"})
-    except Exception as e:
-        logger.error(f"Ошибка Heartbeat: {e}"); return jsonify({"status": "error", "message": str(e)}), 500
+    heartbeat_buffer.record(pc_name, ip, status, user, time_left)
+    return jsonify({"status": "success"})
+@app.route('/api/heartbeat/batch', methods=['POST'])
+@csrf.exempt 
+def api_heartbeat_batch():
+    """Пачка heartbeat'ов от ретранслятора: {"heartbeats": [{pc_name, status, user, time_left, ip_address}, ...]}"""
+    data = request.get_json()
+    beats = data.get('heartbeats') if isinstance(data, dict) else None
+    if not isinstance(beats, list): return jsonify({"status": "error", "message": "Missing heartbeats list"}), 400
+    if len(beats) > MAX_HEARTBEAT_BATCH: return jsonify({"status": "error", "message": f"Batch too large (max {MAX_HEARTBEAT_BATCH})"}), 413
+    accepted = 0; rejected = 0
+    for beat in beats:
+        if not isinstance(beat, dict) or not beat.get('pc_name') or not beat.get('status'):
+            rejected += 1; continue
+        heartbeat_buffer.record(beat['pc_name'], beat.get('ip_address') or request.remote_addr, beat['status'], beat.get('user'), beat.get('time_left'))
+        accepted += 1
+    return jsonify({"status": "success", "accepted": accepted, "rejected": rejected})
+@app.route('/api/get_computers_status')
+@login_required
+def api_get_computers_status():
+    """Снимок зала для computers.js (запасной путь без SSE). Поддерживает ETag/If-None-Match."""
+    ensure_seat_board()
+    version, computers = seat_board.snapshot()
+    etag = f"seats-{seat_board.event_id(version)}"
+    if etag in request.if_none_match:
+        return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "no-cache"})
+    response = jsonify({"version": seat_board.event_id(version), "computers": computers})
+    response.set_etag(etag); response.headers["Cache-Control"] = "no-cache"
+    return response
+@app.route('/api/computers/stream')
+@login_required
+def api_computers_stream():
+    """
+    SSE-поток изменений зала. Событие "seats": {"version", "changed", "removed"} — только
+    изменившиеся ПК; "snapshot": {"version", "computers"} — если клиент отстал больше, чем хранит журнал.
+    Версия передается как id события ("<boot>-<версия>", см. SeatBoard.event_id), поэтому при переподключении
+    браузер сам шлет Last-Event-ID; id после перезапуска сервера или от другого воркера дает полный снимок.
+    """
+    ensure_seat_board()
+    since = seat_board.parse_event_id(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    def sse(event, version, payload):
+        payload["version"] = seat_board.event_id(version)
+        return f"event: {event}\nid: {seat_board.event_id(version)}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    def stream():
+        version = since
+        if version is None or seat_board.changes_since(version) is None:
+            version, computers = seat_board.snapshot()
+            yield sse("snapshot", version, {"version": version, "computers": computers})
+        while True:
+            delta = seat_board.wait_for_changes(version, timeout=SEAT_STREAM_KEEPALIVE)
+            if delta is None:
+                version, computers = seat_board.snapshot()
+                yield sse("snapshot", version, {"version": version, "computers": computers}); continue
+            new_version, changed, removed = delta
+            if new_version == version:
+                yield ": keepalive\n\n"; continue
+            version = new_version
+            yield sse("seats", version, {"version": version, "changed": changed, "removed": removed})
+    return Response(stream(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 @app.route('/api/app_details/<int:app_id>')
 @login_required 
 def api_app_details(app_id):
     try:
-        with db_connection() as conn:
-            app_data = conn.execute("SELECT name, path, type, icon FROM apps WHERE id = ?", (app_id,)).fetchone()
+        with db_read() as conn:
+            app_data = conn.execute("SELECT name, path, type, icon, tags FROM apps WHERE id = ?", (app_id,)).fetchone()
         if not app_data: return jsonify({"status": "error", "message": "App not found"}), 404
         return jsonify({"status": "success", "data": dict(app_data)})
     except Exception as e:
@@ -668,7 +973,7 @@ def api_app_details(app_id):
 def api_tariff_details(tariff_id):
     """ (НОВЫЙ API) Отдает детали тарифа в формате JSON """
     try:
-        with db_connection() as conn:
+        with db_read() as conn:
             tariff_data = conn.execute(
                 "SELECT * FROM tariffs WHERE id = ?", (tariff_id,)
             ).fetchone()
@@ -692,11 +997,8 @@ def add_time():
     if not username or not isinstance(seconds, int) or seconds < 0: return jsonify({"success": False, "error": "Invalid input"}), 400
     try:
         with db_connection() as conn:
-            result = conn.execute("SELECT time_left FROM users WHERE username = ?", (username,)).fetchone()
-            current_time = result['time_left'] if result and result['time_left'] is not None else 0
-            new_time = current_time + seconds
-            conn.execute("UPDATE users SET time_left = ? WHERE username = ?", (new_time, username))
-        return jsonify({"success": True, "new_time": new_time})
+            new_time = extend_session(conn, username, seconds)
+        return jsonify({"success": True, "new_time": new_time if new_time is not None else seconds})
     except Exception as e:
         logger.error(f"Error in add_time: {e}"); return jsonify({"success": False, "error": str(e)}), 500
 
@@ -711,7 +1013,7 @@ def create_payment():
     try:
         kaspi_public_key = get_kaspi_public_key()
         kaspi_private_key = get_kaspi_private_key()
-        order_id = f"lovhub_{username}_{int(time.time())}"
+        order_id = f"lovhub_{username}_{int(time.time())}_{secrets.token_hex(3)}"
         payload = {
             "orderId": order_id, "amount": float(amount), 
             "description": f"Пополнение баланса для {username}",
@@ -727,21 +1029,35 @@ def create_payment():
             KASPI_SIGNATURE_HEADER: signature
         }
         logger.info(f"Отправка запроса в Kaspi для {username} на {amount} тг...")
-        response = requests.post(KASPI_API_URL, data=payload_string, headers=headers, timeout=10)
-        response.raise_for_status() 
-        response_data = response.json()
-        payment_url_from_gateway = response_data.get('paymentUrl') 
-        if not payment_url_from_gateway:
-            logger.error(f"Kaspi не вернул paymentUrl: {response_data}")
-            return jsonify({"status": "error", "message": "Payment gateway error"}), 500
-        return jsonify({"status": "success", "payment_url": payment_url_from_gateway})
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error creating payment (Kaspi API): {e}")
-        return jsonify({"status": "error", "message": f"Ошибка связи с Kaspi: {e}"}), 500
+        # Запрос к Kaspi идет в пуле payment_gateway: поток Flask ждет ссылку недолго, дальше киоск опрашивает статус
+        invoice = payment_gateway.submit(order_id, payload_string, headers)
+        if not invoice.queued: invoice.wait(PAYMENT_INLINE_WAIT)
+        return invoice_response(invoice)
+    except GatewayUnavailable as e:
+        logger.warning(f"Error creating payment (Kaspi API): {e}")
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         logger.error(f"Error creating payment (Internal): {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/payment_status', methods=['GET'])
+@csrf.exempt 
+def payment_status():
+    order_id = request.args.get('order_id', '')
+    invoice = payment_gateway.get(order_id)
+    if invoice is None:
+        # Счет мог создать другой процесс сервера
+        with db_read() as conn: invoice = load_invoice(conn, order_id)
+    if invoice is None: return jsonify({"status": "error", "message": "Unknown order"}), 404
+    return invoice_response(invoice)
+
+def invoice_response(invoice):
+    if invoice.status == "ready":
+        return jsonify({"status": "success", "order_id": invoice.order_id, "payment_url": invoice.payment_url})
+    if invoice.status == "failed":
+        return jsonify({"status": "error", "order_id": invoice.order_id, "message": f"Ошибка связи с Kaspi: {invoice.error}"}), 502
+    return jsonify({"status": "pending", "order_id": invoice.order_id}), 202
+
 @app.route('/api/payment_webhook', methods=['POST'])
 @csrf.exempt 
 def payment_webhook():
@@ -772,14 +1088,19 @@ def payment_webhook():
         if payment_status != 'PAID': 
             logger.warning(f"Вебхук: Статус платежа не 'PAID' ({payment_status})")
             return jsonify({"status": "success", "message": "Status not paid"})
-        with db_connection() as conn:
-            result = conn.execute("SELECT balance FROM users WHERE username = ?", (username,)).fetchone()
-            if not result:
-                logger.warning(f"Вебхук: Пользователь {username} не найден!")
-                return jsonify({"status": "error", "message": "User not found"}), 404
-            new_balance = (result['balance'] if result['balance'] is not None else 0) + int(amount)
-            conn.execute("UPDATE users SET balance = ? WHERE username = ?", (new_balance, username))
-            conn.execute("INSERT INTO transactions (type, username, amount, order_id) VALUES (?, ?, ?, ?)", ('kaspi_topup', username, int(amount), order_id))
+        # Платежная система повторяет вебхук, пока не получит 200: повтор — успех без зачисления
+        if processed_orders.seen(order_id):
+            return jsonify({"status": "success", "message": "Already processed"})
+        try:
+            with db_connection() as conn:
+                new_balance = credit_order(conn, username, int(amount), order_id)
+        except UserNotFound:
+            logger.warning(f"Вебхук: Пользователь {username} не найден!")
+            return jsonify({"status": "error", "message": "User not found"}), 404
+        processed_orders.add(order_id)
+        if new_balance is None:
+            logger.info(f"Вебхук: Заказ {order_id} уже зачислен, повтор пропущен")
+            return jsonify({"status": "success", "message": "Already processed"})
         logger.info(f"Вебхук: Баланс {username} пополнен на {amount} (Заказ: {order_id})")
         return jsonify({"status": "success"}) 
     except Exception as e:
@@ -800,18 +1121,37 @@ def fake_payment_page():
         webhook_url=webhook_url
     )
 
+@app.route('/api/admin/db_stats')
+@basic_auth.required 
+def api_db_stats():
+    """Конкуренция за запись в базу в этом процессе (см. ConnectionPool.stats); ?reset=1 — обнулить счетчики"""
+    return jsonify({"pid": os.getpid(), "db": db_pool.stats(reset=request.args.get('reset') == '1')})
+
+@app.route('/api/admin/launch_stats')
+@basic_auth.required 
+def api_launch_stats():
+    """Запуски по приложениям и ПК и время в приложениях за последние ?days= дней (по умолчанию 30) из дневных сводок"""
+    days = request.args.get('days', 30, type=int)
+    if not days or days < 1: return jsonify({"status": "error", "message": "Invalid days"}), 400
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    with db_read() as conn:
+        apps, computers = launch_summary(conn, since); playtime = playtime_summary(conn, since)
+    by_count = lambda counts: [{"name": name, "launches": n} for name, n in sorted(counts.items(), key=lambda item: -item[1])]
+    by_time = [{"name": name, "seconds": seconds, "runs": runs} for name, (seconds, runs) in sorted(playtime.items(), key=lambda item: -item[1][0])]
+    return jsonify({"since": since, "apps": by_count(apps), "computers": by_count(computers), "playtime": by_time})
+
 @app.route('/api/add_app', methods=['POST'])
 @basic_auth.required 
 @csrf.exempt 
 def api_add_app():
     data = request.get_json()
     if not data: return jsonify({"status": "error", "message": "No JSON data"}), 400
-    app_name = data.get('name'); app_path = data.get('path'); app_type = data.get('type'); icon_filename = data.get('icon') 
-    if not validate_app_data(app_name, app_path, app_type):
+    app_name = data.get('name'); app_path = data.get('path'); app_type = data.get('type'); icon_filename = data.get('icon'); app_tags = data.get('tags')
+    if not validate_app_data(app_name, app_path, app_type) or (app_tags is not None and (not isinstance(app_tags, str) or len(app_tags) > 300)):
          return jsonify({"status": "error", "message": "Invalid app data"}), 400
     try:
         with db_connection() as conn:
-            conn.execute("INSERT INTO apps (name, path, type, icon) VALUES (?, ?, ?, ?)", (app_name, app_path, app_type, icon_filename))
+            conn.execute("INSERT INTO apps (name, path, type, icon, tags) VALUES (?, ?, ?, ?, ?)", (app_name, app_path, app_type, icon_filename, app_tags or None))
         logger.info(f"App added via API: {app_name}")
         return jsonify({"status": "success", "name": app_name})
     except sqlite3.IntegrityError:
@@ -836,6 +1176,39 @@ def api_delete_app():
 # --- КОНЕЦ API ---
 
 
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Пересчитывает счетчики дашборда по всей истории: flask --app server rebuild-stats"""
+    with db_connection() as conn:
+        rebuild_stats(conn)
+    print("Счетчики дашборда пересчитаны.")
+
+@app.cli.command('rotate-logs')
+def rotate_logs_command():
+    """Переносит прошлые месяцы журнала запусков в архив и применяет срок хранения: flask --app server rotate-logs"""
+    moved, dropped = maintain_launch_logs()
+    print(f"Перенесено в архив: {moved}, удалено архивов: {len(dropped)}")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Проверяет EXPLAIN QUERY PLAN горячих запросов: flask --app server check-query-plans"""
+    with db_read() as conn:
+        problems = check_query_plans(conn)
+    for problem in problems:
+        print(f"ПОЛНЫЙ ПРОХОД: {problem}")
+    if problems:
+        sys.exit(1)
+    print("Все горячие запросы используют индексы.")
+
+@app.cli.command('backup-db')
+@click.argument('backup_path')
+def backup_db_command(backup_path):
+    """Согласованная резервная копия базы (с учетом WAL): flask --app server backup-db <файл>"""
+    with db_read() as conn:
+        backup_database(conn, backup_path)
+    print(f"Резервная копия сохранена: {backup_path}")
+
+
 @app.errorhandler(404)
 def not_found(error):
     return "Page not found", 404
@@ -846,12 +1219,13 @@ def internal_error(error):
     return "Internal server error", 500
 
 
-if __name__ == '__main__':
+def run_dev_server(host='0.0.0.0', port=5000, cert_files=('cert.pem', 'key.pem')):
+    """Встроенный сервер Flask (один процесс, TLS на Python). Для работы клуба — serve.py."""
     print("Запуск сервера в режиме HTTPS (с принудительным TLS)...")
     
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     try:
-        context.load_cert_chain('cert.pem', 'key.pem')
+        context.load_cert_chain(*cert_files)
     except FileNotFoundError:
         print("\n!!! ОШИБКА: Файлы 'cert.pem' или 'key.pem' не найдены!")
         input("Нажмите Enter для выхода...")
@@ -862,8 +1236,12 @@ if __name__ == '__main__':
         sys.exit(1)
 
     app.run(
-        host='0.0.0.0', 
-        port=5000, 
+        host=host, 
+        port=port, 
         debug=False, 
         ssl_context=context 
-    )
\ No newline at end of file
+    )
+
+
+if __name__ == '__main__':
+    run_dev_server()
\ No newline at end of file
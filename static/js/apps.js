@@ -31,6 +31,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     const editNameField = document.getElementById('edit_name');
     const editPathField = document.getElementById('edit_path');
+    const editTagsField = document.getElementById('edit_tags');
     const editTypeHiddenField = document.getElementById('edit_type_hidden'); 
     const editIconFileInput = document.getElementById('edit_icon_file_input');
     const editImageUploadArea = document.getElementById('edit-image-upload-area');
@@ -57,6 +58,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     if (result.status === 'success') {
                         editNameField.value = result.data.name;
                         editPathField.value = result.data.path;
+                        editTagsField.value = result.data.tags || '';
                         editTypeHiddenField.value = result.data.type; 
 
                         if (result.data.icon) {
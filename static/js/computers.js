@@ -1,71 +1,114 @@
-
-
 document.addEventListener('DOMContentLoaded', function() {
-    
-    //--- Устанавливаем интервал опроса: 5000 мс ---
+
+    //--- Основной путь: SSE-поток /api/computers/stream (только изменившиеся ПК) ---
+    //--- Запасной: опрос снимка /api/get_computers_status с ETag раз в 5000 мс ---
     const REFRESH_INTERVAL = 5000;
 
+    const tableBody = document.getElementById('computers-table-body');
+    if (!tableBody) return;
+
+    let version = tableBody.dataset.version || '';  // id события сервера: "<boot>-<версия>"
+    let etag = null;
+    let pollTimer = null;
+
+    function startStream() {
+        if (!window.EventSource) { startPolling(); return; }
+
+        const source = new EventSource(`/api/computers/stream?since=${encodeURIComponent(version)}`);
+
+        source.addEventListener('seats', event => {
+            const data = JSON.parse(event.data);
+            data.changed.forEach(updateRow);
+            data.removed.forEach(hideRow);
+            version = data.version;
+        });
+
+        source.addEventListener('snapshot', event => {
+            const data = JSON.parse(event.data);
+            updateTable(data.computers);
+            version = data.version;
+        });
+
+        source.onerror = () => {
+            // Браузер сам переподключается; если поток закрыт совсем — переходим на опрос
+            if (source.readyState === EventSource.CLOSED) startPolling();
+        };
+    }
+
+    function startPolling() {
+        if (pollTimer) return;
+        fetchComputerStatus();
+        pollTimer = setInterval(fetchComputerStatus, REFRESH_INTERVAL);
+    }
+
     async function fetchComputerStatus() {
         try {
-            const response = await fetch('/api/get_computers_status');
+            const headers = etag ? { 'If-None-Match': etag } : {};
+            const response = await fetch('/api/get_computers_status', { headers: headers, cache: 'no-store' });
+            if (response.status === 304) return;
             if (!response.ok) {
                 console.error("Ошибка сети при запросе статуса ПК");
                 return;
             }
-            
+
+            etag = response.headers.get('ETag');
             const data = await response.json();
-            
+
             if (data && data.computers) {
                 updateTable(data.computers);
+                version = data.version;
             }
-            
+
         } catch (error) {
             console.error("Ошибка при обновлении статусов ПК:", error);
         }
     }
 
     function updateTable(computers) {
-        const tableBody = document.getElementById('computers-table-body');
-        if (!tableBody) return;
-
         let seenIds = new Set();
 
         computers.forEach(pc => {
             seenIds.add(pc.id.toString());
-            
-            let row = document.getElementById(`row-${pc.id}`);
-
-            if (!row) {
-                row = createNewRow(pc);
-                tableBody.appendChild(row);
-            }
-
- 
-            updateCell(`name-${pc.id}`, pc.name_to_display);
-            updateCell(`client-${pc.id}`, pc.client);
-            updateCell(`session-${pc.id}`, pc.session);
-            updateCell(`start-${pc.id}`, pc.start);
-            updateCell(`end-${pc.id}`, pc.end);
-            updateCell(`remaining-${pc.id}`, pc.remaining);
-            updateCell(`version-${pc.id}`, pc.version);
-
-
-            const statusCell = document.getElementById(`status-${pc.id}`);
-            if (statusCell) {
-                statusCell.textContent = pc.status;
-                statusCell.className = pc.status_class; 
-            }
+            updateRow(pc);
         });
 
-
         tableBody.querySelectorAll('tr').forEach(row => {
             const rowId = row.id.split('-')[1];
             if (!seenIds.has(rowId)) {
-                row.style.display = 'none'; 
+                row.style.display = 'none';
             }
         });
     }
 
+    function updateRow(pc) {
+        let row = document.getElementById(`row-${pc.id}`);
+
+        if (!row) {
+            row = createNewRow(pc);
+            tableBody.appendChild(row);
+        }
+        row.style.display = '';
+
+        updateCell(`name-${pc.id}`, pc.name_to_display);
+        updateCell(`client-${pc.id}`, pc.client);
+        updateCell(`session-${pc.id}`, pc.session);
+        updateCell(`start-${pc.id}`, pc.start);
+        updateCell(`end-${pc.id}`, pc.end);
+        updateCell(`remaining-${pc.id}`, pc.remaining);
+        updateCell(`version-${pc.id}`, pc.version);
+
+        const statusCell = document.getElementById(`status-${pc.id}`);
+        if (statusCell) {
+            statusCell.textContent = pc.status;
+            statusCell.className = pc.status_class;
+        }
+    }
+
+    function hideRow(pcId) {
+        const row = document.getElementById(`row-${pcId}`);
+        if (row) row.style.display = 'none';
+    }
+
     function updateCell(elementId, newText) {
         const cell = document.getElementById(elementId);
         if (cell && cell.textContent !== newText) {
@@ -77,19 +120,19 @@ document.addEventListener('DOMContentLoaded', function() {
     function createNewRow(pc) {
         const row = document.createElement('tr');
         row.id = `row-${pc.id}`;
-        
+
         row.innerHTML = `
-            <td id="name-${pc.id}">${pc.name_to_display}</td>
-            <td id="status-${pc.id}" class="${pc.status_class}">${pc.status}</td>
-            <td id="client-${pc.id}">${pc.client}</td>
-            <td id="session-${pc.id}">${pc.session}</td>
-            <td id="start-${pc.id}">${pc.start}</td>
-            <td id="end-${pc.id}">${pc.end}</td>
-            <td id="remaining-${pc.id}">${pc.remaining}</td>
-            <td id="version-${pc.id}">${pc.version}</td>
+            <td id="name-${pc.id}"></td>
+            <td id="status-${pc.id}"></td>
+            <td id="client-${pc.id}"></td>
+            <td id="session-${pc.id}"></td>
+            <td id="start-${pc.id}"></td>
+            <td id="end-${pc.id}"></td>
+            <td id="remaining-${pc.id}"></td>
+            <td id="version-${pc.id}"></td>
             <td>
-                <a href="/edit_pc/${pc.id}" 
-                   class="add-pc-btn" 
+                <a href="/edit_pc/${pc.id}"
+                   class="add-pc-btn"
                    style="padding: 4px 10px; font-size: 12px; text-decoration: none; background: #606060;">
                     Переименовать
                 </a>
@@ -99,9 +142,6 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
 
-    fetchComputerStatus();
-    
-
-    setInterval(fetchComputerStatus, REFRESH_INTERVAL);
+    startStream();
 
-});
\ No newline at end of file
+});
@@ -0,0 +1,141 @@
+"""
+Общий HTTP-клиент киоска.
+
+Все запросы к серверу клуба идут через одну requests.Session: соединения
+keep-alive живут в пуле urllib3, поэтому TCP- и TLS-рукопожатие делается один
+раз на соединение, а не на каждый пульс или синхронизацию. Если сервер все же
+закрывает соединение после ответа (встроенный сервер Flask делает так всегда),
+новое соединение возобновляет прошлую TLS-сессию вместо полного рукопожатия.
+Адрес сервера берется из config.ini ([Client] -> ServerUrl), таймауты — свои
+у каждого эндпоинта: (подключение, чтение) в секундах.
+
+Пул соединений urllib3 потокобезопасен, cookies сервер киоскам не выдает,
+поэтому одна сессия делится между всеми фоновыми потоками.
+
+После входа сервер выдает токен сессии клиента: он хранится в локальном
+хранилище киоска (utils/kiosk_store.py — окно входа и главное окно разные
+процессы) и уходит с каждым запросом в заголовке X-Session-Token.
+"""
+import sqlite3
+import ssl
+import threading
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from utils.config_loader import get_server_url
+from utils.kiosk_store import get_store
+
+# Сервер работает с самоподписанным сертификатом (cert.pem)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+DEFAULT_TIMEOUT = (3, 5)
+TIMEOUTS = {
+    "/api/kiosk/sync": (2, 4),
+    "/api/heartbeat": (2, 3),
+    "/api/get_user_status": (3, 5),
+    "/api/update_time": (3, 5),
+    "/api/apps": (3, 10),
+    "/api/buy_package": (3, 15),
+    "/api/create_payment": (3, 5),
+    "/api/payment_status": (2, 3),
+    "/api/add_app": (3, 10),
+    "/api/delete_app": (3, 5),
+    "/api/login": (3, 15),  # в час открытия вход может постоять в очереди проверки паролей
+    "/log_launch": (2, 3),
+    "/log_launch/batch": (2, 5),
+    "/api/kiosk/outbox": (2, 10),
+}
+POOL_SIZE = 4  # больше одновременных запросов у киоска не бывает
+SESSION_TOKEN_HEADER = "X-Session-Token"
+
+
+
+class _ResumingSocket(ssl.SSLSocket):
+    def close(self):
+        # Билет сессии TLS 1.3 приходит после рукопожатия, поэтому сохраняется при закрытии
+        if self._sslobj is not None and self.session is not None:
+            self.context.last_session = self.session
+        super().close()
+
+
+class _ResumingContext(ssl.SSLContext):
+    """SSL-контекст, который предлагает серверу последнюю TLS-сессию (у киоска сервер один)."""
+    sslsocket_class = _ResumingSocket
+    last_session = None
+
+    def wrap_socket(self, *args, **kwargs):
+        if self.last_session is not None:
+            kwargs.setdefault("session", self.last_session)
+        return super().wrap_socket(*args, **kwargs)
+
+
+class _ResumingAdapter(HTTPAdapter):
+    def __init__(self, ssl_context, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+
+
+_session = None
+_base_url = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session, _base_url
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            context = _ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            session.mount("https://", _ResumingAdapter(context, pool_connections=1, pool_maxsize=POOL_SIZE))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+            # config.ini читается один раз, а не на каждый запрос
+            _base_url = get_server_url()
+            token = get_store().get("session_token")
+            if token:
+                session.headers[SESSION_TOKEN_HEADER] = token
+            _session = session
+        return _session
+
+
+def set_session_token(token):
+    """Запоминает токен сессии клиента (выдает /api/login, продлевает /api/kiosk/sync); None — забыть."""
+    session = get_session()
+    try:
+        if token:
+            get_store().set("session_token", token)
+        else:
+            get_store().delete("session_token")
+    except sqlite3.Error as e:
+        print(f"Не удалось сохранить токен сессии: {e}")
+    if token:
+        session.headers[SESSION_TOKEN_HEADER] = token
+    else:
+        session.headers.pop(SESSION_TOKEN_HEADER, None)
+
+
+def api_url(endpoint):
+    get_session()
+    return f"{_base_url}{endpoint}"
+
+
+def _defaults(endpoint, kwargs):
+    kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+    # verify передается в каждый запрос: Session.verify перекрывается переменной REQUESTS_CA_BUNDLE
+    kwargs.setdefault("verify", False)
+    return kwargs
+
+
+def api_get(endpoint, **kwargs):
+    _defaults(endpoint, kwargs)
+    return get_session().get(api_url(endpoint), **kwargs)
+
+
+def api_post(endpoint, **kwargs):
+    _defaults(endpoint, kwargs)
+    return get_session().post(api_url(endpoint), **kwargs)
@@ -0,0 +1,59 @@
+"""
+Версия каталога приложений для киосков.
+
+Каждое изменение таблицы apps (добавление, правка, удаление) триггером
+записывается в app_changes с новым номером версии: одна строка на приложение,
+удаленные остаются "надгробиями" (deleted = 1). Версия каталога — максимальный
+номер в app_changes, поэтому /api/apps может ответить 304 или отдать только
+приложения, изменившиеся после версии клиента.
+"""
+
+CATALOG_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS app_changes (app_id INTEGER PRIMARY KEY, version INTEGER NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS idx_app_changes_version ON app_changes (version)",
+    # Приложения, существовавшие до миграции, считаются версией 1
+    "INSERT OR IGNORE INTO app_changes (app_id, version, deleted) SELECT id, 1, 0 FROM apps",
+    """CREATE TRIGGER IF NOT EXISTS trg_catalog_apps_ins AFTER INSERT ON apps BEGIN
+           INSERT INTO app_changes (app_id, version, deleted)
+               VALUES (NEW.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM app_changes), 0)
+               ON CONFLICT(app_id) DO UPDATE SET version = excluded.version, deleted = 0;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_catalog_apps_upd AFTER UPDATE ON apps BEGIN
+           INSERT INTO app_changes (app_id, version, deleted)
+               VALUES (NEW.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM app_changes), 0)
+               ON CONFLICT(app_id) DO UPDATE SET version = excluded.version, deleted = 0;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_catalog_apps_del AFTER DELETE ON apps BEGIN
+           INSERT INTO app_changes (app_id, version, deleted)
+               VALUES (OLD.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM app_changes), 1)
+               ON CONFLICT(app_id) DO UPDATE SET version = excluded.version, deleted = 1;
+       END""",
+]
+
+
+def catalog_version(conn):
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM app_changes").fetchone()[0]
+
+
+def catalog_etag(version):
+    return f"apps-{version}"
+
+
+def catalog_changes_since(conn, since):
+    """
+    Изменения каталога после версии `since`: словарь
+    {"version", "changed": [приложения], "removed": [id], "full": bool}.
+    Если клиент "из будущего" (база восстановлена из копии), отдается весь
+    каталог с full = True — клиент должен заменить свой список целиком.
+    """
+    version = catalog_version(conn)
+    full = since > version
+    if full:
+        since = 0
+    changed = [dict(row) for row in conn.execute(
+        """SELECT a.id, a.name, a.path, a.type, a.icon, a.tags FROM app_changes c JOIN apps a ON a.id = c.app_id
+           WHERE c.version > ? AND c.deleted = 0""", (since,))]
+    removed = [] if full else [row[0] for row in conn.execute(
+        "SELECT app_id FROM app_changes WHERE version > ? AND deleted = 1", (since,))]
+    changed.sort(key=lambda app: app["id"]); removed.sort()
+    return {"version": version, "changed": changed, "removed": removed, "full": full}
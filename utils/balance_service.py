@@ -0,0 +1,134 @@
+"""
+Операции с балансом клиента.
+
+Каждая операция — одно условное UPDATE ... RETURNING: проверка ("хватает ли
+денег") и изменение выполняются одной командой SQLite, поэтому параллельные
+покупки и пополнения — в том числе из разных процессов сервера — не теряют
+обновлений, а покупке не нужен отдельный SELECT. Запись в transactions идет
+в той же короткой транзакции соединения-писателя. Нужен SQLite 3.35+ (RETURNING).
+
+Оплата заказа идемпотентна: transactions.order_id уникален, и зачисление
+начинается со вставки строки заказа (INSERT ... ON CONFLICT DO NOTHING) — повтор
+вебхука не вставляет ничего и не трогает баланс. RecentOrders отвечает на
+повторы платежной системы из памяти, не обращаясь к базе. Номера покупок
+киосков и заказов Kaspi лежат в одном столбце, поэтому номер от киоска
+принимается только с префиксом KIOSK_ORDER_PREFIX (is_kiosk_order): иначе
+покупка с номером чужого заказа Kaspi заняла бы его и вебхук не зачислил бы оплату.
+"""
+import threading
+from collections import OrderedDict
+
+from utils.session_ledger import now_ts, remaining
+
+ORDER_SCHEMA = [
+    # Повторы вебхуков до этой миграции могли записать один заказ несколько раз:
+    # первая запись остается ключом заказа, у повторов order_id помечается, история не удаляется
+    """UPDATE transactions SET order_id = order_id || ':dup' || id
+       WHERE order_id IS NOT NULL
+         AND id NOT IN (SELECT MIN(id) FROM transactions WHERE order_id IS NOT NULL GROUP BY order_id)""",
+    # NULL в уникальном индексе SQLite не конфликтуют: покупки и пополнения админом без order_id не мешают
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_order_id ON transactions (order_id)",
+]
+
+
+KIOSK_ORDER_PREFIX = "kiosk_"   # номера заказов Kaspi начинаются с "lovhub_"
+MAX_ORDER_ID_LENGTH = 128
+
+
+def is_kiosk_order(order_id):
+    """Номер покупки, который может прислать киоск: строка с префиксом KIOSK_ORDER_PREFIX."""
+    return isinstance(order_id, str) and order_id.startswith(KIOSK_ORDER_PREFIX) and len(order_id) <= MAX_ORDER_ID_LENGTH
+
+
+class BalanceError(Exception):
+    pass
+
+
+class UserNotFound(BalanceError):
+    pass
+
+
+class InsufficientFunds(BalanceError):
+    pass
+
+
+class RecentOrders:
+    """Потокобезопасный LRU недавно зачисленных заказов (только ускорение — гарантию дает индекс)."""
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._orders = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def seen(self, order_id):
+        with self._lock:
+            if order_id not in self._orders:
+                return False
+            self._orders.move_to_end(order_id)
+            self.hits += 1
+            return True
+
+    def add(self, order_id):
+        with self._lock:
+            self._orders[order_id] = True
+            self._orders.move_to_end(order_id)
+            while len(self._orders) > self.maxsize:
+                self._orders.popitem(last=False)
+
+
+def credit(conn, username, amount, tx_type, order_id=None):
+    """Пополняет баланс и пишет транзакцию. Возвращает новый баланс."""
+    row = conn.execute(
+        "UPDATE users SET balance = COALESCE(balance, 0) + ? WHERE username = ? RETURNING balance",
+        (amount, username)).fetchone()
+    if row is None:
+        raise UserNotFound(username)
+    conn.execute("INSERT INTO transactions (type, username, amount, order_id) VALUES (?, ?, ?, ?)",
+                 (tx_type, username, amount, order_id))
+    return row['balance']
+
+
+def credit_order(conn, username, amount, order_id, tx_type='kaspi_topup'):
+    """
+    Зачисляет оплату заказа ровно один раз. Возвращает новый баланс или None,
+    если заказ уже был зачислен раньше.
+    """
+    inserted = conn.execute(
+        """INSERT INTO transactions (type, username, amount, order_id)
+           SELECT ?, username, ?, ? FROM users WHERE username = ?
+           ON CONFLICT DO NOTHING RETURNING id""", (tx_type, amount, order_id, username)).fetchone()
+    if inserted is None:
+        if conn.execute("SELECT 1 FROM transactions WHERE order_id = ?", (order_id,)).fetchone():
+            return None
+        raise UserNotFound(username)
+    # Строка заказа уже держит блокировку записи: баланс меняется в той же транзакции
+    return conn.execute("UPDATE users SET balance = COALESCE(balance, 0) + ? WHERE username = ? RETURNING balance",
+                        (amount, username)).fetchone()['balance']
+
+
+def buy_package(conn, username, price, seconds, now=None, order_id=None):
+    """
+    Списывает цену пакета и добавляет время одной командой; сессия сразу идет
+    (пакет покупают, сидя за ПК). Возвращает (новый баланс, остаток времени).
+    С order_id покупка идемпотентна (киоск повторяет ее после обрыва связи):
+    повтор уже проведенного заказа возвращает None и ничего не списывает.
+    """
+    now = now or now_ts()
+    if order_id and conn.execute("SELECT 1 FROM transactions WHERE order_id = ?", (order_id,)).fetchone():
+        return None
+    row = conn.execute(
+        """UPDATE users SET balance = COALESCE(balance, 0) - :price,
+                            time_left = COALESCE(time_left, 0) + :seconds,
+                            session_started_at = COALESCE(session_started_at, :now),
+                            session_deadline = COALESCE(session_deadline, :now + COALESCE(time_left, 0)) + :seconds
+           WHERE username = :username AND COALESCE(balance, 0) >= :price
+           RETURNING balance, time_left, session_deadline""",
+        {"price": price, "seconds": seconds, "now": now, "username": username}).fetchone()
+    if row is None:
+        # Сюда попадаем только при отказе, поэтому лишний SELECT не стоит ничего успешным покупкам
+        if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is None:
+            raise UserNotFound(username)
+        raise InsufficientFunds(username)
+    conn.execute("INSERT INTO transactions (type, username, amount, order_id) VALUES (?, ?, ?, ?)",
+                 ('package_purchase', username, price, order_id))
+    return row['balance'], remaining(row, now)
@@ -84,4 +84,70 @@ def get_kaspi_private_key():
     try:
         return load_config()['Kaspi']['PrivateKey']
     except Exception:
-        raise KeyError("В config.ini не найден [Kaspi] -> PrivateKey")
\ No newline at end of file
+        raise KeyError("В config.ini не найден [Kaspi] -> PrivateKey")
+
+def get_heartbeat_flush_interval():
+    """Как часто (сек) сервер сбрасывает буфер heartbeat в БД"""
+    return load_config().getfloat('Server', 'HeartbeatFlushInterval', fallback=5.0)
+
+def get_db_reader_count():
+    """Сколько соединений-читателей держит пул SQLite на сервере"""
+    return load_config().getint('Server', 'DbReaders', fallback=4)
+
+def get_db_synchronous():
+    """Режим PRAGMA synchronous для базы сервера (в WAL безопасно NORMAL)"""
+    return load_config().get('Server', 'DbSynchronous', fallback='NORMAL').upper()
+
+def get_server_url():
+    """Адрес сервера клуба для киосков: секция [Client] -> ServerUrl"""
+    return load_config().get('Client', 'ServerUrl', fallback='https://192.168.1.101:5000').rstrip('/')
+
+def get_kaspi_api_url():
+    """Адрес создания счетов Kaspi: [Kaspi] -> ApiUrl (для нагрузочных тестов — фейковый шлюз)"""
+    return load_config().get('Kaspi', 'ApiUrl', fallback='https://api.kaspi.kz/v2/invoices')
+
+def get_server_backend():
+    """Чем serve.py обслуживает запросы: auto (gunicorn в Linux, waitress в Windows), gunicorn, waitress или dev"""
+    return load_config().get('Server', 'Backend', fallback='auto').lower()
+
+def get_server_bind():
+    """Адрес и порт сервера клуба: [Server] -> Bind"""
+    return load_config().get('Server', 'Bind', fallback='0.0.0.0:5000')
+
+def get_server_workers():
+    """Сколько процессов запускает gunicorn (waitress всегда работает в одном процессе)"""
+    return load_config().getint('Server', 'Workers', fallback=1)
+
+def get_server_threads():
+    """Потоков на процесс: столько запросов обрабатывается одновременно (поток SSE занят все время подписки)"""
+    return load_config().getint('Server', 'Threads', fallback=16)
+
+def get_tls_files():
+    """(сертификат, ключ) для HTTPS: [Server] -> CertFile / KeyFile"""
+    config = load_config()
+    return (config.get('Server', 'CertFile', fallback='cert.pem'),
+            config.get('Server', 'KeyFile', fallback='key.pem'))
+
+def get_log_retention_months():
+    """Сколько месяцев хранить сырой журнал запусков, считая текущий: [Logs] -> RetentionMonths (0 — всегда)"""
+    return load_config().getint('Logs', 'RetentionMonths', fallback=12)
+
+def get_hourly_rollup_days():
+    """Сколько дней хранить почасовую сводку запусков: [Logs] -> HourlyRollupDays (дневная хранится всегда)"""
+    return load_config().getint('Logs', 'HourlyRollupDays', fallback=90)
+
+def get_login_workers():
+    """Сколько паролей сервер проверяет одновременно (scrypt занимает ядро процессора на ~150 мс)"""
+    return load_config().getint('Server', 'LoginWorkers', fallback=2)
+
+def get_login_attempts_per_ip():
+    """Попыток входа в минуту с одного IP: [Server] -> LoginAttemptsPerIp (0 — без ограничения; за прокси у всех один IP)"""
+    return load_config().getint('Server', 'LoginAttemptsPerIp', fallback=30)
+
+def get_session_token_ttl():
+    """Сколько секунд живет токен сессии киоска (киоск в сети продлевает его сам)"""
+    return load_config().getint('Server', 'SessionTokenTTL', fallback=3600)
+
+def get_require_session_token():
+    """True — запросы клиента без токена сессии отклоняются (когда все киоски обновлены)"""
+    return load_config().getboolean('Server', 'RequireSessionToken', fallback=False)
@@ -0,0 +1,101 @@
+"""
+Материализованные счетчики для дашборда.
+
+Вместо COUNT(*)/GROUP BY/SUM по растущим таблицам на каждую загрузку "/"
+счетчики поддерживаются триггерами при каждой записи (в том числе из
+log_launch, api_buy_package, web_add_balance и payment_webhook),
+а дашборд читает несколько готовых строк.
+"""
+
+STATS_TABLES = [
+    "CREATE TABLE IF NOT EXISTS stats_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE IF NOT EXISTS app_launch_counts (app_name TEXT PRIMARY KEY, launches INTEGER NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS idx_app_launch_counts_launches ON app_launch_counts (launches)",
+    "CREATE TABLE IF NOT EXISTS daily_revenue (day TEXT NOT NULL, type TEXT NOT NULL, amount INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, type))",
+]
+
+STATS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_users_ins AFTER INSERT ON users BEGIN
+           UPDATE stats_counters SET value = value + 1 WHERE name = 'users';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_users_del AFTER DELETE ON users BEGIN
+           UPDATE stats_counters SET value = value - 1 WHERE name = 'users';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_apps_ins AFTER INSERT ON apps BEGIN
+           UPDATE stats_counters SET value = value + 1 WHERE name = 'apps';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_apps_del AFTER DELETE ON apps BEGIN
+           UPDATE stats_counters SET value = value - 1 WHERE name = 'apps';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_computers_ins AFTER INSERT ON computers BEGIN
+           UPDATE stats_counters SET value = value + 1 WHERE name = 'computers';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_computers_del AFTER DELETE ON computers BEGIN
+           UPDATE stats_counters SET value = value - 1 WHERE name = 'computers';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_launch_ins AFTER INSERT ON launch_logs WHEN NEW.app_name IS NOT NULL BEGIN
+           INSERT INTO app_launch_counts (app_name, launches) VALUES (NEW.app_name, 1)
+               ON CONFLICT(app_name) DO UPDATE SET launches = launches + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_launch_del AFTER DELETE ON launch_logs WHEN OLD.app_name IS NOT NULL BEGIN
+           UPDATE app_launch_counts SET launches = launches - 1 WHERE app_name = OLD.app_name;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_revenue_ins AFTER INSERT ON transactions BEGIN
+           INSERT INTO daily_revenue (day, type, amount) VALUES (date(NEW.timestamp), NEW.type, NEW.amount)
+               ON CONFLICT(day, type) DO UPDATE SET amount = amount + NEW.amount;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_stats_revenue_del AFTER DELETE ON transactions BEGIN
+           UPDATE daily_revenue SET amount = amount - OLD.amount WHERE day = date(OLD.timestamp) AND type = OLD.type;
+       END""",
+]
+
+COUNTER_SOURCES = {"users": "users", "apps": "apps", "computers": "computers"}
+
+
+def create_stats_schema(conn):
+    """Создает таблицы счетчиков и триггеры. Возвращает True, если таблицы создавались впервые."""
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'"
+    ).fetchone() is not None
+    for statement in STATS_TABLES + STATS_TRIGGERS:
+        conn.execute(statement)
+    return not existed
+
+
+def rebuild_stats(conn):
+    """Пересчитывает все счетчики заново по истории (в текущей транзакции)."""
+    conn.execute("DELETE FROM stats_counters")
+    for name, table in COUNTER_SOURCES.items():
+        conn.execute(f"INSERT INTO stats_counters (name, value) SELECT ?, COUNT(*) FROM {table}", (name,))
+    conn.execute("DELETE FROM app_launch_counts")
+    # Сырые записи прошлых месяцев уходят в архив и удаляются по сроку хранения (utils/launch_archive.py),
+    # поэтому полная история запусков — в дневной сводке, если она уже есть
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'launch_daily_apps'").fetchone():
+        conn.execute("""INSERT INTO app_launch_counts (app_name, launches)
+                        SELECT app_name, SUM(launches) FROM launch_daily_apps GROUP BY app_name""")
+    else:
+        conn.execute("""INSERT INTO app_launch_counts (app_name, launches)
+                        SELECT app_name, COUNT(*) FROM launch_logs WHERE app_name IS NOT NULL GROUP BY app_name""")
+    conn.execute("DELETE FROM daily_revenue")
+    conn.execute("""INSERT INTO daily_revenue (day, type, amount)
+                    SELECT date(timestamp), type, SUM(amount) FROM transactions GROUP BY date(timestamp), type""")
+
+
+def read_stats(conn, today):
+    """Читает готовые счетчики. `today` — строка 'YYYY-MM-DD' начала текущих суток."""
+    counters = {row[0]: row[1] for row in conn.execute("SELECT name, value FROM stats_counters")}
+    top_app = conn.execute(
+        "SELECT app_name, launches FROM app_launch_counts WHERE launches > 0 ORDER BY launches DESC LIMIT 1"
+    ).fetchone()
+    revenue = {}
+    for row in conn.execute("SELECT type, amount FROM daily_revenue WHERE day >= ?", (today,)):
+        revenue[row[0]] = revenue.get(row[0], 0) + row[1]
+    return {
+        "users_count": counters.get("users", 0), "apps_count": counters.get("apps", 0),
+        "total_computers": counters.get("computers", 0),
+        "top_app_name": top_app[0] if top_app else "N/A", "top_app_count": top_app[1] if top_app else 0,
+        "revenue_total": revenue.get("kaspi_topup", 0) + revenue.get("admin_topup", 0),
+        "revenue_packages": revenue.get("package_purchase", 0),
+        "revenue_kaspi": revenue.get("kaspi_topup", 0)
+    }
+
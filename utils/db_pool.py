@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+import queue
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений SQLite с раздельными полосами:
+
+      - писатель: одно соединение, записи сериализуются блокировкой
+        (SQLite все равно допускает только одного писателя);
+      - читатели: до `readers` соединений в режиме query_only.
+
+    База переводится в WAL, поэтому чтения админки не ждут записей
+    heartbeat'ов и покупок. Каждое соединение держит свой кэш
+    подготовленных выражений (`cached_statements`).
+
+    stats() показывает конкуренцию за запись: сколько раз писатель ждал
+    блокировку и сколько ждал, сколько держал ее и сколько раз SQLite ответил
+    "database is locked" (другой процесс держал базу дольше busy_timeout).
+    """
+
+    def __init__(self, db_path, readers=4, synchronous="NORMAL", cached_statements=256, busy_timeout=5.0):
+        self.db_path = db_path
+        self.max_readers = max(1, readers)
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._stats = self._empty_stats()
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+
+    def _connect(self, readonly=False):
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout,
+            check_same_thread=False, cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        if readonly:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Соединение-писатель: commit при выходе, rollback при исключении."""
+        waited = 0.0
+        if not self._writer_lock.acquire(blocking=False):
+            started = time.perf_counter()
+            self._writer_lock.acquire()
+            waited = time.perf_counter() - started
+        held_from = time.perf_counter()
+        locked = False
+        try:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except Exception as e:
+                locked = isinstance(e, sqlite3.OperationalError) and "locked" in str(e)
+                conn.rollback()
+                raise
+        finally:
+            held = time.perf_counter() - held_from
+            self._writer_lock.release()
+            self._record_write(waited, held, locked)
+
+    @staticmethod
+    def _empty_stats():
+        return {"writes": 0, "writer_waits": 0, "writer_wait_ms": 0.0, "writer_wait_max_ms": 0.0,
+                "writer_held_ms": 0.0, "locked_errors": 0}
+
+    def _record_write(self, waited, held, locked):
+        with self._stats_lock:
+            stats = self._stats
+            stats["writes"] += 1
+            stats["writer_held_ms"] += held * 1000
+            if waited:
+                stats["writer_waits"] += 1
+                stats["writer_wait_ms"] += waited * 1000
+                stats["writer_wait_max_ms"] = max(stats["writer_wait_max_ms"], waited * 1000)
+            if locked:
+                stats["locked_errors"] += 1
+
+    def stats(self, reset=False):
+        """Снимок счетчиков записи с момента запуска (или прошлого reset)."""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+            if reset:
+                self._stats = self._empty_stats()
+        return snapshot
+
+    def _acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                try:
+                    return self._connect(readonly=True)
+                except Exception:
+                    # Соединение не открылось: место в пуле освобождается, иначе читатели ждали бы его вечно
+                    self._reader_count -= 1
+                    raise
+        return self._readers.get()
+
+    @contextmanager
+    def reader(self):
+        """Соединение только для чтения, после использования возвращается в пул."""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def close(self):
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._reader_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._reader_count = 0
@@ -0,0 +1,90 @@
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatBuffer:
+    """
+    Write-behind буфер для heartbeat'ов клиентов.
+
+    Последний "пульс" каждого ПК хранится в памяти (таблица присутствия),
+    а в БД все накопившиеся изменения сбрасываются одной транзакцией
+    раз в `interval` секунд через `flush_func(beats)`. После каждого такта
+    (даже пустого) вызывается `on_tick()`, если он задан.
+    """
+
+    def __init__(self, flush_func, interval=5.0, on_tick=None):
+        self.flush_func = flush_func
+        self.interval = interval
+        self.on_tick = on_tick
+        self._presence = {}   # pc_name -> последний heartbeat
+        self._pending = {}    # pc_name -> heartbeat, еще не записанный в БД
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def record(self, pc_name, ip_address, status, user=None, time_left=None, timestamp=None):
+        beat = {
+            "pc_name": pc_name, "ip_address": ip_address, "status": status,
+            "user": user, "time_left": time_left,
+            "timestamp": timestamp or datetime.now()
+        }
+        with self._lock:
+            self._presence[pc_name] = beat
+            self._pending[pc_name] = beat
+        return beat
+
+    def presence(self):
+        """Копия таблицы присутствия: pc_name -> последний heartbeat."""
+        with self._lock:
+            return dict(self._presence)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Записывает накопленные heartbeat'ы в БД. Возвращает число записанных ПК."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = list(self._pending.values())
+                self._pending = {}
+            try:
+                self.flush_func(batch)
+            except Exception as e:
+                logger.error(f"Ошибка сброса буфера heartbeat ({len(batch)} ПК): {e}")
+                # Возвращаем в буфер то, что не успело смениться более свежим пульсом
+                with self._lock:
+                    for beat in batch:
+                        self._pending.setdefault(beat["pc_name"], beat)
+                return 0
+            return len(batch)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+            if self.on_tick:
+                try:
+                    self.on_tick()
+                except Exception as e:
+                    logger.error(f"Ошибка on_tick буфера heartbeat: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="HeartbeatFlush", daemon=True)
+        self._thread.start()
+        logger.info(f"Буфер heartbeat запущен (сброс каждые {self.interval} сек).")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+        self.flush()
@@ -0,0 +1,142 @@
+from PyQt5.QtGui import QIcon, QPixmap, QPainter, QPainterPath
+from PyQt5.QtCore import Qt, QSize
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import os
+
+CACHE_DIR = "cache/icons"
+PNG_QUALITY = 80  # для PNG это уровень сжатия: быстрая запись при почти том же размере файла
+
+
+def rounded_pixmap(pixmap, radius=12):
+    size = pixmap.size()
+    rounded = QPixmap(size)
+    rounded.fill(Qt.transparent)
+    painter = QPainter(rounded)
+    painter.setRenderHint(QPainter.Antialiasing)
+    path = QPainterPath()
+    path.addRoundedRect(0, 0, size.width(), size.height(), radius, radius)
+    painter.setClipPath(path)
+    painter.drawPixmap(0, 0, pixmap)
+    painter.end()
+    return rounded
+
+
+class IconCache:
+    """
+    Кэш готовых иконок: LRU в памяти + PNG-файлы в cache/icons.
+
+    Иконки плиток хранятся уже отмасштабированными и скругленными, ключ —
+    хэш содержимого исходного файла + размер + радиус, поэтому замена файла
+    или другой scale_factor дают новый ключ, а старая картинка просто не используется.
+    Иконки exe (панель задач) кэшируются по пути, времени изменения и размеру
+    файла — сам exe не читается, а ExtractIconEx вызывается один раз на версию файла.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, capacity=512):
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self._memory = OrderedDict()   # ключ -> QPixmap
+        self._hashes = {}              # путь -> ((mtime_ns, size), sha1 содержимого)
+        self._lock = threading.RLock()
+        self.hits = 0; self.disk_hits = 0; self.misses = 0
+        # PNG пишутся в фоне, чтобы первый запуск не ждал сжатия сотен картинок
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IconCacheWriter")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def tile_pixmap(self, source_path, width, height, radius=12):
+        """Готовая иконка плитки или None, если исходного файла нет."""
+        content_hash = self._content_hash(source_path)
+        if content_hash is None:
+            return None
+        key = f"tile_{content_hash}_{width}x{height}_r{radius}"
+
+        def render():
+            pixmap = QPixmap(source_path).scaled(width, height, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+            return rounded_pixmap(pixmap, radius)
+        return self._get(key, render)
+
+    def exe_icon(self, exe_path, extract):
+        """QIcon программы; `extract(exe_path)` вызывается только при промахе кэша."""
+        try:
+            stat = os.stat(exe_path)
+        except OSError:
+            return QIcon()
+        fingerprint = f"{os.path.normcase(exe_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        key = "exe_" + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+
+        def render():
+            icon = extract(exe_path)
+            if icon.isNull():
+                return None
+            sizes = icon.availableSizes()
+            return icon.pixmap(sizes[0] if sizes else QSize(48, 48))
+        pixmap = self._get(key, render)
+        return QIcon(pixmap) if pixmap is not None else QIcon()
+
+    def stats(self):
+        with self._lock:
+            return {"memory": len(self._memory), "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def _get(self, key, render):
+        with self._lock:
+            pixmap = self._memory.get(key)
+            if pixmap is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return pixmap
+            file_path = os.path.join(self.cache_dir, f"{key}.png")
+            pixmap = QPixmap(file_path) if os.path.exists(file_path) else None
+            if pixmap is not None and not pixmap.isNull():
+                self.disk_hits += 1
+            else:
+                pixmap = render()
+                if pixmap is None or pixmap.isNull():
+                    return None
+                self.misses += 1
+                self._writer.submit(self._write, pixmap.toImage(), file_path)
+            self._memory[key] = pixmap
+            if len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+            return pixmap
+
+    def flush(self):
+        """Дожидается записи всех PNG на диск."""
+        self._writer.submit(lambda: None).result()
+
+    @staticmethod
+    def _write(image, file_path):
+        # QImage (в отличие от QPixmap) можно сохранять вне GUI-потока; временный файл —
+        # чтобы при сбое питания в кэше не осталось обрезанной картинки
+        tmp_path = f"{file_path}.tmp"
+        if image.save(tmp_path, "PNG", PNG_QUALITY):
+            os.replace(tmp_path, file_path)
+
+    def _content_hash(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached and cached[0] == stamp:
+                return cached[1]
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        with self._lock:
+            self._hashes[path] = (stamp, digest)
+        return digest
+
+
+_icon_cache = None
+
+
+def get_icon_cache():
+    """Общий для всего клиента экземпляр кэша (создается при первом обращении)."""
+    global _icon_cache
+    if _icon_cache is None:
+        _icon_cache = IconCache()
+    return _icon_cache
@@ -0,0 +1,167 @@
+"""
+Вход клиентов с киосков: проверка пароля вне потоков Flask и токены сессии.
+
+Хеш пароля (werkzeug scrypt, N=32768) стоит ~150 мс процессора и ~32 МБ
+памяти. Раньше /api/login считал его прямо в потоке запроса, и в час
+открытия клуба десятки одновременных входов занимали все потоки и процессор,
+а пульсы и покупки вставали за ними в очередь. Теперь:
+
+  PasswordVerifier   — хеши считает небольшой пул потоков (hashlib.scrypt
+                       отпускает GIL, поэтому отдельные процессы не нужны):
+                       одновременно идет не больше `workers` проверок, лишние
+                       ждут в ограниченной очереди, при переполнении — отказ;
+  AdmissionLimiter   — не больше N попыток входа за окно на логин и на IP,
+                       чтобы перебор пароля не съедал пул проверок (попытки
+                       в базе — лимит общий для всех процессов сервера);
+  SessionTokens      — после успешного входа киоск получает подписанный
+                       токен (itsdangerous) и дальше присылает его в заголовке
+                       X-Session-Token вместо пароля: проверка токена — одно
+                       HMAC, дорогой хеш считается один раз за сессию.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.security import check_password_hash
+
+SESSION_TOKEN_HEADER = "X-Session-Token"
+
+ADMISSION_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS login_attempts (kind TEXT NOT NULL, key TEXT NOT NULL, at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_login_attempts_key ON login_attempts (kind, key, at)",
+    "CREATE INDEX IF NOT EXISTS idx_login_attempts_at ON login_attempts (at)",
+]
+
+
+class LoginBusy(Exception):
+    """Очередь проверок паролей переполнена: киоску стоит повторить вход через retry_after сек (дробное)."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LoginThrottled(LoginBusy):
+    """Слишком много попыток входа с этого логина или IP."""
+    pass
+
+
+class PasswordVerifier:
+    def __init__(self, workers=2, max_pending=None, wait_timeout=10.0):
+        self.workers = workers
+        # Ждущий вход держит поток сервера, поэтому очередь заметно меньше числа потоков (Threads):
+        # остальные входы сразу получают 503 и повторяют, а пульсы не ждут свободного потока
+        self.max_pending = max_pending or workers * 2
+        self.wait_timeout = wait_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-check")
+        self._pending = 0
+        self._hash_seconds = 0.15  # скользящее среднее времени одной проверки
+        self._lock = threading.Lock()
+
+    def verify(self, password_hash, password):
+        """True/False; LoginBusy — если очередь полна или проверка не успела за wait_timeout."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                # Через сколько освободится место в очереди; разброс, чтобы отказанные киоски не вернулись разом
+                wait = self._hash_seconds * self._pending / self.workers
+                raise LoginBusy("Сервер занят входами других клиентов, повторите вход",
+                                retry_after=round(wait * random.uniform(0.5, 1.5), 2))
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._check, password_hash, password)
+        except Exception:
+            self._release()
+            raise
+        # Место в очереди освобождает сама проверка, а не ожидающий запрос: после таймаута
+        # уже идущий хеш (cancel его не остановит) продолжает занимать место до конца
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise LoginBusy("Проверка пароля не успела, повторите вход", retry_after=2)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _check(self, password_hash, password):
+        started = time.perf_counter()
+        try:
+            return check_password_hash(password_hash, password)
+        finally:
+            self._hash_seconds = 0.8 * self._hash_seconds + 0.2 * (time.perf_counter() - started)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+
+class AdmissionLimiter:
+    """
+    Скользящее окно: не больше `per_user` попыток на логин и `per_ip` на IP за `window` сек (0 — без ограничения).
+
+    Попытки лежат в таблице login_attempts, общей для всех процессов сервера,
+    иначе каждый процесс давал бы перебору свой лимит. Методы вызываются с
+    соединением-писателем: admit() сначала записывает попытку, потом считает —
+    запись держит блокировку базы, поэтому одновременные входы из разных
+    процессов не проходят вместе сверх лимита; отказ откатывает запись.
+    """
+
+    def __init__(self, per_user=5, per_ip=30, window=60.0):
+        self.limits = {"user": per_user, "ip": per_ip}
+        self.window = window
+
+    def admit(self, conn, ip, username, now=None):
+        """Засчитывает попытку входа или бросает LoginThrottled (транзакцию откатывает вызывающий)."""
+        now = now or time.time()
+        keys = [("user", username), ("ip", ip)]
+        conn.executemany("INSERT INTO login_attempts (kind, key, at) VALUES (?, ?, ?)", [(kind, key, now) for kind, key in keys])
+        for kind, key in keys:
+            limit = self.limits[kind]
+            if not limit:
+                continue
+            count, oldest = conn.execute("SELECT COUNT(*), MIN(at) FROM login_attempts WHERE kind = ? AND key = ? AND at > ?",
+                                         (kind, key, now - self.window)).fetchone()
+            if count > limit:
+                raise LoginThrottled("Слишком много попыток входа, подождите",
+                                     retry_after=max(1, int(self.window - (now - oldest)) + 1))
+
+    def refund(self, conn, ip, username):
+        """Снимает последнюю попытку: вход отклонен из-за занятости сервера, а не проверен."""
+        for kind, key in (("user", username), ("ip", ip)):
+            conn.execute("""DELETE FROM login_attempts WHERE rowid =
+                              (SELECT rowid FROM login_attempts WHERE kind = ? AND key = ? ORDER BY at DESC LIMIT 1)""", (kind, key))
+
+    def reset(self, conn, username):
+        """Успешный вход обнуляет счетчик логина (счетчик IP остается)."""
+        conn.execute("DELETE FROM login_attempts WHERE kind = 'user' AND key = ?", (username,))
+
+    def forget_old(self, conn, now=None):
+        return conn.execute("DELETE FROM login_attempts WHERE at <= ?", ((now or time.time()) - self.window,)).rowcount
+
+
+class SessionTokens:
+    """Подписанный токен сессии клиента: логин и время выдачи, живет `ttl` сек."""
+
+    def __init__(self, secret_key, ttl=3600):
+        self.ttl = ttl
+        self._serializer = URLSafeTimedSerializer(secret_key, salt="kiosk-session")
+
+    def issue(self, username):
+        return self._serializer.dumps({"u": username})
+
+    def load(self, token, max_age=None):
+        """(логин, возраст токена в сек) или None, если токен подделан или старше max_age (по умолчанию ttl)."""
+        try:
+            data, issued = self._serializer.loads(token, max_age=max_age or self.ttl, return_timestamp=True)
+        except (SignatureExpired, BadSignature):
+            return None
+        if not isinstance(data, dict) or not data.get("u"):
+            return None
+        return data["u"], time.time() - issued.timestamp()
+
+    def renew(self, username, age):
+        """Новый токен, если прошла половина срока жизни (киоск в сети продлевает сессию незаметно), иначе None."""
+        return self.issue(username) if age >= self.ttl / 2 else None
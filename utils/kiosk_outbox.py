@@ -0,0 +1,126 @@
+"""
+Применение очереди изменений киоска (POST /api/kiosk/outbox).
+
+Пока сервер недоступен, киоск копит изменения в локальном хранилище
+(utils/kiosk_store.py) и при восстановлении связи присылает их пачкой:
+
+  launch     — запуск приложения {user, app_name, timestamp};
+  time_used  — время без связи, закрытое до восстановления связи (выход
+               клиента, покупка без связи) {user, seconds};
+  purchase   — покупка пакета без связи {user, price, seconds, package_name, order_id};
+  app_runtime — сколько шло запущенное приложение {user, app_name, started, seconds}.
+
+Остальное время без связи приходит прямо в первой удачной синхронизации
+(apply_offline_time) — до того, как сервер снова запустит сессию.
+
+Пачка применяется по порядку в одной транзакции писателя. Каждое изменение
+помечается ключом "<store_id>:<id>" в kiosk_mutations, поэтому повтор пачки
+(ответ сервера не дошел до киоска) ничего не применяет второй раз; покупка
+вдобавок идемпотентна по order_id (тот же номер киоск присылает и онлайн).
+Отклоненное изменение (нет клиента, не хватает денег, чужой токен) тоже
+помечается: повтор его не оживит, и киоск убирает его из очереди.
+"""
+from utils.balance_service import buy_package, is_kiosk_order, UserNotFound, InsufficientFunds
+from utils.launch_archive import launch_timestamp, record_playtime
+from utils.session_ledger import consume_offline, pause_session, read_account, now_ts
+
+MAX_OUTBOX_BATCH = 500
+MUTATION_KEEP_DAYS = 30                 # сколько помнить примененные ключи (дольше киоск офлайн не бывает)
+OFFLINE_TOKEN_MAX_AGE = 7 * 24 * 3600   # токен, под которым изменение записано без связи, может быть старше своего ttl
+MAX_OFFLINE_SECONDS = 24 * 3600         # одно списание времени без связи
+
+OUTBOX_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS kiosk_mutations (mutation_key TEXT PRIMARY KEY, applied_at INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_kiosk_mutations_applied_at ON kiosk_mutations (applied_at)",
+]
+
+
+class MutationRejected(Exception):
+    pass
+
+
+def apply_mutations(conn, store_id, pc_name, ip_address, mutations, authorize, now=None):
+    """
+    Применяет изменения одного киоска по порядку (в текущей транзакции).
+    authorize(user, token) -> текст отказа или None. Возвращает
+    (примененные id, повторы id, [{id, message}] отклоненных).
+    """
+    now = now or now_ts()
+    applied, duplicates, rejected = [], [], []
+    for mutation in mutations:
+        mutation_id = mutation.get("id") if isinstance(mutation, dict) else None
+        if not isinstance(mutation_id, int):
+            raise MutationRejected("Изменение без числового id")
+        if conn.execute("INSERT OR IGNORE INTO kiosk_mutations (mutation_key, applied_at) VALUES (?, ?)",
+                        (f"{store_id}:{mutation_id}", now)).rowcount == 0:
+            duplicates.append(mutation_id)
+            continue
+        try:
+            _apply(conn, pc_name, ip_address, mutation, authorize, now)
+            applied.append(mutation_id)
+        except (MutationRejected, UserNotFound, InsufficientFunds) as e:
+            rejected.append({"id": mutation_id, "message": _reason(e)})
+    return applied, duplicates, rejected
+
+
+def apply_offline_time(conn, store_id, since, username, seconds, now=None):
+    """
+    Время без связи, которое киоск присылает в первой удачной синхронизации
+    ({offline: {store_id, since, seconds}} в /api/kiosk/sync): списывается один раз на
+    ключ "<store_id>:offline:<since>". True — если списано сейчас.
+    """
+    if not isinstance(seconds, int) or not 0 < seconds <= MAX_OFFLINE_SECONDS:
+        raise MutationRejected("Неверное время без связи")
+    if conn.execute("INSERT OR IGNORE INTO kiosk_mutations (mutation_key, applied_at) VALUES (?, ?)",
+                    (f"{store_id}:offline:{since}", now or now_ts())).rowcount == 0:
+        return False
+    return consume_offline(conn, username, seconds)
+
+
+def forget_old_mutations(conn, now=None):
+    """Удаляет ключи примененных изменений старше MUTATION_KEEP_DAYS."""
+    return conn.execute("DELETE FROM kiosk_mutations WHERE applied_at < ?",
+                        ((now or now_ts()) - MUTATION_KEEP_DAYS * 86400,)).rowcount
+
+
+def _apply(conn, pc_name, ip_address, mutation, authorize, now):
+    kind = mutation.get("kind"); user = mutation.get("user")
+    if kind == "launch":
+        if not mutation.get("app_name"):
+            raise MutationRejected("Запуск без app_name")
+        conn.execute("INSERT INTO launch_logs (computer_name, ip_address, user, app_name, timestamp) VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+                     (pc_name, mutation.get("ip_address") or ip_address, user, mutation["app_name"], launch_timestamp(mutation.get("timestamp"))))
+        return
+    if kind == "app_runtime":
+        seconds = mutation.get("seconds")
+        if not mutation.get("app_name") or not isinstance(seconds, int) or not 0 <= seconds <= MAX_OFFLINE_SECONDS:
+            raise MutationRejected("Неверное время в приложении")
+        record_playtime(conn, mutation["app_name"], mutation.get("started"), seconds)
+        return
+    if kind not in ("time_used", "purchase"):
+        raise MutationRejected(f"Неизвестный вид изменения: {kind}")
+    if not user:
+        raise MutationRejected("Изменение без клиента")
+    denied = authorize(user, mutation.get("token"))
+    if denied:
+        raise MutationRejected(denied)
+    if kind == "time_used":
+        seconds = mutation.get("seconds")
+        if not isinstance(seconds, int) or not 0 < seconds <= MAX_OFFLINE_SECONDS:
+            raise MutationRejected("Неверное время без связи")
+        consume_offline(conn, user, seconds)
+        return
+    price = mutation.get("price"); seconds = mutation.get("seconds"); order_id = mutation.get("order_id")
+    if not isinstance(price, int) or not isinstance(seconds, int) or price < 0 or seconds <= 0 or not is_kiosk_order(order_id):
+        raise MutationRejected("Неверная покупка")
+    account = read_account(conn, user, now)
+    if buy_package(conn, user, price, seconds, now, order_id=order_id) is not None and account and not account[2]:
+        # Без связи сессия на сервере стоит: покупка только добавляет время, а сыгранное
+        # после нее (time_used или offline в синхронизации) списывается со стоящей сессии
+        pause_session(conn, user, now)
+
+
+def _reason(error):
+    if isinstance(error, UserNotFound): return "Клиент не найден"
+    if isinstance(error, InsufficientFunds): return "Недостаточно средств"
+    return str(error)
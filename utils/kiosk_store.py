@@ -0,0 +1,290 @@
+"""
+Локальное состояние киоска в одной базе SQLite (cache/kiosk.db).
+
+Раньше состояние лежало в отдельных файлах — cache/{логин}.json (баланс и
+время, перезаписывался на каждой синхронизации раз в 5 сек), cache/{логин}.hash,
+last_login.txt, cache/session_token и очередь запусков cache/launch_queue.jsonl —
+и каждый файл открывался и переписывался целиком. Теперь:
+
+  kv      — значения по ключу (JSON). set() пишет на диск, только если
+            значение изменилось; счет клиента хранится как дедлайн сессии,
+            а не остаток, поэтому тикающее время не требует записи;
+  outbox  — очередь изменений для сервера (время, сыгранное без связи,
+            запуски, покупки). Изменения уходят на /api/kiosk/outbox строго
+            по порядку и удаляются из очереди только после ответа сервера.
+
+Каждая запись — транзакция SQLite (WAL, synchronous=FULL): после сбоя
+питания база остается в последнем подтвержденном состоянии. Окно входа и
+главное окно — разные процессы, они работают с одной базой.
+"""
+import glob
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+STORE_FILE = "cache/kiosk.db"
+MAX_LAUNCHES_QUEUED = 10000  # если сервер долго недоступен, самые старые запуски отбрасываются
+DEADLINE_SLACK = 5           # сек: расхождение дедлайна меньше этого не записывается
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_outbox_kind ON outbox (kind)",
+]
+
+
+class KioskStore:
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.writes = 0  # транзакций записи с момента открытия (для бенчмарков)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._lock = threading.Lock()
+        with self._lock:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+        self._values = {}
+        self._reload()
+        if self.get("store_id") is None:
+            self.set("store_id", secrets.token_hex(4))
+
+    # --- значения ---
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        """Записывает значение, если оно изменилось. True — была запись на диск."""
+        if key in self._values and self._values[key] == value:
+            return False
+        with self._write() as conn:
+            conn.execute("INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                         (key, json.dumps(value, ensure_ascii=False)))
+        self._values[key] = value
+        return True
+
+    def delete(self, key):
+        if key not in self._values:
+            return False
+        with self._write() as conn:
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+        self._values.pop(key, None)
+        return True
+
+    def refresh(self):
+        """Перечитывает значения, записанные другим процессом (окно входа -> главное окно)."""
+        with self._lock:
+            self._reload()
+
+    # --- счет клиента ---
+
+    def save_account(self, username, balance, time_left, running):
+        """
+        Баланс и время клиента для игры без связи. У идущей сессии хранится
+        дедлайн (UNIX-время), поэтому синхронизации, где меняется только
+        остаток, на диск не пишут. True — была запись.
+        """
+        previous = self.get(f"account:{username}")
+        deadline = int(time.time()) + time_left if running and time_left > 0 else None
+        if previous and previous.get("balance") == balance:
+            if deadline is None and previous.get("deadline") is None and previous.get("time_left") == time_left:
+                return False
+            if deadline is not None and previous.get("deadline") is not None \
+                    and abs(previous["deadline"] - deadline) < DEADLINE_SLACK:
+                return False
+        return self.set(f"account:{username}", {"balance": balance, "time_left": time_left, "deadline": deadline})
+
+    def account(self, username):
+        """(баланс, остаток времени) из последнего сохранения."""
+        data = self.get(f"account:{username}") or {}
+        if data.get("deadline") is not None:
+            return data.get("balance", 0), max(0, data["deadline"] - int(time.time()))
+        return data.get("balance", 0), data.get("time_left", 0)
+
+    # --- очередь изменений ---
+
+    def enqueue(self, kind, payload):
+        """Добавляет изменение в конец очереди. Возвращает его id (для сервера — store_id-id)."""
+        with self._write() as conn:
+            mutation_id = conn.execute("INSERT INTO outbox (kind, payload, created) VALUES (?, ?, ?)",
+                                       (kind, json.dumps(payload, ensure_ascii=False), time.time())).lastrowid
+            if kind == "launch":
+                # Переполнение режет только запуски: время и покупки не теряются
+                conn.execute("""DELETE FROM outbox WHERE kind = 'launch' AND id <= (
+                                    SELECT id FROM outbox WHERE kind = 'launch' ORDER BY id DESC LIMIT 1 OFFSET ?)""",
+                             (MAX_LAUNCHES_QUEUED,))
+        return mutation_id
+
+    def pending(self, limit=200):
+        """Первые `limit` изменений очереди: [(id, kind, payload)]; поврежденный payload — None (его тоже нужно ack)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, kind, payload FROM outbox ORDER BY id LIMIT ?", (limit,)).fetchall()
+        result = []
+        for mutation_id, kind, payload in rows:
+            try:
+                result.append((mutation_id, kind, json.loads(payload)))
+            except ValueError:
+                result.append((mutation_id, kind, None))
+        return result
+
+    def ack(self, last_id):
+        """Удаляет из очереди все изменения до `last_id` включительно."""
+        with self._write() as conn:
+            conn.execute("DELETE FROM outbox WHERE id <= ?", (last_id,))
+
+    def outbox_size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # --- игра без связи ---
+
+    def mark_offline(self, username):
+        """Первая неудачная синхронизация клиента: запоминает, с какого момента время идет без сервера."""
+        if username and self.get("offline_since") is None:
+            self.set("offline_since", {"user": username, "at": int(time.time()), "token": self.get("session_token")})
+
+    def offline_report(self, username):
+        """{store_id, since, seconds} для /api/kiosk/sync, если клиент играл без связи, иначе None."""
+        offline = self.get("offline_since")
+        if not offline or offline.get("user") != username:
+            return None
+        return {"store_id": self.get("store_id"), "since": offline["at"], "seconds": int(time.time()) - offline["at"]}
+
+    def clear_offline(self, since):
+        """Сервер принял время без связи, отправленное с меткой since."""
+        offline = self.get("offline_since")
+        if offline and offline.get("at") == since:
+            self.delete("offline_since")
+
+    def flush_offline_time(self, still_offline=False):
+        """
+        Ставит в очередь time_used за время без связи (сервер спишет его со
+        стоящей сессии). Вызывается при выходе клиента без связи и перед
+        покупкой без связи; в остальных случаях время уходит в синхронизации
+        (offline_report) и в очередь не пишется.
+        """
+        offline = self.get("offline_since")
+        if offline is None:
+            return 0
+        now = int(time.time())
+        seconds = now - offline.get("at", now)
+        restarted = dict(offline, at=now) if still_offline else None
+        with self._write() as conn:
+            if seconds > 0:
+                conn.execute("INSERT INTO outbox (kind, payload, created) VALUES (?, ?, ?)",
+                             ("time_used", json.dumps({"user": offline.get("user"), "seconds": seconds, "token": offline.get("token")},
+                                                      ensure_ascii=False), time.time()))
+            if restarted:
+                conn.execute("UPDATE kv SET value = ? WHERE key = 'offline_since'", (json.dumps(restarted, ensure_ascii=False),))
+            else:
+                conn.execute("DELETE FROM kv WHERE key = 'offline_since'")
+        if restarted:
+            self._values["offline_since"] = restarted
+        else:
+            self._values.pop("offline_since", None)
+        return max(0, seconds)
+
+    # --- перенос старых файлов ---
+
+    def import_legacy(self, cache_dir="cache", last_login_file="last_login.txt"):
+        """
+        Один раз переносит состояние из старых файлов (cache/*.json, cache/*.hash,
+        last_login.txt, cache/session_token, cache/launch_queue.jsonl). Файлы
+        остаются на месте (часть из них лежит в репозитории и в сборках dist/),
+        а хранилище помечается ключом legacy_imported: окно входа и главное окно
+        открывают его одновременно, и перенос достается только одному из них.
+        Возвращает перенесенные файлы.
+        """
+        with self._write() as conn:
+            claimed = conn.execute("INSERT INTO kv (key, value) VALUES ('legacy_imported', ?) ON CONFLICT(key) DO NOTHING",
+                                   (json.dumps(int(time.time())),)).rowcount
+        if not claimed:
+            return []
+        moved = []
+        for path in glob.glob(os.path.join(cache_dir, "*.hash")):
+            with open(path, encoding="utf-8") as f:
+                self.set(f"password_hash:{os.path.basename(path)[:-5]}", f.read().strip())
+            moved.append(path)
+        for path in glob.glob(os.path.join(cache_dir, "*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self.save_account(os.path.basename(path)[:-5], data.get("balance", 0), data.get("time_left", 0), False)
+            except (ValueError, AttributeError):
+                pass
+            moved.append(path)
+        for key, path in (("last_login", last_login_file), ("session_token", os.path.join(cache_dir, "session_token"))):
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    value = f.read().strip()
+                if value:
+                    self.set(key, value)
+                moved.append(path)
+        queue_file = os.path.join(cache_dir, "launch_queue.jsonl")
+        if os.path.exists(queue_file):
+            with open(queue_file, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.enqueue("launch", json.loads(line))
+                    except ValueError:
+                        continue
+            moved.append(queue_file)
+        return moved
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _reload(self):
+        self._values = {}
+        for key, value in self._conn.execute("SELECT key, value FROM kv"):
+            try:
+                self._values[key] = json.loads(value)
+            except ValueError:
+                continue
+
+    def _write(self):
+        return _WriteTransaction(self)
+
+
+class _WriteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT под блокировкой хранилища."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store._lock.acquire()
+        self.store._conn.execute("BEGIN IMMEDIATE")
+        return self.store._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.store._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+            if not exc_type:
+                self.store.writes += 1
+        finally:
+            self.store._lock.release()
+        return False
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Хранилище процесса киоска; при первом открытии забирает состояние из старых файлов."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = KioskStore()
+            try:
+                _store.import_legacy()
+            except OSError as e:
+                print(f"Не удалось перенести старый кэш киоска: {e}")
+        return _store
@@ -0,0 +1,193 @@
+"""
+Журнал запусков по месяцам, сводки и срок хранения.
+
+launch_logs хранит только текущий месяц (UTC): сюда пишут /log_launch и
+/log_launch/batch, отсюда читает страница /logs. Раз в час сервер переносит
+записи прошлых месяцев в архивные таблицы launch_logs_ГГГГММ (по одной на
+месяц), а месяцы старше срока хранения удаляет целиком через DROP TABLE —
+без построчного DELETE по огромной таблице.
+
+Каждая запись в launch_logs триггером прибавляется к сводкам: почасовой
+launch_hourly (час, приложение, ПК) и дневным launch_daily_apps (день,
+приложение) и launch_daily_pcs (день, ПК). Статистика по приложениям и ПК
+читает несколько сотен строк за год и не зависит от того, сколько сырых
+записей еще хранится. Почасовая сводка живет HourlyRollupDays дней, дневные —
+всегда. Перенос в архив и удаление сводки и счетчики дашборда не уменьшают.
+"""
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+ARCHIVE_PREFIX = "launch_logs_"
+ARCHIVE_GLOB = "launch_logs_[0-9][0-9][0-9][0-9][0-9][0-9]"
+ROTATE_BATCH = 5000  # записей за одну транзакцию переноса: писатель не занят надолго
+COLUMNS = "id, computer_name, ip_address, user, app_name, timestamp"
+
+ARCHIVE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS launch_hourly (hour TEXT NOT NULL, app_name TEXT NOT NULL, computer_name TEXT NOT NULL, launches INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (hour, app_name, computer_name))",
+    "CREATE TABLE IF NOT EXISTS launch_daily_apps (day TEXT NOT NULL, app_name TEXT NOT NULL, launches INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, app_name))",
+    "CREATE TABLE IF NOT EXISTS launch_daily_pcs (day TEXT NOT NULL, computer_name TEXT NOT NULL, launches INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, computer_name))",
+    # Сводки заполняются по уже накопленной истории, дальше их ведет триггер
+    """INSERT INTO launch_hourly (hour, app_name, computer_name, launches)
+       SELECT strftime('%Y-%m-%d %H:00', timestamp), app_name, COALESCE(computer_name, ''), COUNT(*) FROM launch_logs
+       WHERE app_name IS NOT NULL AND strftime('%Y-%m-%d %H:00', timestamp) IS NOT NULL GROUP BY 1, 2, 3""",
+    """INSERT INTO launch_daily_apps (day, app_name, launches)
+       SELECT substr(hour, 1, 10), app_name, SUM(launches) FROM launch_hourly GROUP BY 1, 2""",
+    """INSERT INTO launch_daily_pcs (day, computer_name, launches)
+       SELECT substr(hour, 1, 10), computer_name, SUM(launches) FROM launch_hourly GROUP BY 1, 2""",
+    """CREATE TRIGGER IF NOT EXISTS trg_launch_rollup AFTER INSERT ON launch_logs WHEN NEW.app_name IS NOT NULL BEGIN
+           INSERT INTO launch_hourly (hour, app_name, computer_name, launches)
+               VALUES (COALESCE(strftime('%Y-%m-%d %H:00', NEW.timestamp), strftime('%Y-%m-%d %H:00', 'now')), NEW.app_name, COALESCE(NEW.computer_name, ''), 1)
+               ON CONFLICT(hour, app_name, computer_name) DO UPDATE SET launches = launches + 1;
+           INSERT INTO launch_daily_apps (day, app_name, launches)
+               VALUES (COALESCE(date(NEW.timestamp), date('now')), NEW.app_name, 1)
+               ON CONFLICT(day, app_name) DO UPDATE SET launches = launches + 1;
+           INSERT INTO launch_daily_pcs (day, computer_name, launches)
+               VALUES (COALESCE(date(NEW.timestamp), date('now')), COALESCE(NEW.computer_name, ''), 1)
+               ON CONFLICT(day, computer_name) DO UPDATE SET launches = launches + 1;
+       END""",
+    # Удаление сырых записей (перенос в архив, очистка) больше не уменьшает топ-игру дашборда
+    "DROP TRIGGER IF EXISTS trg_stats_launch_del",
+]
+
+
+# Время в приложениях по дням: киоск присылает длительность каждого запуска (core/launch_registry.py)
+PLAYTIME_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS playtime_daily (day TEXT NOT NULL, app_name TEXT NOT NULL, seconds INTEGER NOT NULL DEFAULT 0, runs INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, app_name))",
+]
+
+
+# Когда обслуживание журнала пора запускать снова: общее для всех процессов сервера
+MAINTENANCE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS maintenance_runs (job TEXT PRIMARY KEY, next_run INTEGER NOT NULL) WITHOUT ROWID",
+]
+
+
+def claim_maintenance(conn, job, interval, now=None):
+    """
+    True — этот процесс запускает `job` сейчас, следующий запуск через
+    `interval` сек. Процессы сервера делят один срок, поэтому обслуживание
+    идет раз в интервал, а не в каждом процессе.
+    """
+    now = int(now or time.time())
+    return conn.execute(
+        """INSERT INTO maintenance_runs (job, next_run) VALUES (?, ?)
+           ON CONFLICT(job) DO UPDATE SET next_run = excluded.next_run WHERE maintenance_runs.next_run <= ?""",
+        (job, now + interval, now)).rowcount > 0
+
+
+def launch_timestamp(value):
+    """Время запуска, присланное киоском (UTC, "ГГГГ-ММ-ДД ЧЧ:ММ:СС"), в формате CURRENT_TIMESTAMP или None (тогда — время записи)."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+def month_start(now=None, months_back=0):
+    """'ГГГГ-ММ-01' месяца (UTC), отстоящего на months_back от текущего."""
+    now = now or datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 - months_back
+    return f"{index // 12:04d}-{index % 12 + 1:02d}-01"
+
+
+def archive_tables(conn):
+    """Архивные таблицы от новых к старым: [('ГГГГММ', имя таблицы)]."""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?", (ARCHIVE_GLOB,))
+    return sorted(((row[0][len(ARCHIVE_PREFIX):], row[0]) for row in rows), reverse=True)
+
+
+def _archive_table(conn, month):
+    table = ARCHIVE_PREFIX + month
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, computer_name TEXT, ip_address TEXT, user TEXT, app_name TEXT, timestamp DATETIME)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)")
+    return table
+
+
+def rotate_launch_logs(conn, now=None, batch=ROTATE_BATCH):
+    """
+    Переносит до `batch` записей прошлых месяцев из launch_logs в архив
+    (в текущей транзакции). Возвращает число перенесенных записей; если оно
+    равно batch, стоит вызвать еще раз в новой транзакции.
+    """
+    current = month_start(now)
+    oldest = conn.execute("SELECT MIN(timestamp) FROM launch_logs").fetchone()[0]
+    if oldest is None or str(oldest) >= current:
+        return 0
+    match = re.match(r"(\d{4})-(\d{2})", str(oldest))
+    if not match:
+        raise ValueError(f"launch_logs: неизвестный формат времени {oldest!r}")
+    year, month = int(match.group(1)), int(match.group(2))
+    end = min(current, f"{year + month // 12:04d}-{month % 12 + 1:02d}-01")
+    table = _archive_table(conn, f"{year:04d}{month:02d}")
+    # Самая старая запись задает месяц, поэтому все, что раньше end, — записи этого месяца
+    chunk = "SELECT id FROM launch_logs WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?"
+    conn.execute(f"INSERT OR IGNORE INTO {table} ({COLUMNS}) SELECT {COLUMNS} FROM launch_logs WHERE id IN ({chunk})", (end, batch))
+    return conn.execute(f"DELETE FROM launch_logs WHERE id IN ({chunk})", (end, batch)).rowcount
+
+
+def apply_retention(conn, keep_months, hourly_days, now=None):
+    """
+    Удаляет архивы старше keep_months месяцев (считая текущий; 0 — хранить
+    всегда) и почасовую сводку старше hourly_days дней. Возвращает список
+    удаленных таблиц.
+    """
+    now = now or datetime.now(timezone.utc)
+    dropped = []
+    if keep_months > 0:
+        cutoff = month_start(now, keep_months - 1).replace("-", "")[:6]
+        for month, table in archive_tables(conn):
+            if month < cutoff:
+                conn.execute(f"DROP TABLE {table}")
+                dropped.append(table)
+    if hourly_days > 0:
+        conn.execute("DELETE FROM launch_hourly WHERE hour < ?", ((now - timedelta(days=hourly_days)).strftime("%Y-%m-%d %H:00"),))
+    return dropped
+
+
+def clear_raw_logs(conn):
+    """Удаляет все сырые записи (текущий месяц и архивы); сводки и счетчики дашборда остаются."""
+    conn.execute("DELETE FROM launch_logs")
+    for _, table in archive_tables(conn):
+        conn.execute(f"DROP TABLE {table}")
+
+
+def recent_launches(conn, limit=100):
+    """Последние `limit` запусков для /logs: текущий месяц, при нехватке — архивы от новых к старым."""
+    rows = []
+    for table in ["launch_logs"] + [table for _, table in archive_tables(conn)]:
+        rows += conn.execute(
+            f"""SELECT T1.ip_address, T1.user, T1.app_name, T1.timestamp,
+                       COALESCE(T2.display_name, T1.computer_name) as computer_name_to_display
+                FROM {table} AS T1 LEFT JOIN computers AS T2 ON T1.computer_name = T2.pc_name
+                ORDER BY T1.timestamp DESC LIMIT ?""", (limit - len(rows),)).fetchall()
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def record_playtime(conn, app_name, started, seconds):
+    """Прибавляет запуск длительностью `seconds` к дню его начала (started — как у launch_timestamp)."""
+    day = (launch_timestamp(started) or datetime.now(timezone.utc).strftime("%Y-%m-%d"))[:10]
+    conn.execute("""INSERT INTO playtime_daily (day, app_name, seconds, runs) VALUES (?, ?, ?, 1)
+                    ON CONFLICT(day, app_name) DO UPDATE SET seconds = seconds + excluded.seconds, runs = runs + 1""",
+                 (day, app_name, seconds))
+
+
+def playtime_summary(conn, since_day):
+    """Время в приложениях с дня `since_day`: {приложение: (секунд, запусков)}."""
+    result = {}
+    for app_name, seconds, runs in conn.execute("SELECT app_name, seconds, runs FROM playtime_daily WHERE day >= ?", (since_day,)):
+        total = result.get(app_name, (0, 0))
+        result[app_name] = (total[0] + seconds, total[1] + runs)
+    return result
+
+
+def launch_summary(conn, since_day):
+    """Запуски с дня `since_day` ('ГГГГ-ММ-ДД') по дневным сводкам: ({приложение: n}, {ПК: n})."""
+    apps, computers = {}, {}
+    for row in conn.execute("SELECT app_name, launches FROM launch_daily_apps WHERE day >= ?", (since_day,)):
+        apps[row[0]] = apps.get(row[0], 0) + row[1]
+    for row in conn.execute("SELECT computer_name, launches FROM launch_daily_pcs WHERE day >= ?", (since_day,)):
+        computers[row[0]] = computers.get(row[0], 0) + row[1]
+    return apps, computers
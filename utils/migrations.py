@@ -0,0 +1,205 @@
+"""
+Версионные миграции схемы central_club.db.
+
+Номер последней примененной миграции хранится в PRAGMA user_version.
+Каждая миграция выполняется целиком в одной транзакции (SAVEPOINT),
+поэтому при ошибке база остается в предыдущей версии. Старые клубные
+базы (user_version = 0) проходят через базовую схему без изменений,
+так как она состоит из CREATE ... IF NOT EXISTS.
+"""
+import sqlite3
+import logging
+
+from utils.dashboard_stats import create_stats_schema, rebuild_stats
+from utils.app_catalog import CATALOG_SCHEMA
+from utils.session_ledger import LEDGER_SCHEMA
+from utils.balance_service import ORDER_SCHEMA
+from utils.launch_archive import ARCHIVE_SCHEMA, PLAYTIME_SCHEMA, MAINTENANCE_SCHEMA
+from utils.kiosk_outbox import OUTBOX_SCHEMA
+from utils.seat_board import KIOSK_ACTIONS_SCHEMA
+from utils.payment_gateway import INVOICE_SCHEMA
+from utils.kiosk_auth import ADMISSION_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+
+BASE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS apps (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, path TEXT NOT NULL, type TEXT NOT NULL CHECK(type IN ('game', 'app')), icon TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS launch_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, computer_name TEXT, ip_address TEXT, user TEXT, app_name TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, password_hash TEXT NOT NULL, balance INTEGER DEFAULT 0, time_left INTEGER DEFAULT 0)''',
+    '''CREATE TABLE IF NOT EXISTS computers (id INTEGER PRIMARY KEY AUTOINCREMENT, pc_name TEXT NOT NULL UNIQUE, ip_address TEXT, status TEXT DEFAULT 'Отключен', current_user TEXT, last_heartbeat DATETIME, time_remaining INTEGER DEFAULT 0, session_name TEXT, session_start_time DATETIME, session_end_time DATETIME, display_name TEXT )''',
+    '''CREATE TABLE IF NOT EXISTS transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, type TEXT NOT NULL CHECK(type IN ('kaspi_topup', 'package_purchase', 'admin_topup')), username TEXT, amount INTEGER NOT NULL, order_id TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS tariffs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        duration_text TEXT,
+        price_common INTEGER DEFAULT 0,
+        price_vip INTEGER DEFAULT 0,
+        schedule_text TEXT,
+        schedule_icons TEXT,
+        is_active BOOLEAN DEFAULT 0
+    )''',
+]
+
+
+def _dashboard_counters(conn):
+    if create_stats_schema(conn):
+        rebuild_stats(conn)
+
+
+HOT_PATH_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_launch_logs_timestamp ON launch_logs (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_launch_logs_app_name ON launch_logs (app_name)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_type_timestamp ON transactions (type, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_computers_current_user ON computers (current_user)",
+    "CREATE INDEX IF NOT EXISTS idx_computers_last_heartbeat ON computers (last_heartbeat)",
+]
+
+# (версия, описание, шаги). Шаг — SQL-строка или функция f(conn).
+# Новые миграции только добавляются в конец, примененные не редактируются.
+MIGRATIONS = [
+    (1, "Базовая схема", BASE_SCHEMA),
+    (2, "Счетчики дашборда", [_dashboard_counters]),
+    (3, "Индексы горячих запросов", HOT_PATH_INDEXES),
+    (4, "Журнал изменений каталога приложений", CATALOG_SCHEMA),
+    (5, "Теги приложений для поиска", ["ALTER TABLE apps ADD COLUMN tags TEXT"]),
+    (6, "Серверный учет времени сессий", LEDGER_SCHEMA),
+    (7, "Уникальный номер заказа в transactions", ORDER_SCHEMA),
+    (8, "Сводки запусков по часам и дням, архив журнала по месяцам", ARCHIVE_SCHEMA),
+    (9, "Примененные изменения из очереди киосков", OUTBOX_SCHEMA),
+    (10, "Время в приложениях по дням", PLAYTIME_SCHEMA),
+    (11, "Общее состояние процессов сервера: команды киоскам, счета Kaspi, попытки входа, сроки обслуживания",
+     KIOSK_ACTIONS_SCHEMA + INVOICE_SCHEMA + ADMISSION_SCHEMA + MAINTENANCE_SCHEMA),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(conn):
+    version = get_schema_version(conn)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def run_migrations(conn, backup_path=None):
+    """
+    Применяет все недостающие миграции. Если передан `backup_path` и база
+    уже содержит таблицы, перед первой миграцией снимается резервная копия.
+    Возвращает список примененных версий.
+    """
+    pending = pending_migrations(conn)
+    if not pending:
+        return []
+    if backup_path and conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]:
+        backup_database(conn, backup_path)
+        logger.info(f"Перед миграцией снята резервная копия базы: {backup_path}")
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for version, description, steps in pending:
+        conn.execute("SAVEPOINT migration")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.execute("RELEASE migration")
+        except Exception:
+            conn.execute("ROLLBACK TO migration")
+            conn.execute("RELEASE migration")
+            logger.error(f"Миграция {version} ({description}) не применена, база осталась в версии {get_schema_version(conn)}")
+            raise
+        logger.info(f"Применена миграция {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+def backup_database(conn, backup_path):
+    """Согласованная копия базы через sqlite backup API (безопасно при работающем WAL)."""
+    target = sqlite3.connect(backup_path)
+    try:
+        conn.backup(target)
+    finally:
+        target.close()
+
+
+# --- Проверка планов горячих запросов ---
+
+# (название, SQL, параметры). Запросы повторяют то, что выполняет server.py.
+HOT_QUERIES = [
+    ("Логи (/logs)",
+     """SELECT T1.ip_address, T1.user, T1.app_name, T1.timestamp,
+               COALESCE(T2.display_name, T1.computer_name) as computer_name_to_display
+        FROM launch_logs AS T1 LEFT JOIN computers AS T2 ON T1.computer_name = T2.pc_name
+        ORDER BY T1.timestamp DESC LIMIT ?""", (100,)),
+    ("Перенос журнала запусков в архив",
+     "SELECT id FROM launch_logs WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?", ("2000-01-01", 5000)),
+    ("Запуски по приложениям (дневная сводка)",
+     "SELECT app_name, launches FROM launch_daily_apps WHERE day >= ?", ("2000-01-01",)),
+    ("Запуски по ПК (дневная сводка)",
+     "SELECT computer_name, launches FROM launch_daily_pcs WHERE day >= ?", ("2000-01-01",)),
+    ("Почасовая сводка запусков (срок хранения)",
+     "DELETE FROM launch_hourly WHERE hour < ?", ("2000-01-01 00:00",)),
+    ("Выручка по типу за день",
+     "SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE timestamp >= ? AND type = 'package_purchase'", ("2000-01-01",)),
+    ("Активная сессия клиента (web_add_time, уведомления киоску)",
+     "SELECT id, pc_name FROM computers WHERE current_user = ?", ("user",)),
+    ("Включенные ПК",
+     "SELECT COUNT(id) FROM computers WHERE last_heartbeat > ?", ("2000-01-01",)),
+    ("Топ-игра дашборда",
+     "SELECT app_name, launches FROM app_launch_counts WHERE launches > 0 ORDER BY launches DESC LIMIT 1", ()),
+    ("Выручка дашборда",
+     "SELECT type, amount FROM daily_revenue WHERE day >= ?", ("2000-01-01",)),
+    ("Версия каталога (/api/apps)",
+     "SELECT COALESCE(MAX(version), 0) FROM app_changes", ()),
+    ("Изменения каталога (/api/apps?since=)",
+     "SELECT app_id FROM app_changes WHERE version > ? AND deleted = 1", (0,)),
+    ("Статус клиента",
+     "SELECT balance, time_left, session_deadline FROM users WHERE username = ?", ("user",)),
+    ("Идущие сессии (остановка зависших)",
+     "SELECT username, session_started_at, session_deadline FROM users WHERE session_deadline IS NOT NULL", ()),
+    ("Покупка пакета (условное списание)",
+     """UPDATE users SET balance = COALESCE(balance, 0) - ?, time_left = COALESCE(time_left, 0) + ?
+        WHERE username = ? AND COALESCE(balance, 0) >= ? RETURNING balance, time_left, session_deadline""", (100, 3600, "user", 100)),
+    ("Повтор вебхука оплаты",
+     "SELECT 1 FROM transactions WHERE order_id = ?", ("lovhub_user_0",)),
+    ("Пульсы ПК клиента",
+     "SELECT last_heartbeat FROM computers WHERE current_user = ?", ("user",)),
+    ("Очистка ключей очереди киосков",
+     "DELETE FROM kiosk_mutations WHERE applied_at < ?", (0,)),
+    ("Время в приложениях (дневная сводка)",
+     "SELECT app_name, seconds, runs FROM playtime_daily WHERE day >= ?", ("2000-01-01",)),
+    ("Команды киоску (каждая синхронизация)",
+     "SELECT 1 FROM kiosk_actions WHERE pc_name = ? LIMIT 1", ("PC-001",)),
+    ("Выдача команд киоску",
+     "DELETE FROM kiosk_actions WHERE pc_name = ? RETURNING id, action, created_at", ("PC-001",)),
+    ("Статус счета Kaspi (другой процесс)",
+     "SELECT status, payment_url, error FROM payment_invoices WHERE order_id = ?", ("lovhub_user_0",)),
+    ("Попытки входа за окно",
+     "SELECT COUNT(*), MIN(at) FROM login_attempts WHERE kind = ? AND key = ? AND at > ?", ("user", "user", 0)),
+    ("Очистка попыток входа",
+     "DELETE FROM login_attempts WHERE at <= ?", (0,)),
+]
+
+
+def explain(conn, sql, params=()):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """
+    Возвращает список проблем: запросы, план которых содержит полный
+    проход по таблице (SCAN без индекса) или сортировку во временном B-дереве.
+    """
+    problems = []
+    for name, sql, params in queries:
+        for detail in explain(conn, sql, params):
+            full_scan = detail.startswith("SCAN ") and "USING" not in detail
+            if full_scan or "TEMP B-TREE" in detail:
+                problems.append(f"{name}: {detail}")
+    return problems
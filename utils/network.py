@@ -1,11 +1,6 @@
 import socket
 import getpass
-import requests
-
-# 1. Используем https://
-# 2. Указываем IP-адрес сервера (не localhost)
-SERVER_URL = "https://192.168.1.101:5000/log_launch"
-# --------------------
+from utils.api_client import api_post, api_url
 
 def send_app_launch_info(app_name):
     info = {
@@ -16,11 +11,6 @@ def send_app_launch_info(app_name):
     }
     
     try:
-        requests.post(
-            SERVER_URL, 
-            json=info, 
-            timeout=2,
-            verify=False 
-        )
+        api_post("/log_launch", json=info)
     except Exception as e:
-        print(f"Ошибка отправки логов ({SERVER_URL}): {e}")
\ No newline at end of file
+        print(f"Ошибка отправки логов ({api_url('/log_launch')}): {e}")
\ No newline at end of file
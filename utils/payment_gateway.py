@@ -0,0 +1,226 @@
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+INVOICE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS payment_invoices (order_id TEXT PRIMARY KEY, status TEXT NOT NULL, payment_url TEXT, error TEXT, created_at INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_payment_invoices_created ON payment_invoices (created_at)",
+]
+
+
+class GatewayUnavailable(Exception):
+    """Шлюз сейчас не принимает счета: цепь разомкнута или очередь переполнена."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса.
+
+    После `threshold` сбоев подряд цепь размыкается, и запросы отклоняются
+    сразу, не дожидаясь таймаутов. Через `reset_after` секунд пропускается
+    один пробный запрос: успех замыкает цепь, сбой снова ее размыкает.
+    """
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_after or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0; self.opened_at = None; self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Платежный шлюз: {self.failures} сбоев подряд, цепь разомкнута на {self.reset_after:.0f} сек")
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class Invoice:
+    """Счет, ожидающий ответа шлюза. status: pending -> ready | failed."""
+
+    def __init__(self, order_id):
+        self.order_id = order_id
+        self.status = "pending"
+        self.payment_url = None
+        self.error = None
+        self.queued = False  # True — все потоки шлюза заняты, счет ждет своей очереди
+        self.created = time.monotonic()
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self
+
+    def _finish(self, status, payment_url=None, error=None):
+        self.payment_url = payment_url; self.error = error; self.status = status
+        self._done.set()
+
+
+class PaymentGateway:
+    """
+    Клиент платежного шлюза (создание счетов Kaspi) вне потоков Flask.
+
+    Запросы выполняет свой небольшой пул потоков с общей keep-alive сессией,
+    поэтому медленный шлюз занимает не больше `max_workers` потоков, а не все
+    потоки сервера, и пульсы/входы киосков не встают в очередь за оплатой.
+    submit() сразу возвращает Invoice, который маршрут может подождать недолго
+    (если для него нашелся свободный поток) или отдать киоску как "pending"
+    для опроса. Сетевые ошибки и ответы 5xx повторяются с экспоненциальной
+    задержкой; ответы 4xx не повторяются. Пока цепь предохранителя разомкнута,
+    новые счета отклоняются, а уже стоящие в очереди не ждут таймаутов.
+
+    Счета в памяти видит только этот процесс. Если передан `store(invoice)`,
+    он вызывается при создании и завершении счета — сервер пишет счет в
+    payment_invoices (save_invoice), и опрос статуса, пришедший в другой
+    процесс, читает его оттуда (load_invoice).
+    """
+
+    def __init__(self, url, max_workers=4, max_pending=32, timeout=(3, 10), retries=2, backoff=0.5,
+                 breaker=None, invoice_ttl=900, store=None):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.invoice_ttl = invoice_ttl
+        self.store = store
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="payment-gateway")
+        self._invoices = {}  # order_id -> Invoice
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, order_id, body, headers):
+        """Ставит создание счета в очередь. GatewayUnavailable — если шлюз сейчас недоступен."""
+        with self._lock:
+            self._forget_old()
+            invoice = self._invoices.get(order_id)
+            if invoice is not None:
+                return invoice
+            if self._pending >= self.max_pending:
+                raise GatewayUnavailable("Слишком много счетов в очереди к платежному шлюзу")
+            if not self.breaker.allow():
+                raise GatewayUnavailable("Платежный шлюз временно недоступен")
+            invoice = self._invoices[order_id] = Invoice(order_id)
+            invoice.queued = self._pending >= self.max_workers
+            self._pending += 1
+        self._store(invoice)
+        self._executor.submit(self._send, invoice, body, headers)
+        return invoice
+
+    def get(self, order_id):
+        """Счет из памяти этого процесса (счета других процессов — load_invoice)."""
+        with self._lock:
+            return self._invoices.get(order_id)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _send(self, invoice, body, headers):
+        answered = False  # шлюз ответил (< 500): дальнейшие ошибки — не сбой шлюза
+        try:
+            error = "цепь предохранителя разомкнута"
+            for attempt in range(self.retries + 1):
+                if self.breaker.state == "open":
+                    break
+                try:
+                    response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+                    if response.status_code < 500:
+                        self.breaker.success(); answered = True
+                        response.raise_for_status()
+                        payment_url = response.json().get('paymentUrl')
+                        if not payment_url:
+                            raise ValueError(f"шлюз не вернул paymentUrl: {response.text[:200]}")
+                        invoice._finish("ready", payment_url=payment_url)
+                        return
+                    error = f"HTTP {response.status_code}"
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = str(e)
+                self.breaker.failure()
+                if attempt < self.retries:
+                    time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            logger.error(f"Платежный шлюз: счет {invoice.order_id} не создан: {error}")
+            invoice._finish("failed", error=error)
+        except Exception as e:
+            # Непредвиденная ошибка до ответа шлюза — тоже сбой: иначе пробный запрос не освобождается и цепь не замыкается
+            if not answered: self.breaker.failure()
+            logger.error(f"Платежный шлюз: счет {invoice.order_id} не создан: {e}")
+            invoice._finish("failed", error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._store(invoice)
+
+    def _store(self, invoice):
+        if self.store is None:
+            return
+        try:
+            self.store(invoice)
+        except Exception as e:
+            logger.error(f"Платежный шлюз: счет {invoice.order_id} не сохранен: {e}")
+
+    def _forget_old(self):
+        deadline = time.monotonic() - self.invoice_ttl
+        for order_id in [o for o, inv in self._invoices.items() if inv.status != "pending" and inv.created < deadline]:
+            del self._invoices[order_id]
+
+
+def save_invoice(conn, invoice, now=None):
+    """Записывает состояние счета; завершенный счет не откатывается в "pending"."""
+    conn.execute(
+        """INSERT INTO payment_invoices (order_id, status, payment_url, error, created_at) VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT(order_id) DO UPDATE SET status = excluded.status, payment_url = excluded.payment_url, error = excluded.error
+           WHERE payment_invoices.status = 'pending'""",
+        (invoice.order_id, invoice.status, invoice.payment_url, invoice.error, int(now or time.time())))
+
+
+def load_invoice(conn, order_id):
+    """Счет, созданный любым процессом сервера, или None."""
+    row = conn.execute("SELECT status, payment_url, error FROM payment_invoices WHERE order_id = ?", (order_id,)).fetchone()
+    if row is None:
+        return None
+    invoice = Invoice(order_id)
+    if row[0] != "pending":
+        invoice._finish(row[0], payment_url=row[1], error=row[2])
+    return invoice
+
+
+def forget_old_invoices(conn, ttl, now=None):
+    return conn.execute("DELETE FROM payment_invoices WHERE created_at < ?", (int(now or time.time()) - ttl,)).rowcount
@@ -0,0 +1,156 @@
+"""
+Поисковый индекс каталога лаунчера.
+
+Все названия и теги приводятся к одной "латинской" форме: нижний регистр,
+ё -> е, кириллица -> транслит. Поэтому "дота" находит "Dota 2", а "tanki" —
+"Танки Онлайн". Запрос дополнительно проверяется в другой раскладке клавиатуры
+("ljnf" -> "дота"). Индекс хранит префиксы слов (поиск по мере набора) и
+триграммы (опечатки); ранжирование: точное слово > префикс названия > префикс
+тега > похожее слово по триграммам (только если слово запроса не нашлось
+ни целиком, ни как префикс — то есть при опечатке).
+"""
+import re
+from collections import Counter
+
+CYR_TO_LAT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'қ': 'k', 'ғ': 'g', 'ү': 'u', 'ұ': 'u', 'ң': 'n', 'ө': 'o', 'һ': 'h', 'ә': 'a', 'і': 'i',
+}
+
+# Одни и те же клавиши в раскладках QWERTY и ЙЦУКЕН
+_LAT_KEYS = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_CYR_KEYS = "йцукенгшщзхъфывапролджэячсмитьбюё"
+LAT_TO_CYR_LAYOUT = dict(zip(_LAT_KEYS, _CYR_KEYS))
+CYR_TO_LAT_LAYOUT = dict(zip(_CYR_KEYS, _LAT_KEYS))
+
+MAX_PREFIX = 20
+TRIGRAM_THRESHOLD = 0.4
+
+# Веса совпадений слова запроса
+SCORE_EXACT = 100
+SCORE_NAME_PREFIX = 60
+SCORE_TAG_PREFIX = 40
+SCORE_TRIGRAM = 25
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+
+def to_latin(text):
+    return "".join(CYR_TO_LAT.get(ch, ch) for ch in text.lower())
+
+
+def words(text):
+    return _WORD_RE.findall(to_latin(text or ""))
+
+
+def switch_layout(text):
+    """Текст, набранный не в той раскладке: "ljnf" -> "дота", "вщеф" -> "dota"."""
+    text = text.lower()
+    if any(ch in CYR_TO_LAT_LAYOUT for ch in text):
+        return "".join(CYR_TO_LAT_LAYOUT.get(ch, ch) for ch in text)
+    return "".join(LAT_TO_CYR_LAYOUT.get(ch, ch) for ch in text)
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, items=()):
+        self.build(items)
+
+    def build(self, items):
+        """Строит индекс по списку приложений (dict с id, name и необязательным tags)."""
+        self._order = {}       # id -> позиция в каталоге (для стабильной сортировки)
+        self._words = {}       # слово -> {id: лучший вес}
+        self._prefixes = {}    # префикс -> {id: лучший вес}
+        self._trigrams = {}    # триграмма -> множество слов
+        self._gram_counts = {} # слово -> число его триграмм
+        for position, item in enumerate(items):
+            self._order[item["id"]] = position
+            for word_weight, prefix_weight, text in ((SCORE_EXACT, SCORE_NAME_PREFIX, item.get("name")),
+                                                     (SCORE_EXACT, SCORE_TAG_PREFIX, ",".join(_split_tags(item.get("tags"))))):
+                for index, word in enumerate(words(text)):
+                    # Слова в начале названия весят чуть больше
+                    bonus = max(0, 5 - index)
+                    _keep_best(self._words.setdefault(word, {}), item["id"], word_weight + bonus)
+                    for length in range(1, min(len(word), MAX_PREFIX) + 1):
+                        _keep_best(self._prefixes.setdefault(word[:length], {}), item["id"], prefix_weight + bonus)
+                    if word not in self._gram_counts:
+                        grams = trigrams(word)
+                        self._gram_counts[word] = len(grams)
+                        for gram in grams:
+                            self._trigrams.setdefault(gram, set()).add(word)
+
+    def __len__(self):
+        return len(self._order)
+
+    def search(self, query, limit=None):
+        """Список id приложений по убыванию релевантности."""
+        best = {}
+        for variant in _query_variants(query):
+            for item_id, score in self._search_words(variant).items():
+                if score > best.get(item_id, 0):
+                    best[item_id] = score
+        ranked = sorted(best, key=lambda item_id: (-best[item_id], self._order[item_id]))
+        return ranked[:limit] if limit else ranked
+
+    def _search_words(self, query_words):
+        """Каждое слово запроса должно совпасть; вес документа — сумма весов слов."""
+        total = None
+        for word in query_words:
+            hits = dict(self._prefixes.get(word[:MAX_PREFIX], {}))
+            for item_id, score in self._words.get(word, {}).items():
+                if score > hits.get(item_id, 0):
+                    hits[item_id] = score
+            if not hits and len(word) >= 3:
+                for similar, similarity in self._similar_words(word):
+                    for item_id in self._words[similar]:
+                        score = int(SCORE_TRIGRAM * similarity)
+                        if score > hits.get(item_id, 0):
+                            hits[item_id] = score
+            if total is None:
+                total = hits
+            else:
+                total = {item_id: total[item_id] + score for item_id, score in hits.items() if item_id in total}
+            if not total:
+                return {}
+        return total or {}
+
+    def _similar_words(self, word):
+        grams = trigrams(word)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._trigrams.get(gram, ()))
+        # Минимум общих триграмм, при котором сходство Жаккара может достичь порога
+        min_shared = TRIGRAM_THRESHOLD * len(grams) / (1 + TRIGRAM_THRESHOLD)
+        result = []
+        for candidate, shared in counts.items():
+            if shared < min_shared:
+                continue
+            similarity = shared / (len(grams) + self._gram_counts[candidate] - shared)
+            if similarity >= TRIGRAM_THRESHOLD and candidate != word:
+                result.append((candidate, similarity))
+        return result
+
+
+def _split_tags(tags):
+    return [tag.strip() for tag in (tags or "").split(",") if tag.strip()]
+
+
+def _keep_best(scores, item_id, score):
+    if score > scores.get(item_id, 0):
+        scores[item_id] = score
+
+
+def _query_variants(query):
+    variants = []
+    for text in (query, switch_layout(query)):
+        query_words = words(text)
+        if query_words and query_words not in variants:
+            variants.append(query_words)
+    return variants
@@ -0,0 +1,171 @@
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+OFFLINE_AFTER_SEC = 60
+CLIENT_VERSION = "0.1221"
+
+KIOSK_ACTIONS_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS kiosk_actions (id INTEGER PRIMARY KEY AUTOINCREMENT, pc_name TEXT NOT NULL, action TEXT NOT NULL, created_at INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_kiosk_actions_pc ON kiosk_actions (pc_name, id)",
+    "CREATE INDEX IF NOT EXISTS idx_kiosk_actions_created ON kiosk_actions (created_at)",
+]
+
+
+def format_computer_row(pc, now):
+    """Готовит строку таблицы "Компьютеры" из записи computers (dict)."""
+    pc_data = dict(pc); last_beat = pc_data.get('last_heartbeat')
+    if not last_beat:
+        pc_data['status'] = "Неизвестно"; pc_data['status_class'] = "status-offline"; pc_data['current_user'] = "-"
+    else:
+        if isinstance(last_beat, str): last_beat = datetime.fromisoformat(last_beat)
+        if (now - last_beat).total_seconds() > OFFLINE_AFTER_SEC:
+            pc_data['status'] = "Отключен"; pc_data['status_class'] = "status-offline"; pc_data['current_user'] = "-"
+        else:
+            pc_data['status'] = "Используется" if pc_data['current_user'] else "Активен"
+            pc_data['status_class'] = "status-active"
+    pc_data['client'] = pc_data['current_user'] if pc_data['current_user'] else "-"
+    time_sec = pc_data.get('time_remaining')
+    if time_sec is not None and time_sec > 0:
+        hours = time_sec // 3600; mins = (time_sec % 3600) // 60
+        pc_data['remaining'] = f"{hours}ч {mins}м"
+    else:
+        pc_data['remaining'] = "-"
+    if pc_data['status'] != "Отключен" and pc_data.get('session_name') and pc_data.get('session_start_time') and pc_data.get('session_end_time'):
+        pc_data['session'] = pc_data['session_name']
+        pc_data['start'] = _hhmm(pc_data['session_start_time']); pc_data['end'] = _hhmm(pc_data['session_end_time'])
+    else:
+        pc_data['session'] = "-"; pc_data['start'] = "-"; pc_data['end'] = "-"
+    pc_data['name_to_display'] = pc_data['display_name'] or pc_data['pc_name']
+    pc_data['version'] = CLIENT_VERSION
+    # Сырые поля, меняющиеся с каждым пульсом, не нужны таблице и дали бы ложные дельты
+    for key in ('last_heartbeat', 'time_remaining', 'session_start_time', 'session_end_time'):
+        pc_data.pop(key, None)
+    return pc_data
+
+
+def _hhmm(value):
+    if isinstance(value, str): value = datetime.fromisoformat(value)
+    return value.strftime('%H:%M')
+
+
+class SeatBoard:
+    """
+    Состояние зала в памяти: отформатированные строки ПК по id и номер версии.
+
+    refresh() сравнивает свежие строки с текущими и, если что-то изменилось,
+    увеличивает версию и кладет дельту (измененные/удаленные ПК) в журнал.
+    Подписчики (SSE) ждут новых версий через wait_for_changes().
+
+    Версия имеет смысл только в этом процессе: наружу она уходит как
+    "<boot>-<версия>" (event_id), и номер чужого процесса (перезапуск сервера,
+    другой воркер) parse_event_id не принимает — клиент получает полный снимок.
+    Каждый процесс сервера перечитывает computers на каждом такте буфера пульсов,
+    поэтому доски процессов расходятся не больше чем на такт.
+    """
+
+    def __init__(self, history=256):
+        self.boot = secrets.token_hex(4)
+        self.version = 0
+        self._rows = {}
+        self._log = deque(maxlen=history)   # (version, changed_rows, removed_ids)
+        self._cond = threading.Condition()
+
+    def refresh(self, pcs, now=None):
+        now = now or datetime.now()
+        fresh = {}
+        for pc in pcs:
+            row = format_computer_row(pc, now)
+            fresh[row['id']] = row
+        with self._cond:
+            changed = [row for pc_id, row in fresh.items() if self._rows.get(pc_id) != row]
+            removed = [pc_id for pc_id in self._rows if pc_id not in fresh]
+            if not changed and not removed and self.version:
+                return []
+            self._rows = fresh
+            self.version += 1
+            self._log.append((self.version, changed, removed))
+            self._cond.notify_all()
+            return changed
+
+    def snapshot(self):
+        with self._cond:
+            rows = sorted(self._rows.values(), key=lambda r: r['pc_name'])
+            return self.version, rows
+
+    def event_id(self, version):
+        return f"{self.boot}-{version}"
+
+    def parse_event_id(self, value):
+        """Версия из event_id этого процесса или None (нет id, чужой процесс, мусор)."""
+        boot, _, version = (value or "").partition("-")
+        return int(version) if boot == self.boot and version.isdigit() else None
+
+    def changes_since(self, version):
+        """Дельта с версии `version`: (новая_версия, измененные, удаленные) или None, если журнал короче — нужен полный снимок."""
+        with self._cond:
+            return self._changes_since(version)
+
+    def _changes_since(self, version):
+        if version > self.version:
+            return None  # номер из будущего: доска пересоздана, нужен полный снимок
+        if version == self.version:
+            return self.version, [], []
+        if not self._log or self._log[0][0] > version + 1:
+            return None
+        changed = {}; removed = set()
+        for entry_version, rows, gone in self._log:
+            if entry_version <= version: continue
+            for row in rows:
+                changed[row['id']] = row; removed.discard(row['id'])
+            for pc_id in gone:
+                changed.pop(pc_id, None); removed.add(pc_id)
+        return self.version, list(changed.values()), sorted(removed)
+
+    def wait_for_changes(self, version, timeout):
+        """Блокирует до появления версии новее `version` (или до таймаута)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > version, timeout=timeout)
+            return self._changes_since(version)
+
+
+class KioskActions:
+    """
+    Команды администратора, ожидающие ближайшей синхронизации киоска (/api/kiosk/sync).
+
+    Очередь лежит в таблице kiosk_actions, а не в памяти: команду, положенную
+    одним процессом сервера, заберет синхронизация, пришедшая в любой другой.
+    push() пишет в транзакции, которая изменила баланс или время, поэтому
+    уведомление не уходит без самого изменения. Синхронизация сначала
+    проверяет очередь читателем (pending) и только при командах берет писатель
+    (take): take() отдает и удаляет команды — доставка не более одного раза.
+    Команды старше `ttl` секунд не доставляются (ПК мог быть выключен), у ПК
+    хранятся последние `limit` команд.
+    """
+
+    def __init__(self, limit=20, ttl=3600):
+        self.limit = limit
+        self.ttl = ttl
+
+    def push(self, conn, pc_name, action, now=None):
+        conn.execute("INSERT INTO kiosk_actions (pc_name, action, created_at) VALUES (?, ?, ?)",
+                     (pc_name, json.dumps(action, ensure_ascii=False), int(now or time.time())))
+        conn.execute("""DELETE FROM kiosk_actions WHERE pc_name = ? AND id NOT IN
+                          (SELECT id FROM kiosk_actions WHERE pc_name = ? ORDER BY id DESC LIMIT ?)""",
+                     (pc_name, pc_name, self.limit))
+
+    @staticmethod
+    def pending(conn, pc_name):
+        return conn.execute("SELECT 1 FROM kiosk_actions WHERE pc_name = ? LIMIT 1", (pc_name,)).fetchone() is not None
+
+    def take(self, conn, pc_name, now=None):
+        rows = conn.execute("DELETE FROM kiosk_actions WHERE pc_name = ? RETURNING id, action, created_at", (pc_name,)).fetchall()
+        fresh = int(now or time.time()) - self.ttl
+        return [json.loads(row[1]) for row in sorted(rows, key=lambda r: r[0]) if row[2] >= fresh]
+
+    def forget_old(self, conn, now=None):
+        """Удаляет недоставленные команды старше ttl."""
+        return conn.execute("DELETE FROM kiosk_actions WHERE created_at < ?", (int(now or time.time()) - self.ttl,)).rowcount
@@ -0,0 +1,119 @@
+"""
+Учет игрового времени клиентов на стороне сервера.
+
+Пока сессия не идет, users.time_left — остаток времени на счету. Когда клиент
+садится за ПК, сервер один раз записывает session_started_at и session_deadline
+(UNIX-время в секундах), и дальше остаток вычисляется при чтении как
+deadline - сейчас. Запись в базу бывает только при событиях: старт сессии,
+продление (покупка пакета, время от админа), пауза и окончание. Киоски больше
+не присылают свое значение времени на запись, поэтому добавленные админом
+минуты нельзя затереть устаревшим значением с клиента.
+
+Продление — одно UPDATE без предварительного чтения: оно прибавляет секунды
+и к time_left, и к session_deadline (у стоящей сессии deadline = NULL,
+NULL + x остается NULL), поэтому работает одинаково для идущей и стоящей сессии.
+"""
+import time
+from datetime import datetime
+
+LEDGER_SCHEMA = [
+    "ALTER TABLE users ADD COLUMN session_started_at INTEGER",
+    "ALTER TABLE users ADD COLUMN session_deadline INTEGER",
+    # Идущих сессий не больше, чем ПК в зале: частичный индекс для проверки "зависших"
+    "CREATE INDEX IF NOT EXISTS idx_users_session_deadline ON users (session_deadline) WHERE session_deadline IS NOT NULL",
+]
+
+
+def now_ts():
+    return int(time.time())
+
+
+def remaining(row, now=None):
+    """Остаток времени по строке users (нужны time_left и session_deadline)."""
+    deadline = row['session_deadline']
+    if deadline is None:
+        return row['time_left'] or 0
+    return max(0, deadline - (now or now_ts()))
+
+
+def read_account(conn, username, now=None):
+    """(баланс, остаток времени, идет_ли_сессия) или None, если клиента нет."""
+    row = conn.execute("SELECT balance, time_left, session_deadline FROM users WHERE username = ?", (username,)).fetchone()
+    if not row:
+        return None
+    return (row['balance'] or 0), remaining(row, now), row['session_deadline'] is not None
+
+
+def start_session(conn, username, now=None):
+    """Запускает отсчет, если сессия еще не идет и время есть. True — если сессия стартовала сейчас."""
+    now = now or now_ts()
+    cursor = conn.execute(
+        """UPDATE users SET session_started_at = ?, session_deadline = ? + time_left
+           WHERE username = ? AND session_deadline IS NULL AND time_left > 0""", (now, now, username))
+    return cursor.rowcount > 0
+
+
+def extend_session(conn, username, seconds):
+    """Добавляет время и к счету, и к идущей сессии. Возвращает новый остаток или None, если клиента нет."""
+    row = conn.execute(
+        """UPDATE users SET time_left = COALESCE(time_left, 0) + ?, session_deadline = session_deadline + ?
+           WHERE username = ? RETURNING time_left, session_deadline""", (seconds, seconds, username)).fetchone()
+    return remaining(row) if row else None
+
+
+def pause_session(conn, username, at=None):
+    """Останавливает отсчет на момент `at` (не раньше старта сессии): остаток возвращается на счет."""
+    at = at or now_ts()
+    cursor = conn.execute(
+        """UPDATE users SET time_left = MAX(0, session_deadline - MAX(?, COALESCE(session_started_at, 0))),
+                            session_started_at = NULL, session_deadline = NULL
+           WHERE username = ? AND session_deadline IS NOT NULL""", (at, username))
+    return cursor.rowcount > 0
+
+
+def consume_offline(conn, username, seconds):
+    """
+    Списывает время, сыгранное на киоске без связи (очередь киоска, utils/kiosk_store.py).
+    Пока связи не было, сервер остановил сессию на последнем пульсе, поэтому
+    списание идет только со стоящей сессии; если сессия еще идет (связь пропала
+    ненадолго), сервер это время уже посчитал. True — если время списано.
+    """
+    cursor = conn.execute(
+        """UPDATE users SET time_left = MAX(0, COALESCE(time_left, 0) - ?)
+           WHERE username = ? AND session_deadline IS NULL""", (seconds, username))
+    return cursor.rowcount > 0
+
+
+def stale_sessions(conn, offline_after, now=None):
+    """
+    Идущие сессии, которые пора остановить: [(username, момент_остановки)].
+    Сессия останавливается, если у клиента больше нет живого ПК (он вышел или
+    киоск не присылает пульс дольше offline_after секунд) — время списывается
+    до последнего пульса; закончившиеся сессии закрываются с нулевым остатком.
+    Только чтение: остановку делает pause_session() на соединении-писателе.
+    """
+    now = now or now_ts()
+    stale = []
+    running = conn.execute(
+        "SELECT username, session_started_at, session_deadline FROM users WHERE session_deadline IS NOT NULL").fetchall()
+    for row in running:
+        if row['session_deadline'] <= now:
+            stale.append((row['username'], now))
+            continue
+        if now - (row['session_started_at'] or 0) <= offline_after:
+            continue  # только что начатая сессия: пульс киоска мог еще не дойти до computers
+        seen = [_to_ts(pc['last_heartbeat']) for pc in conn.execute(
+            "SELECT last_heartbeat FROM computers WHERE current_user = ?", (row['username'],))]
+        seen = [ts for ts in seen if ts is not None]
+        last_seen = max(seen) if seen else None
+        if last_seen is None or now - last_seen > offline_after:
+            stale.append((row['username'], min(now, last_seen or now)))
+    return stale
+
+
+def _to_ts(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp())
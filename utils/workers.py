@@ -1,88 +1,98 @@
 # utils/workers.py
 from PyQt5.QtCore import QThread, pyqtSignal
 import requests
-import time
 import socket # <-- (НОВЫЙ ИМПОРТ)
+import time
+import secrets
+from utils.api_client import api_get, api_post, set_session_token
+from utils.kiosk_store import get_store
+
+PAYMENT_POLL_INTERVAL = 1.0   # сек между опросами статуса счета
+PAYMENT_POLL_TIMEOUT = 30.0   # сек, после которых киоск перестает ждать ссылку на оплату
 
 class LoadAppsWorker(QThread):
-    finished = pyqtSignal(list, list) 
+    """
+    Синхронизация каталога по версии: GET /api/apps?since=<версия> с If-None-Match.
+    finished(версия, измененные, удаленные_id, full) — только изменения;
+    not_modified() — каталог не менялся (304, без тела).
+    """
+    finished = pyqtSignal(int, list, list, bool)
+    not_modified = pyqtSignal()
     error = pyqtSignal(str)
-    def __init__(self):
+    def __init__(self, version=0):
         super().__init__()
-        self.url = "https://192.168.1.101:5000/api/apps"
+        self.version = version
     def run(self):
         try:
-            response = requests.get(self.url, timeout=5, verify=False)
+            headers = {"If-None-Match": f'"apps-{self.version}"'} if self.version else {}
+            response = api_get("/api/apps", params={"since": self.version}, headers=headers)
+            if response.status_code == 304:
+                self.not_modified.emit()
+                return
             response.raise_for_status() 
-            apps_list = response.json()
-            games = [app for app in apps_list if app.get("type") == "game"]
-            apps = [app for app in apps_list if app.get("type") == "app"]
-            self.finished.emit(games, apps)
+            data = response.json()
+            self.finished.emit(data["version"], data["changed"], data["removed"], data.get("full", False))
         except requests.exceptions.RequestException as e:
             self.error.emit(f"Ошибка загрузки приложений: {e}")
         except Exception as e:
             self.error.emit(f"Неизвестная ошибка в потоке: {e}")
 
-class StatusWorker(QThread):
-    finished = pyqtSignal(int, int)
-    error = pyqtSignal(str)
-    def __init__(self, username):
-        super().__init__()
-        self.username = username
-        self.url = "https://192.168.1.101:5000/api/get_user_status" 
-    def run(self):
-        try:
-            response = requests.get(
-                self.url, params={"username": self.username},
-                timeout=5, verify=False 
-            )
-            response.raise_for_status()
-            data = response.json()
-            if data.get("status") == "success":
-                balance = data.get("balance", 0)
-                time_left = data.get("time_left", 0)
-                self.finished.emit(balance, time_left)
-            else:
-                self.error.emit(data.get("message", "Неизвестная ошибка API"))
-        except requests.exceptions.RequestException as e:
-            self.error.emit(f"Ошибка сети (Status): {e}")
+def kiosk_sync(payload):
+    """Один обмен с сервером: пульс + локальное время -> баланс, время, версия каталога, команды."""
+    try:
+        response = api_post("/api/kiosk/sync", json=payload)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Ошибка сети (Sync): {e}") from e
+    data = response.json()
+    if data.get("status") != "success":
+        raise RuntimeError(data.get("message", "Неизвестная ошибка API"))
+    if data.get("token"):
+        set_session_token(data["token"])  # сервер продлил токен сессии
+    return data
 
-class SyncTimeWorker(QThread):
-    error = pyqtSignal(str)
-    def __init__(self, username, time_left):
-        super().__init__()
-        self.username = username
-        self.time_left = time_left
-        self.url = "https://192.168.1.101:5000/api/update_time" 
-    def run(self):
-        try:
-            payload = {"username": self.username, "time_left": self.time_left}
-            response = requests.post(self.url, json=payload, timeout=5, verify=False) 
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            self.error.emit(f"Ошибка синхронизации времени: {e}")
+def post_heartbeat(pc_name, status, user=None, time_left=None):
+    payload = {
+        "pc_name": pc_name, "status": status,
+        "user": user, "time_left": time_left
+    }
+    api_post("/api/heartbeat", json=payload)
 
 class BuyPackageWorker(QThread):
+    """
+    Покупка пакета с номером заказа киоска: если связь оборвалась, та же покупка
+    уходит в очередь изменений и будет проведена сервером один раз (queued).
+    """
     finished = pyqtSignal(int, int)
+    queued = pyqtSignal()
     error = pyqtSignal(str) 
     def __init__(self, username, seconds, price, package_name, pc_name):
         super().__init__()
         self.username = username; self.seconds = seconds; self.price = price
         self.package_name = package_name; self.pc_name = pc_name
-        self.url = "https://192.168.1.101:5000/api/buy_package"
+        self.order_id = f"kiosk_{get_store().get('store_id')}_{int(time.time())}_{secrets.token_hex(3)}"
     def run(self):
+        payload = {
+            "username": self.username, "seconds": self.seconds, "price": self.price,
+            "package_name": self.package_name, "pc_name": self.pc_name, "order_id": self.order_id
+        }
         try:
-            payload = {
-                "username": self.username, "seconds": self.seconds, "price": self.price,
-                "package_name": self.package_name, "pc_name": self.pc_name
-            }
-            response = requests.post(self.url, json=payload, timeout=5, verify=False)
+            response = api_post("/api/buy_package", json=payload)
             response.raise_for_status()
             data = response.json()
+            if data.get("token"):
+                set_session_token(data["token"])  # сервер продлил токен сессии
             if data.get("status") == "success":
                 self.finished.emit(data["new_balance"], data["new_time"])
             else:
                 self.error.emit(data.get("message", "Ошибка покупки на сервере"))
+        except requests.exceptions.ConnectionError:
+            store = get_store()
+            store.flush_offline_time(still_offline=True)
+            store.enqueue("purchase", {"user": self.username, "price": self.price, "seconds": self.seconds,
+                                       "package_name": self.package_name, "order_id": self.order_id,
+                                       "token": store.get("session_token")})
+            self.queued.emit()
         except requests.exceptions.RequestException as e:
             self.error.emit(f"Ошибка сети (Buy): {e}")
             
@@ -91,7 +101,6 @@ class AddAppWorker(QThread):
     error = pyqtSignal(str)
     def __init__(self, name, path, app_type, icon_filename, admin_user, admin_pass):
         super().__init__()
-        self.url = "https://192.168.1.101:5000/api/add_app" 
         self.payload = {
             "name": name, "path": path,
             "type": app_type, "icon": icon_filename
@@ -99,10 +108,7 @@ class AddAppWorker(QThread):
         self.auth_data = (admin_user, admin_pass)
     def run(self):
         try:
-            response = requests.post(
-                self.url, json=self.payload, timeout=5,
-                verify=False, auth=self.auth_data 
-            )
+            response = api_post("/api/add_app", json=self.payload, auth=self.auth_data)
             response.raise_for_status()
             data = response.json()
             if data.get("status") == "success":
@@ -118,17 +124,13 @@ class DeleteAppsWorker(QThread):
     def __init__(self, app_names_list, admin_user, admin_pass):
         super().__init__()
         self.app_names = app_names_list
-        self.url = "https://192.168.1.101:5000/api/delete_app" 
         self.auth_data = (admin_user, admin_pass)
     def run(self):
         deleted = []; failed = []
         try:
             for name in self.app_names:
                 payload = {"name": name}
-                response = requests.post(
-                    self.url, json=payload, timeout=3,
-                    verify=False, auth=self.auth_data
-                )
+                response = api_post("/api/delete_app", json=payload, auth=self.auth_data)
                 if response.status_code == 200 and response.json().get("status") == "success":
                     deleted.append(name)
                 else:
@@ -144,17 +146,17 @@ class TopUpBalanceWorker(QThread):
         super().__init__()
         self.username = username
         self.amount = amount
-        self.url = "https://192.168.1.101:5000/api/create_payment"
     def run(self):
         try:
             payload = {"username": self.username, "amount": self.amount}
-            response = requests.post(
-                self.url, 
-                json=payload, 
-                timeout=10, 
-                verify=False
-            ) 
-            response.raise_for_status()
+            response = api_post("/api/create_payment", json=payload)
+            # Если Kaspi отвечает медленно, сервер возвращает 202 "pending" — ссылку ждем опросом
+            deadline = time.monotonic() + PAYMENT_POLL_TIMEOUT
+            while response.status_code == 202 and time.monotonic() < deadline:
+                time.sleep(PAYMENT_POLL_INTERVAL)
+                response = api_get("/api/payment_status", params={"order_id": response.json().get("order_id")})
+            if response.status_code == 202:
+                self.error.emit("Kaspi не ответил вовремя, попробуйте еще раз"); return
             data = response.json()
             if data.get("status") == "success" and data.get("payment_url"):
                 self.finished.emit(data["payment_url"]) 
@@ -167,90 +169,52 @@ class HeartbeatWorker(QThread):
     error = pyqtSignal(str)
     def __init__(self, pc_name, status, user=None, time_left=None):
         super().__init__()
-        self.url = "https://192.168.1.101:5000/api/heartbeat"
-        self.payload = {
-            "pc_name": pc_name, "status": status,
-            "user": user, "time_left": time_left 
-        }
+        self.args = (pc_name, status, user, time_left)
     def run(self):
         try:
-            requests.post(
-                self.url, json=self.payload, timeout=5, verify=False 
-            )
+            post_heartbeat(*self.args)
         except requests.exceptions.RequestException as e:
             self.error.emit(f"Ошибка Heartbeat: {e}")
 
-class CoreTimerWorker(QThread):
-    tick = pyqtSignal(int)
-    time_up = pyqtSignal()
-    def __init__(self, initial_time_left):
-        super().__init__()
-        self.time_left = initial_time_left
-        self.running = True
-    def run(self):
-        while self.time_left > 0 and self.running:
-            time.sleep(1)
-            if not self.running: break 
-            self.time_left -= 1
-            self.tick.emit(self.time_left)
-        if self.running:
-            self.time_up.emit()
-    def stop(self):
-        self.running = False
-
-class HeartbeatLoopWorker(QThread):
-    trigger = pyqtSignal()
-    def __init__(self, interval_sec=15):
-        super().__init__()
-        self.interval = interval_sec
-        self.running = True
-    def run(self):
-        while self.running:
-            time.sleep(self.interval)
-            if self.running:
-                self.trigger.emit()
-    def stop(self):
-        self.running = False
-
-class SyncLoopWorker(QThread):
-    trigger = pyqtSignal()
-    def __init__(self, interval_sec=5):
-        super().__init__()
-        self.interval = interval_sec
-        self.running = True
-    def run(self):
-        while self.running:
-            time.sleep(self.interval)
-            if self.running:
-                self.trigger.emit()
-    def stop(self):
-        self.running = False
-
 # --- (НОВЫЙ КЛАСС ДЛЯ ЛОГОВ) ---
-class LogLaunchWorker(QThread):
-    """ (НОВЫЙ КЛАСС) Отправляет лог о запуске в фоне. """
-    error = pyqtSignal(str)
-    
-    def __init__(self, pc_name, user, app_name):
-        super().__init__()
-        self.url = "192.168.1.101:5000/log_launch"
-        self.payload = {
-            "computer_name": pc_name,
-            # (Мы получаем IP здесь, чтобы не "замораживать" GUI)
-            "ip_address": socket.gethostbyname(socket.gethostname()), 
-            "user": user,
-            "app_name": app_name
-        }
+_local_ip = None
 
-    def run(self):
+def local_ip():
+    """IP киоска для журнала запусков: определяется один раз и не в GUI-потоке."""
+    global _local_ip
+    if _local_ip is None:
         try:
-            requests.post(
-                self.url, 
-                json=self.payload, 
-                timeout=5, 
-                verify=False
-            )
-            # (Нам не важен ответ, главное - отправить)
-        except requests.exceptions.RequestException as e:
-            self.error.emit(f"Ошибка LogLaunch: {e}")
+            _local_ip = socket.gethostbyname(socket.gethostname())
+        except OSError:
+            _local_ip = ""
+    return _local_ip
+
+def replay_outbox(store, pc_name, limit=200):
+    """
+    Отправляет очередь изменений киоска (utils/kiosk_store.py) по порядку пачками.
+    Пачка убирается из очереди только после ответа сервера; отклоненное сервером
+    тоже убирается (повтор его не исправит). Возвращает число отправленных.
+    """
+    sent = 0
+    while True:
+        batch = store.pending(limit)
+        if not batch:
+            return sent
+        mutations = [dict(payload, id=mutation_id, kind=kind) for mutation_id, kind, payload in batch if isinstance(payload, dict)]
+        for mutation in mutations:
+            if mutation["kind"] == "launch":
+                mutation.setdefault("ip_address", local_ip() or None)
+        if mutations:
+            try:
+                response = api_post("/api/kiosk/outbox", json={"store_id": store.get("store_id"), "pc_name": pc_name,
+                                                               "mutations": mutations})
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                raise RuntimeError(f"Ошибка сети (Outbox): {e}") from e
+            for rejected in response.json().get("rejected", []):
+                print(f"Сервер отклонил изменение из очереди {rejected.get('id')}: {rejected.get('message')}")
+        store.ack(batch[-1][0])
+        sent += len(mutations)
+        if len(batch) < limit:
+            return sent
 # --- КОНЕЦ НОВОГО КЛАССА ---
\ No newline at end of file
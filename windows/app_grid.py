@@ -0,0 +1,219 @@
+# app_grid.py
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QScrollArea,
+                             QLabel, QPushButton)
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import Qt, QSize, pyqtSignal
+from utils.helpers import AnimatedButton
+from utils.icon_cache import get_icon_cache, rounded_pixmap
+import os
+
+ICON_FOLDER = "static/icons"
+DEFAULT_ICON = "static/icons/default_icon.png"
+MAX_COLUMNS = 4
+
+# Один стиль на всю сетку: плитки различаются динамическим свойством hasIcon,
+# поэтому при создании плитки таблица стилей не разбирается заново
+GRID_STYLE = """
+    QPushButton#AppTileButton {
+        color: white;
+        border: none; border-radius: 12px; font-size: 20px; text-align: center;
+        background: qlineargradient(x1: 0, y1: 0,x2: 0, y2: 1,stop:0 #EAA21B, stop:1 #212121);
+    }
+    QPushButton#AppTileButton[hasIcon="true"] { color: transparent; }
+    QPushButton#AppTileButton:hover { background-color: #EAA21B; }
+    QPushButton#AppTileCheck {
+        background-color: transparent;
+        border: 2px solid white;
+        border-radius: 4px;
+    }
+    QPushButton#AppTileCheck:checked {
+        background-color: transparent;
+        image: url(images/check_box.png);
+        border: 2px solid white;
+    }
+"""
+
+
+class TileIcons:
+    """Иконки плиток нужного размера; сами картинки берутся из общего IconCache (память + диск)."""
+    def __init__(self, width, height, radius=12, cache=None):
+        self.width = width; self.height = height; self.radius = radius
+        self.cache = cache or get_icon_cache()
+
+    def get(self, icon_filename):
+        """Возвращает (QIcon или None, есть_ли_своя_иконка)."""
+        icon_exists = bool(icon_filename) and os.path.exists(f"{ICON_FOLDER}/{icon_filename}")
+        icon_path = f"{ICON_FOLDER}/{icon_filename}" if icon_exists else DEFAULT_ICON
+        pixmap = self.cache.tile_pixmap(icon_path, self.width, self.height, self.radius)
+        return (QIcon(pixmap) if pixmap is not None else None), icon_exists
+
+
+class AppTile(QWidget):
+    """Плитка одного приложения. Создается один раз на id и обновляется на месте."""
+    launch_requested = pyqtSignal(str, str)
+    selection_toggled = pyqtSignal(str, bool)
+
+    def __init__(self, app, icons, width, height, parent=None):
+        super().__init__(parent)
+        self.app = {}
+        self.icons = icons
+        self.edit_mode = False
+        self.check_btn = None
+        layout = QGridLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        self.button = AnimatedButton()
+        self.button.setObjectName("AppTileButton")
+        self.button.setStyleSheet("")
+        self.button.setFixedSize(width, height)
+        self.button.clicked.connect(self.on_clicked)
+        layout.addWidget(self.button, 0, 0)
+        self.set_app(app)
+
+    def set_app(self, app):
+        """Применяет данные приложения. Возвращает True, если что-то поменялось."""
+        if app == self.app:
+            return False
+        if app.get("icon") != self.app.get("icon") or not self.app:
+            icon, icon_exists = self.icons.get(app.get("icon"))
+            if icon is not None:
+                self.button.setIcon(icon)
+                self.button.setIconSize(QSize(334, 447))
+            self.button.setProperty("hasIcon", icon_exists)
+            self.button.style().unpolish(self.button); self.button.style().polish(self.button)
+        self.app = dict(app)
+        return True
+
+    def set_edit_mode(self, edit_mode, checked=False):
+        self.edit_mode = edit_mode
+        if edit_mode and self.check_btn is None:
+            self.check_btn = QPushButton()
+            self.check_btn.setObjectName("AppTileCheck")
+            self.check_btn.setCheckable(True)
+            self.check_btn.setFixedSize(32, 32)
+            self.check_btn.setFocusPolicy(Qt.NoFocus)
+            self.check_btn.toggled.connect(lambda state: self.selection_toggled.emit(self.app["name"], state))
+            self.layout().addWidget(self.check_btn, 0, 0, Qt.AlignTop | Qt.AlignRight)
+        if self.check_btn is not None:
+            self.check_btn.blockSignals(True)
+            self.check_btn.setChecked(checked)
+            self.check_btn.blockSignals(False)
+            self.check_btn.setVisible(edit_mode)
+
+    def on_clicked(self):
+        if self.edit_mode and self.check_btn is not None:
+            self.check_btn.setChecked(not self.check_btn.isChecked())
+        else:
+            self.launch_requested.emit(self.app["name"], self.app["path"])
+
+
+class AppGrid(QWidget):
+    """
+    Страница-сетка плиток с ключом по id приложения.
+
+    set_items() создает плитки только для новых приложений, обновляет измененные
+    и удаляет исчезнувшие; filter() лишь показывает/скрывает уже созданные плитки.
+    Раскладка в QGridLayout пересобирается, только если изменился порядок видимых плиток.
+    """
+    launch_requested = pyqtSignal(str, str)
+    selection_toggled = pyqtSignal(str, bool)
+
+    def __init__(self, title, icons, tile_width, tile_height, parent=None):
+        super().__init__(parent)
+        self.icons = icons
+        self.tile_width = tile_width; self.tile_height = tile_height
+        self.tiles = {}          # id -> AppTile
+        self.order = []          # id в порядке каталога
+        self.visible_ids = None  # None — показываются все, иначе список id в нужном порядке
+        self._laid_out = []
+        self.edit_mode = False
+        self.selected = set()
+
+        page_layout = QVBoxLayout(self)
+        page_layout.setAlignment(Qt.AlignTop)
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setStyleSheet("""
+            QScrollArea { border: none; }
+            QScrollBar:vertical, QScrollBar:horizontal { width: 0px; height: 0px; background: transparent; }
+        """)
+        scroll_content = QWidget()
+        scroll_content.setStyleSheet(GRID_STYLE)
+        scroll_layout = QVBoxLayout(scroll_content)
+        scroll_layout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        title_label = QLabel(title)
+        title_label.setStyleSheet("font-size: 24px; font-weight: bold;")
+        title_label.setAlignment(Qt.AlignCenter)
+        scroll_layout.addWidget(title_label)
+        self.grid = QGridLayout()
+        self.grid.setContentsMargins(120, 30, 120, 0)
+        self.grid.setSpacing(100)
+        scroll_layout.addLayout(self.grid)
+        self.content = scroll_content
+        scroll_area.setWidget(scroll_content)
+        page_layout.addWidget(scroll_area)
+
+    def set_items(self, items):
+        """Синхронизирует плитки со списком приложений. Возвращает (создано, обновлено, удалено)."""
+        created = updated = removed = 0
+        fresh_ids = []
+        for app in items:
+            tile = self.tiles.get(app["id"])
+            if tile is None:
+                tile = AppTile(app, self.icons, self.tile_width, self.tile_height, self.content)
+                tile.launch_requested.connect(self.launch_requested)
+                tile.selection_toggled.connect(self._on_selection_toggled)
+                if self.edit_mode:
+                    tile.set_edit_mode(True, app["name"] in self.selected)
+                self.tiles[app["id"]] = tile
+                created += 1
+            elif tile.set_app(app):
+                updated += 1
+            fresh_ids.append(app["id"])
+        fresh = set(fresh_ids)
+        for app_id in [app_id for app_id in self.tiles if app_id not in fresh]:
+            tile = self.tiles.pop(app_id)
+            self.grid.removeWidget(tile)
+            tile.deleteLater()
+            removed += 1
+        self.order = fresh_ids
+        self._relayout()
+        return created, updated, removed
+
+    def filter(self, ids=None):
+        """Показывает только плитки с id из `ids` и в их порядке (None — все, в порядке каталога)."""
+        self.visible_ids = None if ids is None else list(ids)
+        self._relayout()
+
+    def set_edit_mode(self, edit_mode, selected=()):
+        self.edit_mode = edit_mode
+        self.selected = set(selected)
+        for tile in self.tiles.values():
+            if edit_mode or tile.check_btn is not None:
+                tile.set_edit_mode(edit_mode, tile.app["name"] in self.selected)
+
+    def _on_selection_toggled(self, name, checked):
+        if checked: self.selected.add(name)
+        else: self.selected.discard(name)
+        self.selection_toggled.emit(name, checked)
+
+    def _relayout(self):
+        if self.visible_ids is None:
+            shown = list(self.order)
+        else:
+            shown = [app_id for app_id in self.visible_ids if app_id in self.tiles]
+        if shown == self._laid_out:
+            return
+        for app_id in self._laid_out:
+            tile = self.tiles.get(app_id)
+            if tile is not None:
+                self.grid.removeWidget(tile)
+        shown_set = set(shown)
+        for app_id, tile in self.tiles.items():
+            if app_id not in shown_set:
+                tile.hide()
+        for index, app_id in enumerate(shown):
+            tile = self.tiles[app_id]
+            self.grid.addWidget(tile, index // MAX_COLUMNS, index % MAX_COLUMNS)
+            tile.show()
+        self._laid_out = shown
@@ -3,49 +3,44 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QStackedWidget, QScrollArea,
                              QLabel, QGridLayout, QMessageBox, QInputDialog, 
                              QLineEdit, QShortcut, QSizePolicy, QPushButton,
                              QGraphicsDropShadowEffect, QFrame,QCheckBox,QDialog)  
-from PyQt5.QtGui import QIcon, QPixmap, QPainter, QPainterPath, QKeySequence, QColor
+from PyQt5.QtGui import QIcon, QKeySequence, QColor
 from PyQt5.QtCore import Qt, QTimer, QSize,QRect,QPoint
 from theme.theme import load_stylesheet
 from core.app_launcher import AppLauncherThread
-from core.taskbar_worker import TaskbarWorker
+from core.window_tracker import WindowTracker, Win32HookBackend
+from core.process_monitor import get_process_monitor
+from core.launch_registry import LaunchRegistry
 from utils.win_tools import (hide_taskbar, kill_explorer, 
                              force_fullscreen_work_area, 
                              disable_task_manager, enable_task_manager)
 from utils.helpers import parse_steam_url_shortcut, parse_windows_shortcut, AnimatedButton
 from utils.dialogs import AddAppDialog
+from windows.app_grid import AppGrid, TileIcons
+from utils.search_index import SearchIndex
 
 # (ИЗМЕНЕНО) УДАЛЕН 'send_app_launch_info'
 # from utils.network import send_app_launch_info 
 
-# (ИЗМЕНЕНО) ДОБАВЛЕН 'LogLaunchWorker'
 from utils.workers import (LoadAppsWorker, AddAppWorker, DeleteAppsWorker, 
-                           HeartbeatWorker, CoreTimerWorker, HeartbeatLoopWorker,
-                           LogLaunchWorker) 
+                           replay_outbox, kiosk_sync) 
+from utils.kiosk_store import get_store
+from utils.api_client import set_session_token
+from core.session_clock import SessionClock, get_job_pool
 
 from utils.config_loader import get_admin_username, get_admin_password
 
+import glob
 import time
 import socket
+import sqlite3
 import win32gui
 import win32con
 import keyboard
-import psutil
 import os
 import subprocess
 
-
-def rounded_pixmap(pixmap, radius=12):
-    size = pixmap.size()
-    rounded = QPixmap(size)
-    rounded.fill(Qt.transparent)
-    painter = QPainter(rounded)
-    painter.setRenderHint(QPainter.Antialiasing)
-    path = QPainterPath()
-    path.addRoundedRect(0, 0, size.width(), size.height(), radius, radius)
-    painter.setClipPath(path)
-    painter.drawPixmap(0, 0, pixmap)
-    painter.end()
-    return rounded
+SEARCH_DEBOUNCE_MS = 150
+CUSTOM_TRAY_APPS = { "steam.exe": ("images/tray/steam_icon.png", lambda: print("Steam clicked")), }
 
 
 class MainWindow(QWidget):
@@ -71,7 +66,7 @@ class MainWindow(QWidget):
         self.current_theme = "dark"
         self.app.setStyleSheet(load_stylesheet(self.current_theme))
 
-        self.known_hwnds = []
+        self.taskbar_buttons = {}  # hwnd -> кнопка окна на панели задач
         hide_taskbar()
         force_fullscreen_work_area()
         disable_task_manager()
@@ -81,16 +76,26 @@ class MainWindow(QWidget):
 
         self.games = []
         self.tools = []
+        self.apps_by_id = {}       # каталог приложений по id (применяются только изменения с сервера)
+        self.search_index = SearchIndex()
+        self.catalog_version = 0   # версия каталога, на которой сейчас клиент
         self.admin_user = None
         self.admin_pass = None
         self.pc_name = socket.gethostname() 
         self.app_load_worker = None
         self.workers = []
         
-        self.core_timer = None 
-        self.heartbeat_loop = None 
+        # Один планировщик на клиент: время сессии, heartbeat и синхронизация
+        self.session_clock = SessionClock(parent=self)
+        self.session_clock.tick.connect(self.on_core_tick)
+        self.session_clock.warning.connect(self.on_core_warning)
+        self.session_clock.time_up.connect(self.on_core_time_up)
+        self.jobs = get_job_pool()
+        self.store = get_store()
+        if (self.store.get("offline_since") or {}).get("user") not in (None, username):
+            # Прошлый клиент играл без связи и не вышел штатно (сбой, перезагрузка): его время — в очередь
+            self.store.flush_offline_time()
         
-        self.running_procs = []
         self.filtered_games = self.games.copy()
         self.filtered_apps = self.tools.copy()
         self.settings_open = False
@@ -105,10 +110,10 @@ class MainWindow(QWidget):
         self.set_exit_hotkey()
         keyboard.add_hotkey('alt+shift', self.topbar.switch_language)
 
-        QTimer.singleShot(2000, self.taskbar_worker.start)
+        QTimer.singleShot(2000, self.window_tracker.start)
         self.reload_apps_from_db()
 
-        self.init_heartbeat_timer() 
+        self.init_sync_timer() 
 
     def closeEvent(self, event):
         event.ignore()
@@ -121,30 +126,49 @@ class MainWindow(QWidget):
         self.topbar = TopBar(self)
         main_layout.addWidget(self.topbar)
         self.stack = QStackedWidget()
-        self.stack.addWidget(QWidget())
-        self.stack.addWidget(QWidget())
+        # Плитки живут в сетках постоянно и переиспользуются между обновлениями и поиском
+        tile_width, tile_height = int(334 * self.scale_factor), int(447 * self.scale_factor)
+        self.tile_icons = TileIcons(tile_width, tile_height)
+        self.games_grid = AppGrid("Games", self.tile_icons, tile_width, tile_height)
+        self.apps_grid = AppGrid("Applications", self.tile_icons, tile_width, tile_height)
+        self.search_grid = AppGrid("Результаты поиска", self.tile_icons, tile_width, tile_height)
+        self.last_tab = 0
+        # Поиск запускается, когда пользователь на SEARCH_DEBOUNCE_MS перестал печатать
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.update_search_results)
+        for grid in (self.games_grid, self.apps_grid, self.search_grid):
+            grid.launch_requested.connect(self.run_app)
+            grid.selection_toggled.connect(self.on_app_selection_toggled)
+            self.stack.addWidget(grid)
         main_layout.addWidget(self.stack)
         self.stack.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.setLayout(main_layout)
         self.showFullScreen()
 
     def init_timers(self):
-        self.taskbar_worker = TaskbarWorker()
-        self.taskbar_worker.update_icons.connect(self.update_taskbar_icons)
-        self.tray_check_timer = QTimer()
-        self.tray_check_timer.timeout.connect(self.update_custom_tray_apps)
-        self.tray_check_timer.start(5000)
-        self.taskbar_timer = QTimer(self)
-        self.taskbar_timer.timeout.connect(self.taskbar_worker.start)
-        self.taskbar_timer.start(3000)
-        self.reload_timer = QTimer()
-        self.reload_timer.timeout.connect(self.reload_apps_from_db)
-        self.reload_timer.start(10000)
+        # Панель задач обновляется по событиям окон, а не опросом всех окон раз в 3 секунды
+        self.window_tracker = WindowTracker(Win32HookBackend(), parent=self)
+        self.window_tracker.window_created.connect(self.add_taskbar_button)
+        self.window_tracker.window_destroyed.connect(self.remove_taskbar_button)
+        self.window_tracker.title_changed.connect(self.retitle_taskbar_button)
+        # Значки трея — по событиям общего монитора процессов, а не обходом всех процессов раз в 5 секунд
+        self.process_monitor = get_process_monitor()
+        self.tray_buttons = {}  # exe -> (кнопка, pid запущенных экземпляров)
+        self.process_monitor.subscribe(
+            list(CUSTOM_TRAY_APPS), on_start=self.on_tray_app_started, on_exit=self.on_tray_app_exited)
+        # Деревья процессов запущенных приложений: закрытие по окончании времени и учет времени в приложениях
+        self.launch_registry = LaunchRegistry(self.process_monitor, parent=self)
+        self.launch_registry.app_finished.connect(self.on_app_finished)
+        self.launch_registry.teardown_finished.connect(self.on_apps_closed)
+        self.process_monitor.start()
 
     def handle_time_expired(self):
         print("Получен сигнал time_expired. Остановка таймеров.")
-        if self.core_timer: self.core_timer.stop()
-        if self.heartbeat_loop: self.heartbeat_loop.stop()
+        self.session_clock.shutdown()
+        self.window_tracker.stop()
+        self.process_monitor.stop()
             
         enable_task_manager()
         from utils.win_tools import show_taskbar, start_explorer
@@ -160,123 +184,40 @@ class MainWindow(QWidget):
             self.settings_window.close_with_animation()
             self.settings_open = False
         else:
-            self.settings_window.update_status_from_server()
+            self.sync_with_server()  # статус клиента приходит в ответе синхронизации
             button_pos = self.topbar.settings_btn.mapToGlobal(
                 self.topbar.settings_btn.rect().bottomRight())
             target_pos = button_pos - self.settings_window.rect().topRight()
             self.settings_window.show_with_animation(target_pos)
             self.settings_open = True
 
-    def create_page(self, items, title):
-        page_widget = QWidget()
-        page_layout = QVBoxLayout(page_widget)
-        page_layout.setAlignment(Qt.AlignTop)
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setStyleSheet(""" 
-            QScrollArea { border: none; }
-            QScrollBar:vertical, QScrollBar:horizontal { width: 0px; height: 0px; background: transparent; }
-        """)
-        scroll_content = QWidget()
-        scroll_layout = QVBoxLayout(scroll_content)
-        scroll_layout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        title_label = QLabel(title)
-        title_label.setStyleSheet("font-size: 24px; font-weight: bold;")
-        title_label.setAlignment(Qt.AlignCenter)
-        scroll_layout.addWidget(title_label)
-        apps_layout = QGridLayout()
-        apps_layout.setContentsMargins(120, 30, 120, 0)
-        apps_layout.setSpacing(100)
-        scroll_layout.addLayout(apps_layout)
-        row, col, max_columns = 0, 0, 4
-        if not items:
-             pass 
+    def on_app_selection_toggled(self, app_name, checked):
+        if checked:
+            self.selected_apps.add(app_name)
         else:
-            for app in items:
-                btn = AnimatedButton()
-                btn.setFixedSize(int(334 * self.scale_factor), int(447 * self.scale_factor))
-                container = QWidget()
-                container_layout = QGridLayout(container) 
-                container_layout.setContentsMargins(0, 0, 0, 0)
-                container_layout.setSpacing(0)
-                icon_filename = app.get('icon', None)
-                icon_exists = icon_filename and os.path.exists(f"static/icons/{icon_filename}")
-                icon_path = f"static/icons/{icon_filename}" if icon_exists else "static/icons/default_icon.png"
-                if os.path.exists(icon_path):
-                    pixmap = QPixmap(icon_path).scaled(int(334 * self.scale_factor), int(447 * self.scale_factor), Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
-                    rounded = rounded_pixmap(pixmap, 12)
-                    btn.setIcon(QIcon(rounded))
-                    btn.setIconSize(QSize(334, 447))
-                btn.setStyleSheet(f"""
-                    QPushButton {{
-                        color: {'transparent' if icon_exists else 'white'};
-                        border: none; border-radius: 12px; font-size: 20px; text-align: center;
-                        background: qlineargradient(x1: 0, y1: 0,x2: 0, y2: 1,stop:0 #EAA21B, stop:1 #212121);
-                    }}
-                    QPushButton:hover {{ background-color: #EAA21B; }}
-                """)
-                container_layout.addWidget(btn, 0, 0)
-                if self.edit_mode:
-                    check_btn = QPushButton()
-                    check_btn.setCheckable(True) 
-                    check_btn.setChecked(app["name"] in self.selected_apps)
-                    check_btn.setFixedSize(32, 32) 
-                    check_btn.setFocusPolicy(Qt.NoFocus) 
-                    check_btn.setStyleSheet("""
-                        QPushButton {
-                            background-color: transparent;
-                            border: 2px solid white; 
-                            border-radius: 4px;
-                        }
-                        QPushButton:checked {
-                            background-color: transparent;
-                            image: url(images/check_box.png); 
-                            border: 2px solid white; 
-                        }
-                    """)
-                    container_layout.addWidget(check_btn, 0, 0, Qt.AlignTop | Qt.AlignRight)
-                    def on_check_btn_toggled(checked, app_name=app["name"]):
-                        if checked:
-                            self.selected_apps.add(app_name)
-                        else:
-                            self.selected_apps.discard(app_name)
-                    check_btn.toggled.connect(on_check_btn_toggled)
-                    def on_button_clicked(check_button=check_btn):
-                        check_button.setChecked(not check_button.isChecked())
-                    btn.clicked.connect(on_button_clicked)
-                else:
-                    btn.clicked.connect(lambda _, n=app["name"], p=app["path"]: self.run_app(n, p))
-                apps_layout.addWidget(container, row, col)
-                col += 1
-                if col >= max_columns:
-                    col = 0
-                    row += 1
-        scroll_area.setWidget(scroll_content)
-        page_layout.addWidget(scroll_area)
-        return page_widget
-
-    def update_taskbar_icons(self, hwnd_title_icon_list):
-        hwnd_to_data = {hwnd: (title, icon) for hwnd, title, icon in hwnd_title_icon_list}
-        current_hwnds = list(hwnd_to_data.keys())
-        if not hasattr(self, "known_hwnds"):
-            self.known_hwnds = []
-        for hwnd in current_hwnds:
-            if hwnd not in self.known_hwnds:
-                self.known_hwnds.append(hwnd)
-        self.known_hwnds = [hwnd for hwnd in self.known_hwnds if hwnd in current_hwnds and win32gui.IsWindow(hwnd)]
-        for i in reversed(range(self.topbar.running_apps_container.count())):
-            widget = self.topbar.running_apps_container.itemAt(i).widget()
-            if widget: widget.deleteLater()
-        for hwnd in self.known_hwnds:
-            title, icon = hwnd_to_data[hwnd]
-            btn = QPushButton()
-            btn.setFixedSize(48, 48)
+            self.selected_apps.discard(app_name)
+
+    def add_taskbar_button(self, hwnd, title, icon):
+        btn = QPushButton()
+        btn.setFixedSize(48, 48)
+        btn.setToolTip(title)
+        btn.setIcon(icon)
+        btn.setIconSize(QSize(40, 40))
+        btn.setStyleSheet("QPushButton { background:none; border: none; border-radius: 4px; } QPushButton:hover { background-color: #666; }")
+        btn.clicked.connect(lambda _, hwnd=hwnd: self.focus_and_toggle(hwnd))
+        self.taskbar_buttons[hwnd] = btn
+        self.topbar.running_apps_container.addWidget(btn)
+
+    def remove_taskbar_button(self, hwnd):
+        btn = self.taskbar_buttons.pop(hwnd, None)
+        if btn:
+            self.topbar.running_apps_container.removeWidget(btn)
+            btn.deleteLater()
+
+    def retitle_taskbar_button(self, hwnd, title):
+        btn = self.taskbar_buttons.get(hwnd)
+        if btn:
             btn.setToolTip(title)
-            btn.setIcon(icon)
-            btn.setIconSize(QSize(40, 40))
-            btn.setStyleSheet("QPushButton { background:none; border: none; border-radius: 4px; } QPushButton:hover { background-color: #666; }")
-            btn.clicked.connect(lambda _, hwnd=hwnd: self.focus_and_toggle(hwnd))
-            self.topbar.running_apps_container.addWidget(btn)
 
     def open_add_app_dialog(self):
         if not hasattr(self, 'add_btn'):
@@ -340,19 +281,15 @@ class MainWindow(QWidget):
 
     def send_app_launch_info(self, app_name, username):
         """
-        (НОВАЯ ФУНКЦИЯ)
-        Отправляет лог о запуске на сервер, используя LogLaunchWorker.
+        Записывает запуск в очередь изменений киоска (без сети, GUI не ждет сервер).
         Использует правильный 'username', а не имя пользователя Windows.
+        На сервер очередь уходит перед синхронизацией — см. sync_exchange.
         """
         try:
-            worker = LogLaunchWorker(self.pc_name, username, app_name)
-            worker.error.connect(lambda e: print(f"LogLaunchWorker Error: {e}"))
-            
-            self.workers.append(worker)
-            worker.finished.connect(lambda: self.workers.remove(worker) if worker in self.workers else None)
-            worker.start()
-        except Exception as e:
-            print(f"Ошибка запуска LogLaunchWorker: {e}")
+            self.store.enqueue("launch", {"user": username, "app_name": app_name,
+                                          "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())})
+        except sqlite3.Error as e:
+            print(f"Не удалось записать запуск в очередь: {e}")
 
     def run_steam_game(self, name, steam_url):
         try:
@@ -360,20 +297,31 @@ class MainWindow(QWidget):
             time.sleep(3)
             if not self.check_if_game_running(name):
                 QMessageBox.warning(self, "Ошибка", "Игра не запустилась. Попробуйте еще раз.")
+                return
+            # Игру запустил Steam, а не лаунчер: в реестр попадает самый ранний процесс игры,
+            # чтобы по окончании времени она закрылась вместе с остальными запущенными приложениями
+            pid = min(self.process_monitor.processes(f"*{glob.escape(name)}*"), key=lambda proc: proc[3])[0]
+            self.on_app_launched(name, pid)
         except Exception as e:
             print(f"Ошибка запуска Steam: {e}")
 
     def check_if_game_running(self, name):
         try:
-            for proc in psutil.process_iter(['name']):
-                if name.lower() in proc.info['name'].lower():
-                    return True
-            return False
-        except: return False
+            self.process_monitor.poll()  # процессы, стартовавшие после последнего опроса монитора
+            return self.process_monitor.is_running(f"*{glob.escape(name)}*")
+        except Exception: return False
 
     def on_app_launched(self, name, pid):
-        self.running_procs.append((name, pid))
-        QTimer.singleShot(1500, self.taskbar_worker.start)
+        if not self.launch_registry.track(name, pid):
+            print(f"Приложение {name} (PID {pid}) завершилось сразу после запуска")
+
+    def on_app_finished(self, name, started, seconds):
+        """Время в приложении уходит на сервер через очередь киоска (дневная сводка playtime_daily)."""
+        try:
+            self.store.enqueue("app_runtime", {"user": self.username, "app_name": name, "seconds": seconds,
+                                               "started": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(started))})
+        except sqlite3.Error as e:
+            print(f"Не удалось записать время в приложении в очередь: {e}")
 
     def on_app_launch_error(self, message):
         QMessageBox.warning(self, "Ошибка запуска", f"Не удалось запустить приложение: {message}")
@@ -412,13 +360,12 @@ class MainWindow(QWidget):
             if self.admin_panel.isVisible():
                 self.admin_panel.hide()
                 self.edit_mode = False
-                self.selected_apps.clear()
-                self.reload_apps_from_db()
             else:
                 self.admin_panel.show()
                 self.edit_mode = True
-                self.selected_apps.clear()
-                self.reload_apps_from_db()
+            self.selected_apps.clear()
+            for grid in (self.games_grid, self.apps_grid, self.search_grid):
+                grid.set_edit_mode(self.edit_mode)
         else:  
             QMessageBox.warning(self, "Ошибка", "Неверный пароль!")
 
@@ -479,8 +426,20 @@ class MainWindow(QWidget):
 
     def clean_exit(self):
         print("Админ-выход. Остановка таймеров.")
-        if self.core_timer: self.core_timer.stop()
-        if self.heartbeat_loop: self.heartbeat_loop.stop()
+        self.session_clock.shutdown()
+        self.window_tracker.stop()
+        self.process_monitor.stop()
+        self.launch_registry.close()
+        payload = self.sync_payload(event="pause")
+        try:
+            # Остановить отсчет на сервере сразу, не дожидаясь, пока ПК сочтут отключенным
+            kiosk_sync(payload)
+            if payload.get("offline"): self.store.clear_offline(payload["offline"]["since"])
+        except Exception as e:
+            print(f"Не удалось остановить сессию на сервере: {e}")
+            # Время без связи спишется, когда очередь киоска дойдет до сервера
+            self.store.flush_offline_time()
+        set_session_token(None)
             
         enable_task_manager()
         from utils.win_tools import show_taskbar, start_explorer
@@ -489,21 +448,25 @@ class MainWindow(QWidget):
         self.app.quit()
 
     def switch_tab(self, index):
+        self.last_tab = index
         if self.stack.currentIndex() != index:
             self.stack.setCurrentIndex(index)
 
+    def on_search_text_changed(self, text):
+        if text.strip():
+            self.search_timer.start()
+        else:
+            self.search_timer.stop()
+            self.update_search_results()
+
     def update_search_results(self):
-        search_text = self.topbar.search_input.text().lower()
+        search_text = self.topbar.search_input.text().strip()
         if not search_text:
-            if self.stack.count() == 3:
-                self.stack.removeWidget(self.stack.widget(2))
+            if self.stack.currentIndex() == 2:
+                self.stack.setCurrentIndex(self.last_tab)
             return
-        combined = self.games + self.tools
-        filtered = [item for item in combined if search_text in item['name'].lower()]
-        search_page = self.create_page(filtered, "Результаты поиска")
-        if self.stack.count() == 3:
-            self.stack.removeWidget(self.stack.widget(2))
-        self.stack.addWidget(search_page)
+        self.search_grid.set_items(self.games + self.tools)
+        self.search_grid.filter(self.search_index.search(search_text))
         self.stack.setCurrentIndex(2)
 
     def toggle_theme(self):
@@ -530,6 +493,8 @@ class MainWindow(QWidget):
         else:
             QMessageBox.information(self, "Успех", f"Успешно удалено {len(deleted_list)} приложений.")
         self.selected_apps.clear()
+        for grid in (self.games_grid, self.apps_grid, self.search_grid):
+            grid.set_edit_mode(self.edit_mode)
         self.reload_apps_from_db()
 
     def on_apps_delete_error(self, error_message):
@@ -537,34 +502,39 @@ class MainWindow(QWidget):
         QMessageBox.warning(self, "Ошибка", f"Не удалось удалить приложения:\n{error_message}")
 
     def reload_apps_from_db(self):
-        print("Запрос на обновление приложений... (запуск worker)")
         if self.app_load_worker and self.app_load_worker.isRunning():
             print("Worker все еще занят, пропускаем.")
             return 
-        self.app_load_worker = LoadAppsWorker()
+        self.app_load_worker = LoadAppsWorker(self.catalog_version)
         self.app_load_worker.finished.connect(self.on_apps_loaded)
+        self.app_load_worker.not_modified.connect(self.on_apps_not_modified)
         self.app_load_worker.error.connect(self.on_apps_load_error)
         self.app_load_worker.start()
 
-    def on_apps_loaded(self, games, apps):
-        print("Приложения успешно загружены!")
-        current_index = self.stack.currentIndex()
-        is_search_active = (current_index == 2)
-        self.games = games; self.tools = apps
+    def on_apps_not_modified(self):
+        self.app_load_worker = None
+
+    def on_apps_loaded(self, version, changed, removed, full):
+        """Применяет изменения каталога; сетки трогают только добавленные/измененные/удаленные плитки."""
+        if full:
+            self.apps_by_id = {}
+        for app in changed:
+            self.apps_by_id[app["id"]] = app
+        for app_id in removed:
+            self.apps_by_id.pop(app_id, None)
+        self.catalog_version = version
+        print(f"Каталог приложений: версия {version}, изменено {len(changed)}, удалено {len(removed)}")
+        ordered = [self.apps_by_id[app_id] for app_id in sorted(self.apps_by_id)]
+        self.games = [app for app in ordered if app.get("type") == "game"]
+        self.tools = [app for app in ordered if app.get("type") == "app"]
         self.filtered_games = self.games.copy(); self.filtered_apps = self.tools.copy()
-        while self.stack.count() > 0:
-            widget = self.stack.widget(0)
-            self.stack.removeWidget(widget)
-            widget.deleteLater()
-        self.stack.addWidget(self.create_page(self.games, "Games"))
-        self.stack.addWidget(self.create_page(self.tools, "Applications"))
-        if is_search_active:
+        self.search_index.build(self.games + self.tools)
+        self.games_grid.set_items(self.games)
+        self.apps_grid.set_items(self.tools)
+        if self.search_grid.tiles:  # сетка поиска заполняется при первом поиске
+            self.search_grid.set_items(self.games + self.tools)
+        if self.stack.currentIndex() == 2:
             self.update_search_results()
-            self.stack.setCurrentIndex(2)
-        elif current_index < self.stack.count():
-            self.stack.setCurrentIndex(current_index)
-        else:
-            self.stack.setCurrentIndex(0)
         self.app_load_worker = None
 
     def on_apps_load_error(self, error_message):
@@ -572,46 +542,41 @@ class MainWindow(QWidget):
         QMessageBox.warning(self, "Ошибка сети", f"Не удалось обновить список приложений:\n{error_message}")
         self.app_load_worker = None
     
-    def update_custom_tray_apps(self):
-        known_tray_apps = { "steam.exe": ("images/tray/steam_icon.png", lambda: print("Steam clicked")), }
-        running = [p.name().lower() for p in psutil.process_iter()]
-        self.topbar.clear_custom_tray()
-        for exe_name, (icon_path, callback) in known_tray_apps.items():
-            if exe_name in running:
-                self.topbar.add_tray_icon(icon_path, exe_name.replace(".exe", "").capitalize(), callback)
+    def on_tray_app_started(self, pid, name):
+        exe_name = name.lower()
+        if exe_name not in self.tray_buttons:
+            icon_path, callback = CUSTOM_TRAY_APPS[exe_name]
+            self.tray_buttons[exe_name] = (self.topbar.add_tray_icon(icon_path, exe_name.replace(".exe", "").capitalize(), callback), set())
+        self.tray_buttons[exe_name][1].add(pid)
+
+    def on_tray_app_exited(self, pid, name):
+        button, pids = self.tray_buttons.get(name.lower(), (None, set()))
+        pids.discard(pid)
+        if button is not None and not pids:
+            self.topbar.remove_tray_icon(button)
+            del self.tray_buttons[name.lower()]
 
     # --- УПРАВЛЕНИЕ ГЛАВНЫМИ ТАЙМЕРАМИ ---
     
     def start_core_timer(self, initial_time_left):
-        if self.core_timer and self.core_timer.isRunning():
-            self.core_timer.stop()
-            self.core_timer.wait() 
-            
         if initial_time_left <= 0:
             print("CoreTimer: Не запускаем, время 0.")
+            self.session_clock.stop()
             self.settings_window.time_left_seconds = 0
             self.settings_window.time_label.setText("Время вышло")
             return
 
         print(f"Запуск CoreTimer с {initial_time_left} секундами.")
-            
-        self.core_timer = CoreTimerWorker(initial_time_left)
-        self.core_timer.tick.connect(self.on_core_tick)
-        self.core_timer.time_up.connect(self.on_core_time_up)
-        
-        self.workers.append(self.core_timer)
-        self.core_timer.finished.connect(lambda: self.workers.remove(self.core_timer) if self.core_timer in self.workers else None)
-        
-        self.core_timer.start()
+        self.session_clock.start(initial_time_left)
 
     def on_core_tick(self, time_left):
         self.settings_window.time_left_seconds = time_left
         self.settings_window.time_label.setText(
             self.settings_window.seconds_to_time_str(time_left)
         )
-        
-        if time_left == 300: 
-            self.settings_window.show_time_warning("Осталось 5 минут!")
+
+    def on_core_warning(self, time_left):
+        self.settings_window.show_time_warning("Осталось 5 минут!")
 
     def on_core_time_up(self):
         print("CoreTimer: Время вышло!")
@@ -619,43 +584,63 @@ class MainWindow(QWidget):
         self.settings_window.time_left_seconds = 0 
         
         self.settings_window.time_label.setText("Время вышло")
-        self.settings_window.kill_disallowed_apps()
+        # Ожидание штатного закрытия ведет таймер реестра: окно не замирает, сессия завершается по сигналу
+        self.launch_registry.start_teardown()
+
+    def on_apps_closed(self, report):
+        print(f"Запущенные приложения закрыты за {report['ms']:.0f} мс: штатно {report['terminated']}, принудительно {report['killed']}")
         self.settings_window.time_expired.emit()
     
     
-    def init_heartbeat_timer(self):
-        self.heartbeat_loop = HeartbeatLoopWorker(15) # 15 секунд
-        self.heartbeat_loop.trigger.connect(self.send_heartbeat)
-        
-        self.workers.append(self.heartbeat_loop)
-        self.heartbeat_loop.finished.connect(lambda: self.workers.remove(self.heartbeat_loop) if self.heartbeat_loop in self.workers else None)
-        
-        self.heartbeat_loop.start()
-        print("Надежный HeartbeatLoopWorker запущен.")
-        
-        QTimer.singleShot(1000, self.send_heartbeat) 
-
-    def send_heartbeat(self):
-        try:
-            time_left = 0
-            if self.core_timer and self.core_timer.isRunning():
-                time_left = self.core_timer.time_left 
-            else:
-                time_left = self.settings_window.time_left_seconds
-
-            if time_left > 0:
-                status = "Используется"
-                user = self.username
-            else:
-                status = "Активен" 
-                user = None
-            
-            worker = HeartbeatWorker(self.pc_name, status, user, time_left)
-            worker.error.connect(lambda e: print(f"Main Heartbeat Error: {e}"))
-
-            self.workers.append(worker)
-            worker.finished.connect(lambda: self.workers.remove(worker) if worker in self.workers else None)
-            
-            worker.start()
-        except Exception as e:
-            print(f"Ошибка запуска HeartbeatWorker (main): {e}")
\ No newline at end of file
+    def init_sync_timer(self):
+        # Пульс, время, баланс, версия каталога и команды админа — один запрос раз в 5 секунд
+        self.session_clock.every("sync", 5, self.sync_with_server, first_in=1)
+        print("Синхронизация с сервером (5 сек) запланирована.")
+
+    def sync_payload(self, event=None):
+        time_left = self.session_clock.remaining() if self.session_clock.is_running() else None
+        # Остаток считает сервер (utils/session_ledger.py); время киоска нужно только для пульса
+        payload = {
+            "pc_name": self.pc_name, "status": "Используется" if time_left else "Активен",
+            "user": self.settings_window.username, "time_left": time_left, "event": event,
+        }
+        offline = self.store.offline_report(payload["user"])
+        if offline:
+            payload["offline"] = offline  # сыгранное без связи сервер спишет до того, как снова запустит сессию
+        return payload
+
+    def sync_with_server(self):
+        # Медленный сервер: пока идет прошлый обмен, новый не отправляется
+        if self.jobs.is_busy("kiosk_sync"):
+            return
+        payload = self.sync_payload()
+        self.jobs.submit("kiosk_sync", lambda: self.sync_exchange(payload),
+                         on_done=lambda data: self.on_kiosk_synced(payload, data),
+                         on_error=self.on_kiosk_sync_error)
+
+    def sync_exchange(self, payload):
+        """Фоновый поток: сначала очередь изменений (запуски, покупки без связи) по порядку, затем синхронизация."""
+        if self.store.outbox_size():
+            try:
+                replay_outbox(self.store, self.pc_name)
+            except RuntimeError as e:
+                print(f"Очередь изменений не отправлена (повтор позже): {e}")
+        return kiosk_sync(payload)
+
+    def on_kiosk_sync_error(self, error):
+        # Время дальше идет без сервера: момент потери связи записывается один раз
+        self.store.mark_offline(self.settings_window.username)
+        self.settings_window.on_status_error(error)
+
+    def on_kiosk_synced(self, payload, data):
+        if payload.get("offline"):
+            self.store.clear_offline(payload["offline"]["since"])
+        if payload["user"]:
+            self.settings_window.on_status_loaded(data.get("balance", 0), data.get("time_left", 0))
+        if data.get("catalog_version", self.catalog_version) != self.catalog_version:
+            self.reload_apps_from_db()
+        for action in data.get("actions", []):
+            if action.get("type") == "notify":
+                box = QMessageBox(QMessageBox.Information, "Сообщение администратора", action.get("text", ""), parent=self)
+                box.setAttribute(Qt.WA_DeleteOnClose)
+                box.show()
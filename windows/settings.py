@@ -1,8 +1,7 @@
-import psutil
 import getpass
 import os
-import json
 import socket
+import sqlite3
 import webbrowser 
 from PyQt5.QtWidgets import (QGraphicsDropShadowEffect, QDialog, QLineEdit, 
                              QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -12,8 +11,8 @@ from PyQt5.QtCore import Qt, QPropertyAnimation, QRect, QEvent, QSize, QTimer, p
 from utils.helpers import AnimatedButton
 from datetime import timedelta
 
-from utils.workers import (StatusWorker, SyncTimeWorker, BuyPackageWorker, 
-                           TopUpBalanceWorker, SyncLoopWorker) 
+from utils.workers import BuyPackageWorker, TopUpBalanceWorker
+from utils.kiosk_store import get_store
 
 
 CACHE_DIR = "cache"
@@ -47,9 +46,9 @@ class SettingsWindow(QWidget):
         hi_label = QLabel("Hi!")
         hi_label.setStyleSheet("font-size: 44px; margin-left:114px; margin-top: 20px; background:none;")
 
+        self.store = get_store()
         username = self.get_logged_in_username()
         self.username = username
-        self.user_cache_file = os.path.join(CACHE_DIR, f"{self.username}.json") if self.username else ""
         self.pc_name = socket.gethostname() 
 
         self.time_left_seconds = 0 
@@ -132,32 +131,18 @@ class SettingsWindow(QWidget):
         self.is_closing = False
         self.installEventFilter(self)
 
-        self.sync_loop_worker = None 
-        
-        if username:
-            self.start_timers()
-            self.update_status_from_server() 
-
     def load_from_cache(self):
-        if not self.user_cache_file: return
-        try:
-            if os.path.exists(self.user_cache_file):
-                with open(self.user_cache_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.balance = data.get('balance', 0)
-                    self.time_left_seconds = data.get('time_left', 0)
-                print(f"Settings: Загружено из кэша: {self.balance} тг, {self.time_left_seconds} сек")
-            else:
-                print("Settings: Файл кэша не найден.")
-        except Exception as e:
-            print(f"Settings: Ошибка загрузки кэша: {e}")
+        if not self.username: return
+        self.balance, self.time_left_seconds = self.store.account(self.username)
+        print(f"Settings: Загружено из кэша: {self.balance} тг, {self.time_left_seconds} сек")
 
     def save_to_cache(self, balance, time_left):
-        if not self.user_cache_file: return
+        # Хранилище пишет на диск только изменения: при идущей сессии — не чаще, чем сдвигается дедлайн
+        if not self.username: return
+        running = bool(self.parent()) and self.parent().session_clock.is_running()
         try:
-            with open(self.user_cache_file, 'w', encoding='utf-8') as f:
-                json.dump({'balance': balance, 'time_left': time_left}, f)
-        except Exception as e:
+            self.store.save_account(self.username, balance, time_left, running)
+        except sqlite3.Error as e:
             print(f"Settings: Ошибка сохранения кэша: {e}")
 
     def show_topup_dialog(self, event):
@@ -248,8 +233,10 @@ class SettingsWindow(QWidget):
         self.set_package_buttons_enabled(False)
         worker = BuyPackageWorker(self.username, seconds, price, package_name, self.pc_name)
         worker.finished.connect(self.on_package_bought); worker.error.connect(self.on_package_buy_error)
+        worker.queued.connect(lambda: self.on_package_queued(seconds, price))
         self.workers.append(worker)
         worker.finished.connect(lambda: self.workers.remove(worker) if worker in self.workers else None)
+        worker.queued.connect(lambda: self.workers.remove(worker) if worker in self.workers else None)
         worker.start()
 
     def on_package_bought(self, new_balance, new_time):
@@ -264,48 +251,30 @@ class SettingsWindow(QWidget):
         self.set_package_buttons_enabled(True)
         self.save_to_cache(self.balance, new_time) 
 
+    def on_package_queued(self, seconds, price):
+        """Сервер недоступен: покупка ждет в очереди, время начисляется сразу по балансу из кэша."""
+        print(f"Settings: Пакет куплен без связи ({seconds} сек), покупка уйдет на сервер при восстановлении связи")
+        self.balance -= price
+        self.balance_label.setText(f"{self.balance} тг")
+        new_time = self.time_left_seconds + seconds
+        if self.parent():
+            self.parent().start_core_timer(new_time)
+        QMessageBox.information(self, "Нет связи с сервером",
+            "Пакет времени начислен. Покупка будет проведена, когда связь с сервером восстановится.")
+        self.set_package_buttons_enabled(True)
+        self.save_to_cache(self.balance, new_time)
+
     def on_package_buy_error(self, error_message):
         QMessageBox.warning(self, "Ошибка", f"Не удалось купить пакет:\n{error_message}")
         self.set_package_buttons_enabled(True)
-        self.sync_with_database()
+        if self.parent():
+            self.parent().sync_with_server()
 
     def set_package_buttons_enabled(self, enabled):
         for btn in self.all_pkg_buttons:
             btn.setEnabled(enabled)
             btn.setStyleSheet(btn.styleSheet() + f" opacity: {1.0 if enabled else 0.5};")
 
-    def start_timers(self):
-        if not self.sync_loop_worker:
-            self.sync_loop_worker = SyncLoopWorker(5) # (5 секунд)
-            self.sync_loop_worker.trigger.connect(self.sync_with_database)
-            
-            self.workers.append(self.sync_loop_worker)
-            self.sync_loop_worker.finished.connect(lambda: self.workers.remove(self.sync_loop_worker) if self.sync_loop_worker in self.workers else None)
-
-            self.sync_loop_worker.start()
-            print("Settings: Надежный SyncLoopWorker (5 сек) запущен.")
-        
-    def sync_with_database(self):
-        self.update_status_from_server() 
-        try:
-            current_time = self.time_left_seconds 
-            worker = SyncTimeWorker(self.username, current_time)
-            worker.error.connect(lambda e: print(f"Settings: Ошибка фоновой синхронизации: {e}"))
-            self.workers.append(worker)
-            worker.finished.connect(lambda: self.workers.remove(worker) if worker in self.workers else None)
-            worker.start()
-        except Exception as e:
-            print(f"Settings: Ошибка запуска SyncTimeWorker: {e}")
-
-    def update_status_from_server(self):
-        if not self.username: return
-        worker = StatusWorker(self.username)
-        worker.finished.connect(self.on_status_loaded)
-        worker.error.connect(self.on_status_error)
-        self.workers.append(worker)
-        worker.finished.connect(lambda: self.workers.remove(worker) if worker in self.workers else None)
-        worker.start()
-
     def on_status_loaded(self, balance, time_left):
         print(f"Settings: Синхронизация с сервером: Баланс={balance}, Время={time_left}")
         self.balance = balance
@@ -316,15 +285,14 @@ class SettingsWindow(QWidget):
              self.time_label.setText(self.seconds_to_time_str(time_left)) 
              return
 
-        current_local_time = 0
-        if self.parent().core_timer and self.parent().core_timer.isRunning():
-            current_local_time = self.parent().core_timer.time_left
+        clock = self.parent().session_clock
+        current_local_time = clock.remaining()
         
         if abs(current_local_time - time_left) > 5:
             print(f"Settings: Расхождение времени (Лок: {current_local_time} / Серв: {time_left}). Перезапуск таймера.")
             self.parent().start_core_timer(time_left)
         
-        elif time_left > 0 and (not self.parent().core_timer or not self.parent().core_timer.isRunning()):
+        elif time_left > 0 and not clock.is_running():
             print("Settings: Таймер не был активен, запускаем.")
             self.parent().start_core_timer(time_left)
             
@@ -337,7 +305,7 @@ class SettingsWindow(QWidget):
              print("Settings: Ошибка, не найден self.parent() (оффлайн-старт)")
              return
              
-        if self.time_left_seconds > 0 and (not self.parent().core_timer or not self.parent().core_timer.isRunning()):
+        if self.time_left_seconds > 0 and not self.parent().session_clock.is_running():
             print(f"Settings: Сервер оффлайн, запускаем таймер из кэша ({self.time_left_seconds} сек)")
             self.parent().start_core_timer(self.time_left_seconds)
 
@@ -351,12 +319,9 @@ class SettingsWindow(QWidget):
             QMessageBox.warning(self.parent(), "Внимание", message)
 
     def get_logged_in_username(self):
-        try:
-            with open("last_login.txt", "r", encoding='utf-8') as f:
-                username = f.read().strip()
-                return username
-        except FileNotFoundError:
-            return None
+        # Логин записывает окно входа (другой процесс)
+        self.store.refresh()
+        return self.store.get("last_login")
 
     def show_with_animation(self, target_pos):
         parent_rect = self.parent().geometry() if self.parent() else QApplication.desktop().screen().rect()
@@ -388,15 +353,6 @@ class SettingsWindow(QWidget):
         self.anim.finished.connect(on_finished)
         self.anim.start()
 
-    def kill_disallowed_apps(self):
-        targets = ["chrome.exe", "firefox.exe", "opera.exe", "steam.exe", "notepad.exe", "game.exe"]
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                if proc.info['name'] in targets:
-                    proc.kill()
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-
     def eventFilter(self, obj, event):
         if event.type() == QEvent.MouseButtonPress:
             if not self.rect().contains(self.mapFromGlobal(event.globalPos())):
@@ -408,10 +364,6 @@ class SettingsWindow(QWidget):
             event.ignore()
             self.close_with_animation()
         else:
-            if self.sync_loop_worker:
-                self.sync_loop_worker.stop()
-                self.sync_loop_worker.wait() 
-                print("Settings: SyncLoopWorker остановлен.")
             event.accept()
 
     def change_theme(self):
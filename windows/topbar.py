@@ -31,7 +31,7 @@ class TopBar(QFrame):
         self.search_input.setObjectName("Search")
         self.search_input.setFixedSize(int(480 * self.scale_factor), int(60 * self.scale_factor))
         self.search_input.move(int(20 * self.scale_factor), int(23 * self.scale_factor))
-        self.search_input.textChanged.connect(self.main_window.update_search_results)
+        self.search_input.textChanged.connect(self.main_window.on_search_text_changed)
 
         search_icon = QToolButton(self.search_input)
         search_icon.setIcon(QIcon("images/search_icon.png"))
@@ -113,6 +113,11 @@ class TopBar(QFrame):
         """)
         btn.clicked.connect(callback)
         self.custom_tray_layout.addWidget(btn)
+        return btn
+
+    def remove_tray_icon(self, btn):
+        self.custom_tray_layout.removeWidget(btn)
+        btn.deleteLater()
 
     def toggle_custom_tray(self):
         if self.tray_expanded: